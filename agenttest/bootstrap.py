@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Bootstrap distributions of a statistic of trade returns, all resamples of a
+# chunk at once instead of one np.random.choice per resample.
+#
+#   dist = bootstrap(returns, size=100000, seed=0)                  # mean of each resample
+#   dist = bootstrap(returns, method="stationary", block=5, seed=0)
+#   low, high = confidence_interval(dist)
+#   table = summary({("sail", "trend"): r1, ("sail", "sideways"): r2, ...}, workers=4)
+#
+# Methods:
+#   iid         plain resampling of single trades
+#   block       circular moving blocks of `block` trades
+#   stationary  Politis-Romano, blocks of geometric length with mean `block`
+#
+# Resamples are drawn in chunks of at most max_cells indices, each chunk with its
+# own child of SeedSequence(seed), so a seeded result does not depend on the
+# number of workers. stat is called as stat(samples, axis=-1) on a
+# (resamples, trades) array; np.mean over blocks skips the resampled array and
+# sums whole blocks from prefix sums instead.
+
+METHODS = ["iid", "block", "stationary"]
+MAX_CELLS = 2**22
+
+
+# ================= INDICES =================
+
+def resample_indices(n, size, rng, method="iid", block=None):
+    # -> (size, n) indices into a series of n trades
+    if method == "iid":
+        return rng.integers(0, n, (size, n))
+
+    block = max(int(round(block or np.sqrt(n))), 1)
+    if method == "block":
+        starts = rng.integers(0, n, (size, -(-n // block)))
+        idx = (starts[:, :, None] + np.arange(block)) % n
+        return idx.reshape(size, -1)[:, :n]
+
+    if method == "stationary":
+        # a new block starts with probability 1/block, every row with one;
+        # worked on the flattened (size * n) array
+        m = size * n
+        new = rng.random(m) < 1 / block
+        new[::n] = True
+        pos = np.arange(m)
+        block_start = np.maximum.accumulate(np.where(new, pos, 0))
+        block_id = np.cumsum(new) - 1
+        starts = rng.integers(0, n, block_id[-1] + 1)
+        idx = (starts[block_id] + pos - block_start) % n
+        return idx.reshape(size, n)
+
+    raise ValueError(f"unknown method {method!r}, expected one of {METHODS}")
+
+
+def _chunks(n, size, max_cells):
+    step = max(max_cells // max(n, 1), 1)
+    return [min(step, size - i) for i in range(0, size, step)]
+
+
+def _block_means(returns, k, rng, method, block):
+    # mean of each resample without materializing it: a resample is a chain of
+    # circular segments, each summed from the prefix sums of the doubled series
+    n = len(returns)
+    prefix = np.concatenate([[0.], np.cumsum(np.concatenate([returns, returns]))])
+    block = max(int(round(block or np.sqrt(n))), 1)
+
+    if method == "block":
+        lengths = np.minimum(block, n - np.arange(0, n, block))
+        starts = rng.integers(0, n, (k, len(lengths)))
+        return (prefix[starts + lengths] - prefix[starts]).sum(axis=1) / n, None
+
+    # stationary: geometric lengths, enough blocks to cover n trades but for a
+    # six sigma tail; rows that still fall short are redrawn the slow way
+    p = 1 / block
+    blocks = int(min(n, n * p + 6 * np.sqrt(n * p) + 6))
+    u = 1 - rng.random((k, blocks), dtype=np.float32)
+    lengths = (np.log(u) / np.float32(np.log1p(-p))).astype(np.int64) + 1
+    end = np.minimum(np.cumsum(lengths, axis=1), n)
+    begin = np.concatenate([np.zeros((k, 1), dtype=end.dtype), end[:, :-1]], axis=1)
+    starts = rng.integers(0, n, (k, blocks))
+    means = (prefix[starts + end - begin] - prefix[starts]).sum(axis=1) / n
+    return means, np.flatnonzero(end[:, -1] < n)
+
+
+def _run_chunk(returns, k, seed, method, block, stat):
+    rng = np.random.default_rng(seed)
+    if stat is np.mean and method != "iid":
+        out, short = _block_means(returns, k, rng, method, block)
+        if short is not None and len(short):
+            idx = resample_indices(len(returns), len(short), rng, method, block)
+            out[short] = returns[idx].mean(axis=-1)
+        return out
+    idx = resample_indices(len(returns), k, rng, method, block)
+    return stat(returns[idx], axis=-1)
+
+
+# ================= BOOTSTRAP =================
+
+def _tasks(returns, size, seed, method, block, stat, max_cells):
+    returns = np.asarray(returns, dtype=float)
+    returns = returns[~np.isnan(returns)]
+    if len(returns) == 0:
+        return []
+    sizes = _chunks(len(returns), size, max_cells)
+    seeds = seed.spawn(len(sizes))
+    return [(returns, k, s, method, block, stat) for k, s in zip(sizes, seeds)]
+
+
+def _execute(tasks, workers):
+    if workers == 1 or len(tasks) <= 1:
+        return [_run_chunk(*t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_chunk, *zip(*tasks)))
+
+
+def bootstrap(returns, size=10000, method="iid", block=None, stat=np.mean, seed=None,
+              workers=1, max_cells=MAX_CELLS):
+    # -> (size,) values of stat over the resamples, empty for no trades
+    tasks = _tasks(returns, size, np.random.SeedSequence(seed), method, block, stat, max_cells)
+    parts = _execute(tasks, workers)
+    return np.concatenate(parts) if parts else np.empty(0)
+
+
+def bootstrap_many(series, size=10000, method="iid", block=None, stat=np.mean, seed=None,
+                   workers=None, max_cells=MAX_CELLS):
+    # series: {key: returns} -> {key: (size,) distribution}
+    # Every series gets its own child seed, in the order of the dict.
+    keys = list(series)
+    seeds = np.random.SeedSequence(seed).spawn(len(keys))
+
+    tasks, owner = [], []
+    for key, s in zip(keys, seeds):
+        t = _tasks(series[key], size, s, method, block, stat, max_cells)
+        tasks += t
+        owner += [key] * len(t)
+
+    workers = workers or min(len(tasks), os.cpu_count() or 1)
+    parts = {key: [] for key in keys}
+    for key, part in zip(owner, _execute(tasks, workers)):
+        parts[key].append(part)
+    return {key: np.concatenate(p) if p else np.empty(0) for key, p in parts.items()}
+
+
+def confidence_interval(dist, level=0.95):
+    if len(dist) == 0:
+        return np.nan, np.nan
+    tail = (1 - level) / 2 * 100
+    low, high = np.percentile(dist, [tail, 100 - tail])
+    return low, high
+
+
+def summary(series, level=0.95, **kwargs):
+    # one row per series: observed mean, bootstrap CI of the mean and the share
+    # of resamples with mean <= 0
+    dists = bootstrap_many(series, **kwargs)
+    rows = []
+    for key, dist in dists.items():
+        r = np.asarray(series[key], dtype=float)
+        low, high = confidence_interval(dist, level)
+        rows.append({
+            "series": key,
+            "trades": int((~np.isnan(r)).sum()),
+            "mean_return": np.nanmean(r) if len(dist) else np.nan,
+            "ci_low": low,
+            "ci_high": high,
+            "p_le_zero": (dist <= 0).mean() if len(dist) else np.nan,
+        })
+    return pd.DataFrame(rows)
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    import time
+    from agenttest.ledger import ADX_THRESHOLD, Ledger
+
+    rng = np.random.default_rng(0)
+    r = rng.normal(0.002, 0.02, 250)
+    for method in METHODS:
+        start = time.perf_counter()
+        dist = bootstrap(r, size=100000, method=method, block=5, seed=0)
+        low, high = confidence_interval(dist)
+        print(f"{method:<10} 100k resamples of {len(r)} trades in {time.perf_counter() - start:.3f}s | "
+              f"95% CI {low * 100:.3f}% to {high * 100:.3f}%")
+
+    # every symbol x regime of getdata.py's ledger (trending: ADX at exit > ADX_THRESHOLD)
+    path = "csvfile/ledger_regime.npz"
+    if os.path.exists(path):
+        df = Ledger.load(path).to_frame()
+        df["regime"] = np.where(df["regime"] > ADX_THRESHOLD, "trend", "sideways")
+        series = {key: g["return"].to_numpy() for key, g in df.groupby(["symbol", "regime"])}
+
+        start = time.perf_counter()
+        table = summary(series, size=100000, method="stationary", block=5, seed=0)
+        print(f"\n{len(series)} series x 100k resamples in {time.perf_counter() - start:.2f}s")
+        print(table.to_string(index=False))
@@ -0,0 +1,344 @@
+import numpy as np
+
+# Shared backtest engine for the single-position strategies in getdata.py,
+# run.py, run1.py and money.py.
+#
+# Every strategy there is the same state machine:
+#   flat  -> on bar i, enter long if long_entry[i], else short if short_entry[i]
+#            (stop / target levels are fixed at the entry bar)
+#   open  -> from the next bar on, exit on the first bar where the close crosses
+#            the stop or the target, or the strategy's own exit signal fires
+#   after an exit the next entry can happen on the following bar
+#
+# Columns are pulled into NumPy arrays once; entries are found with a search
+# over the precomputed signal indexes and exits with vectorized scans over
+# growing chunks of the price array, so there is no per-bar Python work.
+#
+# With high / low (and optionally open) the stop and target are checked against
+# the bar's range instead of its close. Then the first touch of every candidate
+# entry is computed up front (first_touch) and each trade is an O(1) lookup.
+#
+# Against the scripts' old per-bar df.loc loops, the trades (bars, prices, exit
+# reasons) are the same, but the returns only agree to floating-point rounding
+# (differences up to ~1e-16): they are computed on whole arrays, not per row.
+
+SL, TP, SIGNAL = 0, 1, 2
+EXIT_REASONS = np.array(["sl", "tp", "signal"])
+
+
+def columns(df, names):
+    return {n: df[n].to_numpy(dtype=float) for n in names}
+
+
+def first_exit(close, start, direction, sl, tp, exit_signal, chunk=64):
+    # index and reason of the first bar >= start that closes the trade, or (-1, -1)
+    n = len(close)
+    while start < n:
+        stop = min(n, start + chunk)
+        c = close[start:stop]
+        if direction == 1:
+            hit_sl = c <= sl
+            hit_tp = c >= tp
+        else:
+            hit_sl = c >= sl
+            hit_tp = c <= tp
+        hit_signal = exit_signal[start:stop]
+
+        hit = hit_sl | hit_tp | hit_signal
+        if hit.any():
+            k = int(hit.argmax())
+            reason = SL if hit_sl[k] else TP if hit_tp[k] else SIGNAL
+            return start + k, reason
+
+        start = stop
+        chunk *= 2
+    return -1, -1
+
+
+# ================= FIRST TOUCH =================
+
+def next_true(mask):
+    # index of the first True at or after every bar, len(mask) if none; one
+    # extra element so next_true(mask)[i + 1] works for the last bar
+    n = len(mask)
+    idx = np.where(mask, np.arange(n), n)
+    return np.concatenate([np.minimum.accumulate(idx[::-1])[::-1], [n]])
+
+
+def first_touch(high, low, sl, tp, direction, open_=None, entries=None, chunk=32, max_cells=2**22):
+    # For a trade entered at the close of each bar in `entries` (default: every
+    # bar) with levels sl[e] / tp[e], the first later bar whose range reaches
+    # either level. Returns (exit_idx, exit_price, reason), -1 / NaN where
+    # nothing is touched. A bar that opens through a level fills at the open;
+    # a bar touching both levels counts as the stop.
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    sl = np.asarray(sl, dtype=float)
+    tp = np.asarray(tp, dtype=float)
+    n = len(high)
+    open_ = np.full(n, np.nan) if open_ is None else np.asarray(open_, dtype=float)
+
+    exit_idx = np.full(n, -1, dtype=np.int64)
+    exit_price = np.full(n, np.nan)
+    reason = np.full(n, -1, dtype=np.int8)
+
+    # padded so window gathers past the last bar read NaN (never a touch)
+    pad = np.full(n, np.nan)
+    high_p, low_p, open_p = (np.concatenate([a, pad]) for a in (high, low, open_))
+
+    pending = np.arange(n, dtype=np.int64) if entries is None else np.asarray(entries, dtype=np.int64)
+    offset = 1
+    while len(pending) and offset < n:
+        width = max(1, min(chunk, n - offset, max_cells // len(pending)))
+        cols = pending[:, None] + offset + np.arange(width)
+        s, t = sl[pending, None], tp[pending, None]
+
+        with np.errstate(invalid="ignore"):
+            if direction == 1:
+                hit_sl = low_p[cols] <= s
+                hit_tp = high_p[cols] >= t
+            else:
+                hit_sl = high_p[cols] >= s
+                hit_tp = low_p[cols] <= t
+
+        hit = hit_sl | hit_tp
+        done = hit.any(axis=1)
+        rows = np.flatnonzero(done)
+        k = hit[rows].argmax(axis=1)
+        e = pending[rows]
+        x = e + offset + k
+
+        o, s, t = open_[x], sl[e], tp[e]
+        touched_sl = hit_sl[rows, k]
+        with np.errstate(invalid="ignore"):
+            gap_tp = o >= t if direction == 1 else o <= t
+            gap_sl = o <= s if direction == 1 else o >= s
+        take_tp = gap_tp | (~touched_sl & ~gap_sl)
+
+        exit_idx[e] = x
+        reason[e] = np.where(take_tp, TP, SL)
+        exit_price[e] = np.where(gap_tp | (gap_sl & ~take_tp), o, np.where(take_tp, t, s))
+
+        pending = pending[~done]
+        offset += width
+        chunk *= 2
+    return exit_idx, exit_price, reason
+
+
+# ================= TRADES =================
+
+def run_trades(close, long_entry, short_entry, long_sl, long_tp, short_sl, short_tp,
+               long_exit=None, short_exit=None, start=1, high=None, low=None, open_=None):
+    # close: price array; *_entry / *_exit: bool arrays; *_sl / *_tp: the level a
+    # trade entered on that bar would use (np.inf / -np.inf for "no target").
+    # high / low: check the levels against the bar's range (see first_touch).
+    # Returns closed trades as parallel arrays, plus the position still open at the end.
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    long_entry = np.asarray(long_entry, dtype=bool)
+    short_entry = np.asarray(short_entry, dtype=bool)
+    long_exit = np.zeros(n, dtype=bool) if long_exit is None else np.asarray(long_exit, dtype=bool)
+    short_exit = np.zeros(n, dtype=bool) if short_exit is None else np.asarray(short_exit, dtype=bool)
+
+    if high is not None:
+        return _run_intrabar(close, long_entry, short_entry, long_sl, long_tp, short_sl, short_tp,
+                             long_exit, short_exit, start, high, low, open_)
+
+    entries = np.flatnonzero(long_entry | short_entry)
+    entry_idx, exit_idx, direction, reason, sl, tp = [], [], [], [], [], []
+    open_trade = None
+
+    i = start
+    while True:
+        k = np.searchsorted(entries, i)
+        if k == len(entries):
+            break
+        e = int(entries[k])
+
+        if long_entry[e]:
+            d, s, t, signal = 1, long_sl[e], long_tp[e], long_exit
+        else:
+            d, s, t, signal = -1, short_sl[e], short_tp[e], short_exit
+
+        x, why = first_exit(close, e + 1, d, s, t, signal)
+        if x < 0:
+            open_trade = {"entry_idx": e, "direction": d, "entry_price": close[e], "sl": s, "tp": t}
+            break
+
+        entry_idx.append(e)
+        exit_idx.append(x)
+        direction.append(d)
+        reason.append(why)
+        sl.append(s)
+        tp.append(t)
+        i = x + 1
+
+    entry_idx = np.array(entry_idx, dtype=np.int64)
+    exit_idx = np.array(exit_idx, dtype=np.int64)
+    return {
+        "entry_idx": entry_idx,
+        "exit_idx": exit_idx,
+        "direction": np.array(direction, dtype=np.int8),
+        "entry_price": close[entry_idx],
+        "exit_price": close[exit_idx],
+        "sl": np.array(sl, dtype=float),
+        "tp": np.array(tp, dtype=float),
+        "reason": np.array(reason, dtype=np.int8),
+        "open": open_trade,
+    }
+
+
+def _run_intrabar(close, long_entry, short_entry, long_sl, long_tp, short_sl, short_tp,
+                  long_exit, short_exit, start, high, low, open_):
+    n = len(close)
+    longs = np.flatnonzero(long_entry)
+    shorts = np.flatnonzero(short_entry & ~long_entry)
+    touch = {
+        1: first_touch(high, low, long_sl, long_tp, 1, open_, longs),
+        -1: first_touch(high, low, short_sl, short_tp, -1, open_, shorts),
+    }
+    # the strategy's own exit fires at the close, after anything touched intrabar
+    signal = {1: next_true(long_exit), -1: next_true(short_exit)}
+    levels = {1: (long_sl, long_tp), -1: (short_sl, short_tp)}
+
+    entries = np.flatnonzero(long_entry | short_entry)
+    trades = {k: [] for k in ("entry_idx", "exit_idx", "direction", "exit_price", "reason", "sl", "tp")}
+    open_trade = None
+
+    i = start
+    while True:
+        k = np.searchsorted(entries, i)
+        if k == len(entries):
+            break
+        e = int(entries[k])
+        d = 1 if long_entry[e] else -1
+        s, t = levels[d][0][e], levels[d][1][e]
+
+        x, price, why = touch[d][0][e], touch[d][1][e], touch[d][2][e]
+        sig = signal[d][e + 1]
+        if sig < n and (x < 0 or sig < x):
+            x, price, why = sig, close[sig], SIGNAL
+        if x < 0:
+            open_trade = {"entry_idx": e, "direction": d, "entry_price": close[e], "sl": s, "tp": t}
+            break
+
+        for name, v in zip(trades, (e, x, d, price, why, s, t)):
+            trades[name].append(v)
+        i = x + 1
+
+    entry_idx = np.array(trades["entry_idx"], dtype=np.int64)
+    return {
+        "entry_idx": entry_idx,
+        "exit_idx": np.array(trades["exit_idx"], dtype=np.int64),
+        "direction": np.array(trades["direction"], dtype=np.int8),
+        "entry_price": close[entry_idx],
+        "exit_price": np.array(trades["exit_price"], dtype=float),
+        "sl": np.array(trades["sl"], dtype=float),
+        "tp": np.array(trades["tp"], dtype=float),
+        "reason": np.array(trades["reason"], dtype=np.int8),
+        "open": open_trade,
+    }
+
+
+# ================= MANY RUNS =================
+
+def run_trades_batch(close, long_entry, short_entry, long_sl, long_tp, short_sl, short_tp,
+                     long_exit=None, short_exit=None, start=1):
+    # run_trades (close mode) for many signal sets over the same prices at once:
+    # entry / exit masks are (runs, n), one run per row, levels are (n,) shared
+    # by all runs or (runs, n). Bars are stepped in order with every run's
+    # position updated together, so the cost is one pass over the bars per batch.
+    # Returns the closed trades of all runs as flat arrays sorted by run and
+    # entry, with "run" the row they belong to (no "open").
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    long_entry = np.atleast_2d(np.asarray(long_entry, dtype=bool))
+    runs = len(long_entry)
+
+    def rows(x, dtype=bool):
+        # -> (n, runs), so every bar is one contiguous row
+        x = np.zeros(n, dtype=bool) if x is None else np.asarray(x, dtype=dtype)
+        return np.ascontiguousarray(np.broadcast_to(x, (runs, n)).T)
+
+    le, se, lx, sx = rows(long_entry), rows(short_entry), rows(long_exit), rows(short_exit)
+    lsl, ltp, ssl, stp = (rows(x, float) for x in (long_sl, long_tp, short_sl, short_tp))
+
+    pos = np.zeros(runs, dtype=np.int8)
+    entry = np.zeros(runs, dtype=np.int64)
+    sl = np.full(runs, np.nan)
+    tp = np.full(runs, np.nan)
+    done_runs, done_entry, done_exit, done_dir, done_reason = [], [], [], [], []
+
+    for i in range(start, n):
+        flat = pos == 0
+        if not flat.all():
+            c = close[i]
+            is_long, is_short = pos == 1, pos == -1
+            hit_sl = (is_long & (c <= sl)) | (is_short & (c >= sl))
+            hit_tp = (is_long & (c >= tp)) | (is_short & (c <= tp))
+            hit = hit_sl | hit_tp | (is_long & lx[i]) | (is_short & sx[i])
+            if hit.any():
+                r = np.flatnonzero(hit)
+                done_runs.append(r)
+                done_entry.append(entry[r])
+                done_exit.append(np.full(len(r), i))
+                done_dir.append(pos[r].copy())
+                done_reason.append(np.where(hit_sl[r], SL, np.where(hit_tp[r], TP, SIGNAL)))
+                pos[r] = 0
+
+        # a run that exited on this bar waits for the next one
+        go_long = flat & le[i]
+        go_short = flat & se[i] & ~le[i]
+        if go_long.any() or go_short.any():
+            pos[go_long], pos[go_short] = 1, -1
+            entry[go_long | go_short] = i
+            sl[go_long], tp[go_long] = lsl[i][go_long], ltp[i][go_long]
+            sl[go_short], tp[go_short] = ssl[i][go_short], stp[i][go_short]
+
+    def cat(parts, dtype):
+        return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+    run = cat(done_runs, np.int64)
+    order = np.lexsort((cat(done_entry, np.int64), run))
+    entry_idx, exit_idx = cat(done_entry, np.int64)[order], cat(done_exit, np.int64)[order]
+    return {
+        "run": run[order],
+        "entry_idx": entry_idx,
+        "exit_idx": exit_idx,
+        "direction": cat(done_dir, np.int8)[order],
+        "entry_price": close[entry_idx],
+        "exit_price": close[exit_idx],
+        "reason": cat(done_reason, np.int8)[order],
+    }
+
+
+def split_runs(trades, runs):
+    # flat run_trades_batch output -> one trades dict per run (views), "open" None
+    bounds = np.searchsorted(trades["run"], np.arange(runs + 1))
+    names = [k for k in trades if k != "run"]
+    return [
+        {**{k: trades[k][a:b] for k in names}, "open": None}
+        for a, b in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+# ================= P&L =================
+
+def trade_returns(trades):
+    # (exit - entry) / entry for longs, (entry - exit) / entry for shorts
+    entry, exit_, d = trades["entry_price"], trades["exit_price"], trades["direction"]
+    return np.where(d == 1, (exit_ - entry) / entry, (entry - exit_) / entry)
+
+
+def fixed_notional_pnl(trades, capital_per_trade):
+    # every trade buys capital_per_trade worth of shares, no compounding
+    entry, exit_, d = trades["entry_price"], trades["exit_price"], trades["direction"]
+    shares = capital_per_trade / entry
+    return np.where(d == 1, (exit_ - entry) * shares, (entry - exit_) * shares)
+
+
+def cash_curve(pnl, exit_idx, initial, n):
+    # cash at the start of every bar: a trade's pnl counts from the bar after its exit
+    running = np.cumsum(np.concatenate([[float(initial)], pnl]))
+    done = np.searchsorted(exit_idx, np.arange(n), side="left")
+    return running[done]
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import os
+
+from agenttest import engine
+
+# Closed trades of a run in one preallocated NumPy structured array.
+#
+#   ledger = Ledger()
+#   ledger.append("tatapower", trades, df["Date"], pnl=pnl, returns=ret, regime=adx)
+#   ledger["return"]                      # view of one field, no copy
+#   ledger.save("csvfile/ledger_regime.npz")
+#
+# The array doubles when full, so appends are amortized O(rows). Symbols are
+# stored as codes into ledger.symbols and exit reasons as engine.SL / TP /
+# SIGNAL. A saved ledger is one .npz holding each field as its own array, so a
+# reader loads only the columns it asks for.
+#
+# A trade's regime is "trend" when its ADX at exit is above ADX_THRESHOLD and
+# "sideways" otherwise, wherever a ledger is split by regime.
+
+ADX_THRESHOLD = 25
+
+DTYPE = np.dtype([
+    ("symbol", np.int32),
+    ("entry_date", "datetime64[ns]"),
+    ("exit_date", "datetime64[ns]"),
+    ("direction", np.int8),
+    ("entry_price", np.float64),
+    ("exit_price", np.float64),
+    ("shares", np.float64),
+    ("pnl", np.float64),
+    ("return", np.float64),
+    ("reason", np.int8),
+    ("regime", np.float64),      # ADX at exit
+    ("atr_pct", np.float64),     # ATR / close at exit
+    ("ema_trend", np.int8),      # 1: EMA 50 above EMA 200 at exit, -1 below, 0 unknown
+    ("run", np.int32),           # parameter set of a sweep, 0 outside sweeps
+])
+
+
+class Ledger:
+
+    def __init__(self, capacity=1024):
+        self.rows = np.zeros(capacity, dtype=DTYPE)
+        self.n = 0
+        self.symbols = []
+        self._codes = {}
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, field):
+        return self.rows[field][:self.n]
+
+    def view(self):
+        return self.rows[:self.n]
+
+    def code(self, symbol):
+        if symbol not in self._codes:
+            self._codes[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self._codes[symbol]
+
+    # ================= APPEND =================
+
+    def _reserve(self, k):
+        if self.n + k > len(self.rows):
+            capacity = max(2 * len(self.rows), self.n + k)
+            rows = np.zeros(capacity, dtype=DTYPE)
+            rows[:self.n] = self.rows[:self.n]
+            self.rows = rows
+
+    def extend(self, symbol, **columns):
+        # columns: arrays of equal length named after DTYPE fields; missing
+        # float fields are NaN, other missing fields zero
+        k = len(next(iter(columns.values())))
+        self._reserve(k)
+        block = self.rows[self.n:self.n + k]
+        block["symbol"] = self.code(symbol)
+        for name in DTYPE.names[1:]:
+            if name in columns:
+                block[name] = columns[name]
+            elif DTYPE[name].kind == "f":
+                block[name] = np.nan
+        self.n += k
+        return block
+
+    def append(self, symbol, trades, dates, shares=None, pnl=None, returns=None, regime=None,
+               atr_pct=None, ema_trend=None):
+        # trades: engine.run_trades output, dates: the Date column it indexes
+        dates = np.asarray(dates, dtype="datetime64[ns]")
+        columns = {
+            "entry_date": dates[trades["entry_idx"]],
+            "exit_date": dates[trades["exit_idx"]],
+            "direction": trades["direction"],
+            "entry_price": trades["entry_price"],
+            "exit_price": trades["exit_price"],
+            "reason": trades["reason"],
+            "return": engine.trade_returns(trades) if returns is None else returns,
+        }
+        optional = (("shares", shares), ("pnl", pnl), ("regime", regime),
+                    ("atr_pct", atr_pct), ("ema_trend", ema_trend))
+        for name, values in optional:
+            if values is not None:
+                columns[name] = values
+        return self.extend(symbol, **columns)
+
+    # ================= QUERY =================
+
+    def symbol(self, symbol):
+        # rows of one symbol (a copy: rows of a symbol need not be contiguous)
+        return self.view()[self["symbol"] == self._codes[symbol]]
+
+    def to_frame(self):
+        df = pd.DataFrame({name: self[name] for name in DTYPE.names})
+        df["symbol"] = np.asarray(self.symbols, dtype=object)[df["symbol"]] if self.symbols else df["symbol"]
+        df["reason"] = engine.EXIT_REASONS[df["reason"]]
+        return df
+
+    # ================= FILE =================
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, symbols=np.asarray(self.symbols, dtype=str),
+                 **{name: self[name] for name in DTYPE.names})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, fields=None):
+        # fields: load only these columns (plus symbol); the others, and fields
+        # missing from an older file, are NaN when float and zero otherwise, as
+        # in extend()
+        with np.load(path) as f:
+            ledger = cls(capacity=max(len(f["symbol"]), 1))
+            for s in f["symbols"]:
+                ledger.code(str(s))
+            ledger.n = len(f["symbol"])
+            wanted = {"symbol", *(fields or DTYPE.names)}
+            for name in DTYPE.names:
+                if name in wanted and name in f:
+                    ledger.rows[name][:ledger.n] = f[name]
+                elif DTYPE[name].kind == "f":
+                    ledger.rows[name][:ledger.n] = np.nan
+        return ledger
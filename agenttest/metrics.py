@@ -0,0 +1,203 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Performance metrics for one run or many at once.
+#
+#   trade_stats(returns)          returns: 1-D, or (runs, trades) NaN padded (see pad)
+#   equity_stats(equity, years)   equity: 1-D, or (runs, bars)
+#
+# Every function works along the last axis, so a sweep's results are scored
+# with a handful of array operations instead of a loop per run. 1-D input
+# gives scalars, 2-D input one value per run.
+
+PERIODS_PER_YEAR = 252
+
+
+def pad(series, fill=np.nan):
+    # list of 1-D arrays of different lengths -> (runs, longest) array
+    width = max((len(s) for s in series), default=0)
+    out = np.full((len(series), width), fill)
+    for i, s in enumerate(series):
+        out[i, :len(s)] = s
+    return out
+
+
+def _runs(x):
+    x = np.asarray(x, dtype=float)
+    return x.reshape(1, -1) if x.ndim == 1 else x, x.ndim == 1
+
+
+def _result(d, one):
+    return {k: v[0] for k, v in d.items()} if one else d
+
+
+def years_between(dates):
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    return (dates[-1] - dates[0]) / np.timedelta64(1, "D") / 365.25
+
+
+# ================= TRADES =================
+
+def trade_stats(returns):
+    r, one = _runs(returns)
+    valid = ~np.isnan(r)
+    n = valid.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        win = r > 0
+        loss = r < 0
+        wins = win.sum(axis=1)
+        losses = loss.sum(axis=1)
+        gross_win = np.where(win, r, 0.).sum(axis=1)
+        gross_loss = np.where(loss, r, 0.).sum(axis=1)
+
+        mean = np.where(valid, r, 0.).sum(axis=1) / n
+        dev = np.where(valid, r - mean[:, None], 0.)
+        std = np.sqrt((dev * dev).sum(axis=1) / (n - 1))
+
+        stats = {
+            "trades": n,
+            "wins": wins,
+            "losses": losses,
+            "win_rate": wins / n,
+            "avg_win": gross_win / wins,
+            "avg_loss": gross_loss / losses,
+            "mean_return": mean,
+            "std_return": std,
+            "t_stat": mean / (std / np.sqrt(n)),
+            "profit_factor": gross_win / -gross_loss,
+        }
+    return _result(stats, one)
+
+
+def trade_curve(returns):
+    # 1 + cumulative sum of trade returns, starting at 1 before the first trade
+    r, one = _runs(returns)
+    curve = 1 + np.concatenate([np.zeros((len(r), 1)), np.nancumsum(r, axis=1)], axis=1)
+    return curve[0] if one else curve
+
+
+# ================= EQUITY =================
+
+def period_returns(equity):
+    e, one = _runs(equity)
+    r = e[:, 1:] / e[:, :-1] - 1
+    return r[0] if one else r
+
+
+def drawdown(equity):
+    e, one = _runs(equity)
+    d = e / np.maximum.accumulate(e, axis=1) - 1
+    return d[0] if one else d
+
+
+def max_drawdown(equity):
+    return drawdown(equity).min(axis=-1)
+
+
+def cagr(equity, years):
+    e, one = _runs(equity)
+    out = (e[:, -1] / e[:, 0]) ** (1 / years) - 1
+    return out[0] if one else out
+
+
+def sharpe(equity, periods_per_year=PERIODS_PER_YEAR, risk_free=0.):
+    # annualized, from per-bar returns, risk_free per year
+    r = period_returns(equity) - risk_free / periods_per_year
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return r.mean(axis=-1) / r.std(axis=-1, ddof=1) * np.sqrt(periods_per_year)
+
+
+def sortino(equity, periods_per_year=PERIODS_PER_YEAR):
+    r = period_returns(equity)
+    downside = np.sqrt((np.minimum(r, 0.) ** 2).mean(axis=-1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return r.mean(axis=-1) / downside * np.sqrt(periods_per_year)
+
+
+def holding_mask(entry_idx, exit_idx, n, open_entry=None):
+    # bars with a position: from the bar after entry up to and including the exit
+    # bar (money.py's convention), open_entry: entry bar of a trade still open
+    step = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(step, np.asarray(entry_idx) + 1, 1)
+    np.add.at(step, np.asarray(exit_idx) + 1, -1)
+    if open_entry is not None:
+        step[open_entry + 1] += 1
+    return np.cumsum(step[:n]) > 0
+
+
+def exposure(in_market):
+    # share of bars with a position
+    return np.asarray(in_market, dtype=bool).mean(axis=-1)
+
+
+def turnover(traded_notional, equity, years):
+    # traded value (entries + exits) per year over the average equity
+    e, one = _runs(equity)
+    out = np.asarray(traded_notional, dtype=float) / e.mean(axis=1) / years
+    return out[0] if one else out
+
+
+def equity_stats(equity, years=None, periods_per_year=PERIODS_PER_YEAR, in_market=None, traded_notional=None):
+    # years: span of the curve, default its length in bars / periods_per_year
+    e, one = _runs(equity)
+    years = (e.shape[1] - 1) / periods_per_year if years is None else years
+    dd = max_drawdown(e)
+    growth = cagr(e, years)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stats = {
+            "final": e[:, -1],
+            "total_return": e[:, -1] / e[:, 0] - 1,
+            "cagr": growth,
+            "max_drawdown": dd,
+            "volatility": period_returns(e).std(axis=-1, ddof=1) * np.sqrt(periods_per_year),
+            "sharpe": sharpe(e, periods_per_year),
+            "sortino": sortino(e, periods_per_year),
+            "calmar": growth / -dd,
+        }
+    if in_market is not None:
+        stats["exposure"] = np.atleast_1d(exposure(in_market))
+    if traded_notional is not None:
+        stats["turnover"] = np.atleast_1d(turnover(traded_notional, e, years))
+    return _result(stats, one)
+
+
+# ================= ROLLING =================
+# trailing windows of `window` bars, NaN until the first full window
+
+def _trailing(values, window):
+    out = np.full(values.shape[:-1] + (values.shape[-1] + window - 1,), np.nan)
+    out[..., window - 1:] = values
+    return out
+
+
+def rolling_return(equity, window):
+    e, one = _runs(equity)
+    out = np.full(e.shape, np.nan)
+    out[:, window:] = e[:, window:] / e[:, :-window] - 1
+    return out[0] if one else out
+
+
+def rolling_volatility(equity, window, periods_per_year=PERIODS_PER_YEAR):
+    r, one = _runs(period_returns(equity))
+    vol = sliding_window_view(r, window, axis=1).std(axis=-1, ddof=1) * np.sqrt(periods_per_year)
+    out = np.concatenate([np.full((len(r), 1), np.nan), _trailing(vol, window)], axis=1)
+    return out[0] if one else out
+
+
+def rolling_sharpe(equity, window, periods_per_year=PERIODS_PER_YEAR):
+    r, one = _runs(period_returns(equity))
+    w = sliding_window_view(r, window, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s = w.mean(axis=-1) / w.std(axis=-1, ddof=1) * np.sqrt(periods_per_year)
+    out = np.concatenate([np.full((len(r), 1), np.nan), _trailing(s, window)], axis=1)
+    return out[0] if one else out
+
+
+def rolling_drawdown(equity, window):
+    # drop from the highest equity of the trailing window
+    e, one = _runs(equity)
+    peak = _trailing(sliding_window_view(e, window, axis=1).max(axis=-1), window)
+    out = e / peak - 1
+    return out[0] if one else out
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+import os
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+
+from agenttest import engine, metrics
+from agenttest.sweep import expand
+from agenttest.strategies import STRATEGIES
+
+# Monte Carlo permutation tests of a strategy's edge, and White's Reality Check
+# / Hansen's SPA over a whole parameter grid.
+#
+#   r = permutation_test("regime", "csvfile/itc_2020_2025_daily.csv", {"atr_mult": 1.5})
+#   r["p_value"]
+#   rc = reality_check("regime", path, {"atr_mult": [1.0, 1.5, 2.0], "adx_min": [15, 20, 25]})
+#   rc["rc_p_value"], rc["spa_p_value"], rc["table"]
+#
+# The null is "same signals at random times": the strategy's entry / exit masks
+# are shuffled (block=None) or moved around in blocks of `block` bars (keeps
+# their clustering), while stops, targets and prices stay on their own bars.
+# Each permuted set is backtested with the strategy's own rules and P&L.
+#
+# All permutations of a batch go through engine.run_trades_batch in one pass
+# over the bars. Batches are spread over processes; a batch's permutations come
+# from its own child of SeedSequence(seed), so the result does not depend on
+# the number of workers, and every grid combination sees the same permutations
+# (the Reality Check needs the joint null).
+#
+# Close-mode engine only (no intrabar).
+
+STATISTICS = ["total", "mean_return", "t_stat"]
+
+_columns = {}      # per worker process: (strategy, path) -> column arrays
+
+
+# ================= PERMUTATIONS =================
+
+def permutation_indices(n, size, rng, block=None):
+    # -> (size, n) orders of the bars: a full shuffle, or blocks of `block`
+    # consecutive bars in random order (the last block may be shorter)
+    if block is None or block <= 1:
+        return np.argsort(rng.random((size, n)), axis=1)
+    blocks = -(-n // block)
+    order = np.argsort(rng.random((size, blocks)), axis=1)
+    idx = np.arange(blocks * block).reshape(blocks, block)[order].reshape(size, -1)
+    return idx[idx < n].reshape(size, n)
+
+
+# ================= SCORING =================
+
+def score(returns, statistic="total"):
+    # returns: list of trade return arrays, one per run -> (runs,)
+    r = metrics.pad(returns)
+    if statistic == "total":
+        return np.nansum(r, axis=1)
+    s = metrics.trade_stats(r)
+    return np.nan_to_num(s[statistic], nan=0.)
+
+
+def _split(fn, params):
+    names = inspect.signature(fn).parameters
+    return {k: v for k, v in params.items() if k in names}
+
+
+def _load(strategy, path):
+    key = (strategy, path)
+    if key not in _columns:
+        spec = STRATEGIES[strategy]
+        _columns[key] = engine.columns(spec["load"](path), spec["columns"])
+    return _columns[key]
+
+
+def _run_batch(strategy, path, combos, size, seed, block, statistic, identity=False):
+    # -> (combos, size) scores of one batch of permutations; identity: the first
+    # "permutation" is the real order
+    c = _load(strategy, path)
+    spec = STRATEGIES[strategy]
+    n = len(c["Close"])
+    order = permutation_indices(n, size, np.random.default_rng(seed), block)
+    if identity:
+        order[0] = np.arange(n)
+
+    out = np.empty((len(combos), size))
+    for k, params in enumerate(combos):
+        signals = spec["signals"](c, **_split(spec["signals"], params))
+        masks = {name: v[order] for name, v in signals.items() if name.endswith(("_entry", "_exit"))}
+        levels = {name: v for name, v in signals.items() if name not in masks}
+        trades = engine.run_trades_batch(c["Close"], **masks, **levels)
+
+        returns_params = _split(spec["returns"], params)
+        returns = [spec["returns"](c, t, **returns_params) for t in engine.split_runs(trades, size)]
+        out[k] = score(returns, statistic)
+    return out
+
+
+def null_scores(strategy, path, combos, n_perm=1000, block=None, statistic="total", seed=0,
+                workers=None, batch=500):
+    # -> (real (combos,), null (combos, n_perm)) of the strategy on one symbol
+    spec = STRATEGIES[strategy]
+    known = set(inspect.signature(spec["signals"]).parameters) | set(inspect.signature(spec["returns"]).parameters)
+    unknown = {k for params in combos for k in params} - known
+    if unknown:
+        raise ValueError(f"parameters not supported by the permutation test for {strategy}: {sorted(unknown)}")
+
+    sizes = [min(batch, n_perm + 1 - i) for i in range(0, n_perm + 1, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [
+        (strategy, path, combos, k, s, block, statistic, i == 0)
+        for i, (k, s) in enumerate(zip(sizes, seeds))
+    ]
+
+    if workers == 1:
+        parts = [_run_batch(*t) for t in tasks]
+    else:
+        workers = workers or min(len(tasks), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_run_batch, *zip(*tasks)))
+
+    scores = np.concatenate(parts, axis=1)
+    return scores[:, 0], scores[:, 1:]
+
+
+# ================= TESTS =================
+
+def permutation_test(strategy, path, params=None, **kwargs):
+    # one parameter set: p-value of the real score against its permutations
+    real, null = null_scores(strategy, path, [params or {}], **kwargs)
+    real, null = real[0], null[0]
+    return {
+        "real": real,
+        "null": null,
+        "p_value": (1 + (null >= real).sum()) / (1 + len(null)),
+    }
+
+
+def reality_check(strategy, path, grid, **kwargs):
+    # every combination of the grid against the same permutations.
+    # Reality Check: the best real score, each centered on its own null mean,
+    # against the permuted maximum over the grid. SPA: the same with scores
+    # studentized by their null spread, leaving out combinations far below
+    # their null mean (Hansen's consistent version), where the cut scales with
+    # the number of bars the scores come from
+    combos = expand(grid)
+    real, null = null_scores(strategy, path, combos, **kwargs)
+    n_perm = null.shape[1]
+    n_bars = len(_load(strategy, path)["Close"])
+
+    center = null.mean(axis=1)
+    spread = null.std(axis=1, ddof=1)
+    spread = np.where(spread > 0, spread, np.inf)
+
+    rc = (real - center).max()
+    rc_null = (null - center[:, None]).max(axis=0)
+
+    z = (real - center) / spread
+    z_null = (null - center[:, None]) / spread[:, None]
+    keep = z > -np.sqrt(2 * np.log(np.log(n_bars)))
+    spa = max(z.max(), 0.)
+    spa_null = np.maximum(z_null[keep].max(axis=0), 0.) if keep.any() else np.zeros(n_perm)
+
+    table = pd.DataFrame(combos)
+    table["real"] = real
+    table["null_mean"] = center
+    table["null_std"] = null.std(axis=1, ddof=1)
+    table["z"] = z
+    table["p_value"] = (1 + (null >= real[:, None]).sum(axis=1)) / (1 + n_perm)
+    best = int(np.argmax(real - center))
+    return {
+        "table": table,
+        "best": combos[best],
+        "rc_p_value": (1 + (rc_null >= rc).sum()) / (1 + n_perm),
+        "spa_p_value": (1 + (spa_null >= spa).sum()) / (1 + n_perm),
+    }
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    import time
+
+    # the setups of getdata.py, run1.py and money.py
+    cases = [
+        ("regime", "csvfile/itc_2020_2025_daily.csv", {"atr_mult": 1.5, "tp_mult": 2.0}),
+        ("breakout", "csvfile/sail_2020_2025_daily.csv", {}),
+        ("ml_prob", "csvfile/tatapower_2020_2025_daily_ml_probs.csv", {}),
+    ]
+    for strategy, path, params in cases:
+        start = time.perf_counter()
+        r = permutation_test(strategy, path, params, n_perm=2000, block=5)
+        print(f"{strategy:<9} {os.path.basename(path):<40} real {r['real'] * 100:7.2f}% | "
+              f"null mean {r['null'].mean() * 100:6.2f}% | p {r['p_value']:.4f} | "
+              f"{time.perf_counter() - start:.2f}s")
+
+    grid = {
+        "atr_mult": [1.0, 1.5, 2.0, 2.5],
+        "tp_mult": [1.5, 2.0, 3.0],
+        "adx_min": [15, 20, 25, 30],
+    }
+    start = time.perf_counter()
+    rc = reality_check("regime", "csvfile/itc_2020_2025_daily.csv", grid, n_perm=1000, block=5)
+    print(f"\nReality Check over {len(rc['table'])} combinations x 1000 permutations "
+          f"in {time.perf_counter() - start:.2f}s")
+    print("best:", rc["best"], "| RC p:", round(rc["rc_p_value"], 4), "| SPA p:", round(rc["spa_p_value"], 4))
+    print(rc["table"].sort_values("p_value").head(10).to_string(index=False))
@@ -0,0 +1,238 @@
+import numpy as np
+import pandas as pd
+
+from data.store import symbol_key
+from agenttest import engine, metrics
+from agenttest.strategies import STRATEGIES
+
+# Portfolio backtest: every symbol trades the same strategy out of one cash pool.
+#
+#   panel = load_panel("breakout", paths)
+#   result = backtest(panel, "breakout", initial_capital=100000, max_positions=5)
+#   result["equity"], result["trades"], result["attribution"]
+#
+# Symbols are aligned onto the union of their trading dates as dense
+# (symbols, dates) arrays, NaN where a symbol has no bar. Signals are built on
+# the whole panel at once and the simulation steps one date at a time with
+# array operations over all symbols, so there is no per-symbol work per day.
+#
+# Per symbol the rules are those of engine.run_trades (enter at the close,
+# exit on the first later close through the stop / target or on the exit
+# signal, re-enter from the bar after an exit). On top of that:
+#   - every trade commits capital_per_trade of cash until it exits
+#   - at most max_positions trades are open at once
+#   - when there are more entries than free slots / cash, higher `priority`
+#     wins (ties: symbol order); the rest are counted as missed
+
+
+# ================= ALIGN =================
+
+def align(frames, names):
+    # frames: {symbol: DataFrame with Date + names}
+    # -> dates (datetime64), symbols, {name: (symbols, dates) float array}
+    symbols = list(frames)
+    dates = np.unique(np.concatenate([f["Date"].to_numpy(dtype="datetime64[ns]") for f in frames.values()]))
+
+    panel = {n: np.full((len(symbols), len(dates)), np.nan) for n in names}
+    for s, sym in enumerate(symbols):
+        f = frames[sym]
+        at = np.searchsorted(dates, f["Date"].to_numpy(dtype="datetime64[ns]"))
+        for n in names:
+            panel[n][s, at] = f[n].to_numpy(dtype=float)
+    return dates, symbols, panel
+
+
+def load_panel(strategy, paths):
+    spec = STRATEGIES[strategy]
+    frames = {symbol_key(path): spec["load"](path) for path in paths}
+    dates, symbols, columns = align(frames, spec["columns"])
+    return {"dates": dates, "symbols": symbols, "columns": columns}
+
+
+def ffill(x):
+    # last valid value along the date axis, NaN before a symbol's first bar
+    idx = np.where(np.isnan(x), 0, np.arange(x.shape[1]))
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    return x[np.arange(x.shape[0])[:, None], idx]
+
+
+# ================= BACKTEST =================
+
+def backtest(panel, strategy, initial_capital=100000, capital_per_trade=10000, max_positions=10,
+             priority=None, **params):
+    # priority: optional (symbols, dates) array, larger = filled first
+    dates, symbols, c = panel["dates"], panel["symbols"], panel["columns"]
+    price = c["Close"]
+    n_symbols, n_dates = price.shape
+
+    sig = STRATEGIES[strategy]["signals"](c, **params)
+    valid = ~np.isnan(price)
+    long_entry = sig["long_entry"] & valid
+    short_entry = sig["short_entry"] & valid
+    no_exit = np.zeros(price.shape, dtype=bool)
+    long_exit = sig.get("long_exit", no_exit)
+    short_exit = sig.get("short_exit", no_exit)
+
+    # like run_trades(start=1), a symbol's first bar never enters
+    first = valid.argmax(axis=1)
+    long_entry[np.arange(n_symbols), first] = False
+    short_entry[np.arange(n_symbols), first] = False
+    any_entry = long_entry | short_entry
+
+    mark = ffill(price)
+
+    # open positions, one slot per symbol
+    is_open = np.zeros(n_symbols, dtype=bool)
+    direction = np.zeros(n_symbols, dtype=np.int8)
+    entry_idx = np.zeros(n_symbols, dtype=np.int64)
+    entry_price = np.zeros(n_symbols)
+    shares = np.zeros(n_symbols)
+    sl = np.zeros(n_symbols)
+    tp = np.zeros(n_symbols)
+
+    cash = float(initial_capital)
+    equity = np.empty(n_dates)
+    cash_curve = np.empty(n_dates)
+    n_open = np.empty(n_dates, dtype=np.int64)
+    missed = np.zeros(n_symbols, dtype=np.int64)
+    closed = []
+
+    rows = np.arange(n_symbols)
+    for t in range(n_dates):
+        p = price[:, t]
+
+        # ---- exits at today's close ----
+        exited = np.zeros(n_symbols, dtype=bool)
+        live = is_open & valid[:, t]
+        if live.any():
+            s = rows[live]
+            d = direction[s]
+            longs = d == 1
+            hit_sl = np.where(longs, p[s] <= sl[s], p[s] >= sl[s])
+            hit_tp = np.where(longs, p[s] >= tp[s], p[s] <= tp[s])
+            hit_signal = np.where(longs, long_exit[s, t], short_exit[s, t])
+            out = hit_sl | hit_tp | hit_signal
+
+            if out.any():
+                s, d = s[out], d[out]
+                reason = np.where(hit_sl[out], engine.SL, np.where(hit_tp[out], engine.TP, engine.SIGNAL))
+                pnl = d * (p[s] - entry_price[s]) * shares[s]
+                cash += capital_per_trade * len(s) + pnl.sum()
+                closed.append((s, entry_idx[s], np.full(len(s), t), d, entry_price[s], p[s],
+                               shares[s], pnl, reason.astype(np.int8)))
+                is_open[s] = False
+                exited[s] = True
+
+        # ---- entries, best priority first, while slots and cash last ----
+        want = any_entry[:, t] & ~is_open & ~exited
+        if want.any():
+            s = rows[want]
+            if priority is not None:
+                s = s[np.argsort(-priority[s, t], kind="stable")]
+            room = min(max_positions - int(is_open.sum()), int(cash // capital_per_trade))
+            room = max(room, 0)
+            missed[s[room:]] += 1
+            s = s[:room]
+
+            if len(s):
+                longs = long_entry[s, t]
+                direction[s] = np.where(longs, 1, -1)
+                entry_idx[s] = t
+                entry_price[s] = p[s]
+                shares[s] = capital_per_trade / p[s]
+                sl[s] = np.where(longs, sig["long_sl"][s, t], sig["short_sl"][s, t])
+                tp[s] = np.where(longs, sig["long_tp"][s, t], sig["short_tp"][s, t])
+                is_open[s] = True
+                cash -= capital_per_trade * len(s)
+
+        # ---- mark to market: committed capital plus open P&L ----
+        held = rows[is_open]
+        open_pnl = (direction[held] * (mark[held, t] - entry_price[held]) * shares[held]).sum()
+        equity[t] = cash + capital_per_trade * len(held) + open_pnl
+        cash_curve[t] = cash
+        n_open[t] = len(held)
+
+    trades = _trade_table(closed, dates, symbols)
+    held = rows[is_open]
+    open_pnl = np.zeros(n_symbols)
+    open_pnl[held] = direction[held] * (mark[held, -1] - entry_price[held]) * shares[held]
+
+    return {
+        "dates": dates,
+        "symbols": symbols,
+        "equity": equity,
+        "cash": cash_curve,
+        "positions": n_open,
+        "trades": trades,
+        "attribution": _attribution(trades, symbols, open_pnl, missed),
+    }
+
+
+def _trade_table(closed, dates, symbols):
+    names = ["symbol", "entry_idx", "exit_idx", "direction", "entry_price", "exit_price",
+             "shares", "pnl", "reason"]
+    if closed:
+        cols = [np.concatenate(parts) for parts in zip(*closed)]
+    else:
+        cols = [np.empty(0, dtype=np.int64)] * 3 + [np.empty(0, dtype=np.int8)] + [np.empty(0)] * 4 \
+            + [np.empty(0, dtype=np.int8)]
+    t = dict(zip(names, cols))
+
+    return pd.DataFrame({
+        "symbol": np.asarray(symbols, dtype=object)[t["symbol"]],
+        "entry_date": dates[t["entry_idx"]],
+        "exit_date": dates[t["exit_idx"]],
+        "direction": t["direction"],
+        "entry_price": t["entry_price"],
+        "exit_price": t["exit_price"],
+        "shares": t["shares"],
+        "pnl": t["pnl"],
+        "reason": engine.EXIT_REASONS[t["reason"]],
+    }).sort_values(["exit_date", "symbol"], kind="stable").reset_index(drop=True)
+
+
+def _attribution(trades, symbols, open_pnl, missed):
+    g = trades.groupby("symbol")
+    out = pd.DataFrame(index=pd.Index(symbols, name="symbol"))
+    out["trades"] = g.size()
+    out["win_rate"] = g["pnl"].apply(lambda x: (x > 0).mean())
+    out["realized_pnl"] = g["pnl"].sum()
+    out = out.fillna({"trades": 0, "realized_pnl": 0.0})
+    out["trades"] = out["trades"].astype(int)
+    out["open_pnl"] = open_pnl
+    out["total_pnl"] = out["realized_pnl"] + out["open_pnl"]
+    total = out["total_pnl"].sum()
+    out["share_of_pnl"] = out["total_pnl"] / total if total else np.nan
+    out["missed_entries"] = missed
+    return out.reset_index()
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    from data.fetch import SYMBOLS, raw_path
+
+    INITIAL_CAPITAL = 100000
+    CAPITAL_PER_TRADE = 10000
+    MAX_POSITIONS = 5
+
+    panel = load_panel("breakout", [raw_path(s) for s in SYMBOLS])
+    r = backtest(panel, "breakout", INITIAL_CAPITAL, CAPITAL_PER_TRADE, MAX_POSITIONS)
+
+    final = r["equity"][-1]
+    curve = metrics.equity_stats(
+        r["equity"], metrics.years_between(r["dates"]), in_market=r["positions"] > 0,
+    )
+
+    print("\n===== PORTFOLIO (breakout) =====")
+    print("Symbols       :", len(r["symbols"]), "|", len(r["dates"]), "dates")
+    print("Final Capital :", round(final, 2))
+    print("Total Return  :", round((final / INITIAL_CAPITAL - 1) * 100, 2), "%")
+    print("CAGR          :", round(curve["cagr"] * 100, 2), "%")
+    print("Max Drawdown  :", round(curve["max_drawdown"] * 100, 2), "%")
+    print("Sharpe        :", round(curve["sharpe"], 2))
+    print("Exposure      :", round(curve["exposure"] * 100, 2), "%")
+    print("Trades        :", len(r["trades"]))
+    print("Avg Positions :", round(r["positions"].mean(), 2))
+    print()
+    print(r["attribution"].to_string(index=False))
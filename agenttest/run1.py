@@ -1,97 +1,27 @@
-import pandas as pd
-import numpy as np
+from data import store
+from agenttest import engine, strategies, metrics
+from data.instrument import laps
 
 def define(path_run):
+    with laps(symbol=store.symbol_key(path_run)) as lap:
+        lap("load")
+        df = strategies.load_breakout(path_run)
 
-    df = pd.read_csv(path_run)
-    df["Date"] = pd.to_datetime(df["Date"])
-    df["date_only"] = df["Date"].dt.date
+        FIXED_CAPITAL_PER_TRADE = 10000
 
-  
+        # ===== ENTRY (ALPHA SIGNAL) / EXIT =====
+        lap("backtest", rows=len(df))
+        c = engine.columns(df, strategies.BREAKOUT_COLUMNS)
+        trades, returns = strategies.breakout(c, capital_per_trade=FIXED_CAPITAL_PER_TRADE)
 
-    df = df.dropna().reset_index(drop=True)
-
-    INITIAL_CAPITAL = 10000
-    FIXED_CAPITAL_PER_TRADE = 10000
-    cash = INITIAL_CAPITAL
-    position = 0
-    direction = 0
-    entry_price = 0
-    shares = 0
-    sl = 0
-
-    trade_returns = []
-
-    for i in range(1, len(df)):
-
-        price = df.loc[i,"Close"]
-        ema50 = df.loc[i,"ema_50"]
-        ema200 = df.loc[i,"ema_200"]
-        rsi = df.loc[i,"rsi"]
-        atr = df.loc[i,"atr"]
-
-        dist = df.loc[i,"dist_ema50"]
-        rsi_slope = df.loc[i,"rsi_slope"]
-        vol_contr = df.loc[i,"vol_contraction"]
-        breakout = df.loc[i,"breakout"]
-
-        # ===== ENTRY (ALPHA SIGNAL) =====
-        if position == 0:
-
-            if (
-                ema50 > ema200 and
-                dist > 0.01 and
-                rsi_slope > 3 and
-                vol_contr and
-                breakout
-            ):
-                direction = 1
-
-            elif (
-                ema50 < ema200 and
-                dist < -0.01 and
-                rsi_slope < -3 and
-                vol_contr and
-                breakout
-            ):
-                direction = -1
-            else:
-                continue
-
-            position = 1
-            entry_price = price
-            shares = FIXED_CAPITAL_PER_TRADE / price
-
-            sl = entry_price - 1.5 * atr if direction == 1 else entry_price + 1.5 * atr
-            tp = entry_price + 3 * atr if direction == 1 else entry_price - 3 * atr
-
-        # ===== EXIT =====
-        elif position == 1:
-
-            exit_trade = False
-
-            if direction == 1 and (price <= sl or price >= tp):
-                exit_trade = True
-            elif direction == -1 and (price >= sl or price <= tp):
-                exit_trade = True
-
-            if exit_trade:
-                pnl = (price - entry_price) * shares if direction == 1 else (entry_price - price) * shares
-                cash += pnl
-                trade_returns.append(pnl / FIXED_CAPITAL_PER_TRADE)
-
-                position = 0
-                direction = 0
-                shares = 0
-
-    # ===== RESULTS =====
-    wins = [r for r in trade_returns if r > 0]
-    losses = [r for r in trade_returns if r < 0]
+        # ===== RESULTS =====
+        lap("stats", trades=len(returns))
+        stats = metrics.trade_stats(returns)
 
     print("\n", path_run)
-    print("Trades:", len(trade_returns))
-    print("Win Rate:", round(len(wins)/len(trade_returns)*100,2) if trade_returns else 0)
-    print("Mean Return:", round(np.mean(trade_returns)*100,2) if trade_returns else 0)
+    print("Trades:", stats["trades"])
+    print("Win Rate:", round(stats["win_rate"]*100,2) if stats["trades"] else 0)
+    print("Mean Return:", round(stats["mean_return"]*100,2) if stats["trades"] else 0)
 print("\n adanipower")
 define("csvfile/adanipower_2020_2025_daily.csv")
 
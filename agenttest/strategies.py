@@ -0,0 +1,355 @@
+import numpy as np
+
+from data import store
+from data.store import load_features
+from data.cache import CACHE
+from data.instrument import NO_LAPS
+from agenttest import engine, metrics
+from agenttest.ledger import ADX_THRESHOLD
+
+# The entry / exit rules of every backtest script, as functions of column arrays
+# and keyword parameters (the scripts' constants, lower-cased). The scripts call
+# these with their own constants; sweep.py calls them with a parameter grid.
+#
+# *_signals only build the engine.run_trades inputs and are elementwise over
+# the columns, so they work on 1-D columns, on (symbols, dates) panels
+# (portfolio.py) and on the scalars of a single bar (stream.py). The run
+# functions add the engine pass and the strategy's P&L (*_returns, from the
+# trades of an engine pass).
+#
+# intrabar=True checks stops and targets against each bar's High / Low
+# (engine.first_touch) instead of the close.
+#
+# load_* reads the strategy's stored features; prepare_* is the part that turns
+# a featured frame into the strategy's rows, for frames built some other way.
+#
+#   spec = STRATEGIES["regime"]
+#   c = engine.columns(spec["load"](path), spec["columns"])
+#   trades, returns = spec["run"](c, atr_mult=2.0)
+#
+# with_indicators swaps the stored ema_50 / ema_200 / rsi / atr / adx columns
+# for the same indicators at other parameters, through data.cache.CACHE, so a
+# sweep over EMA spans computes each span once per symbol.
+#
+# regime_run / trend_run are the whole per-symbol run of getdata.py / run.py
+# (load, backtest, ledger rows), shared with bench/suite.py so the benchmark
+# times what the scripts run.
+
+
+def bar_range(c, intrabar):
+    # run_trades arguments for stops / targets checked against High / Low
+    return {"high": c["High"], "low": c["Low"], "open_": c["Open"]} if intrabar else {}
+
+
+# ================= INDICATOR PARAMETERS =================
+# build_features stores ema_50 / ema_200 / rsi(14) / atr(14) / adx(14). These
+# parameters recompute them from the loaded bars (warm-up starts at the first
+# loaded row, not the first raw bar), cached per (symbol, indicator, parameter).
+
+INDICATOR_PARAMS = ["ema_fast", "ema_slow", "rsi_n", "atr_n", "adx_n"]
+
+
+def _lag(x):
+    return np.concatenate([[np.nan], x[:-1]])
+
+
+def with_indicators(c, symbol, ema_fast=None, ema_slow=None, rsi_n=None, atr_n=None, adx_n=None,
+                    cache=CACHE):
+    # -> a copy of c with the given indicators replaced, None keeps the stored column
+    out = dict(c)
+    close = c["Close"]
+    if ema_fast is not None:
+        out["ema_50"] = cache.ema(symbol, close, ema_fast)
+        if "ema_50_prev" in c:
+            out["ema_50_prev"] = _lag(out["ema_50"])
+    if ema_slow is not None:
+        out["ema_200"] = cache.ema(symbol, close, ema_slow)
+    if rsi_n is not None:
+        out["rsi"] = cache.rsi(symbol, close, rsi_n)
+    if atr_n is not None:
+        out["atr"] = cache.atr(symbol, c["High"], c["Low"], close, atr_n)
+    if adx_n is not None:
+        out["adx"] = cache.adx(symbol, c["High"], c["Low"], close, adx_n)
+    return out
+
+
+def split_params(params):
+    # -> (indicator parameters, strategy parameters)
+    indicators = {k: v for k, v in params.items() if k in INDICATOR_PARAMS}
+    return indicators, {k: v for k, v in params.items() if k not in INDICATOR_PARAMS}
+
+
+# ================= getdata.py: EMA trend + RSI + ADX, ATR stop / target =================
+
+REGIME_COLUMNS = ["Open", "High", "Low", "Close", "ema_50", "ema_200", "rsi", "atr", "adx"]
+
+
+def prepare_regime(df):
+    return df
+
+
+def load_regime(path):
+    return prepare_regime(load_features(path, ["Date"] + REGIME_COLUMNS))
+
+
+def regime_signals(c, atr_mult=1.5, tp_mult=2.0, adx_min=20, rsi_long_max=60, rsi_short_min=40,
+                   rsi_long_exit=70, rsi_short_exit=30):
+    price, ema50, ema200 = c["Close"], c["ema_50"], c["ema_200"]
+    rsi, atr, adx = c["rsi"], c["atr"], c["adx"]
+    return {
+        "long_entry": (ema50 > ema200) & (rsi < rsi_long_max) & (adx > adx_min),
+        "short_entry": (ema50 < ema200) & (rsi > rsi_short_min) & (adx > adx_min),
+        "long_sl": price - atr_mult * atr,
+        "long_tp": price + tp_mult * atr,
+        "short_sl": price + atr_mult * atr,
+        "short_tp": price - tp_mult * atr,
+        "long_exit": rsi >= rsi_long_exit,
+        "short_exit": rsi <= rsi_short_exit,
+    }
+
+
+def regime_returns(c, trades, adx_threshold=ADX_THRESHOLD, regime="all"):
+    # regime: "trend" / "sideways" keeps only trades whose ADX at exit is
+    # above / at or below adx_threshold, "all" keeps every trade
+    returns = engine.trade_returns(trades)
+    if regime != "all":
+        trend = c["adx"][trades["exit_idx"]] > adx_threshold
+        returns = returns[trend if regime == "trend" else ~trend]
+    return returns
+
+
+def regime(c, adx_threshold=ADX_THRESHOLD, regime="all", intrabar=False, **params):
+    trades = engine.run_trades(c["Close"], **regime_signals(c, **params), **bar_range(c, intrabar))
+    return trades, regime_returns(c, trades, adx_threshold, regime)
+
+
+def regime_run(ledger, path, lap=NO_LAPS, **params):
+    # getdata.py's run of one symbol: its trades go into the ledger with the
+    # ADX, ATR / close and EMA trend at exit -> dict of the frame, trades and
+    # ledger rows
+    lap("load")
+    df = load_regime(path)
+    c = engine.columns(df, REGIME_COLUMNS)
+    lap("backtest", rows=len(df))
+    trades, ret = regime(c, **params)
+
+    lap("ledger", trades=len(ret))
+    x = trades["exit_idx"]
+    # EMA trend 0 ("unknown") where an EMA is still NaN
+    ema_trend = np.nan_to_num(np.sign(c["ema_50"][x] - c["ema_200"][x]))
+    rows = ledger.append(
+        store.symbol_key(path), trades, df["Date"], returns=ret, regime=c["adx"][x],
+        atr_pct=c["atr"][x] / c["Close"][x], ema_trend=ema_trend,
+    )
+    return {"df": df, "trades": trades, "rows": rows}
+
+
+# ================= run.py: EMA trend + RSI band + volume, ATR stop =================
+
+TREND_COLUMNS = ["Open", "High", "Low", "Close", "ema_50", "ema_200", "ema_50_prev", "rsi", "atr", "Volume", "avg_volume_20"]
+
+TREND_FEATURES = ["Date", "Open", "High", "Low", "Close", "Volume", "ema_50", "ema_200", "rsi", "atr"]
+
+
+def prepare_trend(df):
+    # run.py recomputes the 20 bar volume average and drops its warm-up rows
+    df = df[TREND_FEATURES].copy()
+    df["avg_volume_20"] = df["Volume"].rolling(20).mean()
+    df["date_only"] = df["Date"].dt.date
+    df = df.dropna().reset_index(drop=True)
+    df["ema_50_prev"] = df["ema_50"].shift()
+    return df
+
+
+def load_trend(path):
+    return prepare_trend(load_features(path, TREND_FEATURES))
+
+
+def trend_signals(c, atr_mult=1.5, trend_threshold=0.01, ema_meet_threshold=0.001, slope_threshold=0.0005,
+                  rsi_entry_low=40, rsi_entry_high=60, rsi_long_tp=70, rsi_short_tp=30):
+    price, ema50, ema200 = c["Close"], c["ema_50"], c["ema_200"]
+    rsi, atr, ema50_prev = c["rsi"], c["atr"], c["ema_50_prev"]
+
+    trend_strength = abs(ema50 - ema200) / price
+    ema50_slope = (ema50 - ema50_prev) / ema50_prev
+    volume_condition = c["Volume"] > c["avg_volume_20"]
+    rsi_in_band = (rsi_entry_low <= rsi) & (rsi <= rsi_entry_high)
+    ema_meet = abs(ema50 - ema200) / price < ema_meet_threshold
+    tradable = (trend_strength > trend_threshold) & volume_condition
+
+    return {
+        "long_entry": tradable & (ema50 > ema200) & (price > ema50) & (ema50_slope > slope_threshold) & rsi_in_band,
+        "short_entry": tradable & (ema50 < ema200) & (price < ema50) & (ema50_slope < -slope_threshold) & rsi_in_band,
+        # stop loss only, exits otherwise come from RSI or the EMAs meeting
+        "long_sl": price - atr_mult * atr,
+        "long_tp": np.full_like(price, np.inf),
+        "short_sl": price + atr_mult * atr,
+        "short_tp": np.full_like(price, -np.inf),
+        "long_exit": (rsi >= rsi_long_tp) | ema_meet,
+        "short_exit": (rsi <= rsi_short_tp) | ema_meet,
+    }
+
+
+def trend_returns(c, trades, capital_per_trade=10000):
+    return engine.fixed_notional_pnl(trades, capital_per_trade) / capital_per_trade
+
+
+def trend(c, capital_per_trade=10000, intrabar=False, **params):
+    trades = engine.run_trades(c["Close"], **trend_signals(c, **params), **bar_range(c, intrabar))
+    return trades, trend_returns(c, trades, capital_per_trade)
+
+
+def trend_run(ledger, path, initial_capital=10000, capital_per_trade=10000, lap=NO_LAPS, **params):
+    # run.py's run of one symbol: fixed-notional trades into the ledger, the
+    # realized capital curve and its stats -> dict of all of them
+    lap("load")
+    df = load_trend(path)
+
+    lap("backtest", rows=len(df))
+    c = engine.columns(df, TREND_COLUMNS)
+    trades, _ = trend(c, capital_per_trade=capital_per_trade, **params)
+    pnl = engine.fixed_notional_pnl(trades, capital_per_trade)
+    capital = engine.cash_curve(pnl, trades["exit_idx"], initial_capital, len(df))
+    cash = engine.cash_curve(pnl, trades["exit_idx"], initial_capital, len(df) + 1)[-1]
+    rows = ledger.append(
+        store.symbol_key(path), trades, df["Date"],
+        shares=capital_per_trade / trades["entry_price"], pnl=pnl, returns=pnl / capital_per_trade,
+    )
+
+    lap("stats", trades=len(rows))
+    years = metrics.years_between(df["Date"])
+    # realized capital curve, in the market from the bar after entry to the exit
+    open_entry = trades["open"]["entry_idx"] if trades["open"] is not None else None
+    held = metrics.holding_mask(trades["entry_idx"], trades["exit_idx"], len(df), open_entry)
+    return {
+        "df": df, "trades": trades, "rows": rows, "capital": capital, "cash": cash, "years": years,
+        "stats": metrics.trade_stats(rows["return"]), "curve": metrics.equity_stats(capital, years, in_market=held),
+    }
+
+
+# ================= run1.py: breakout out of volatility contraction =================
+
+BREAKOUT_COLUMNS = ["Open", "High", "Low", "Close", "ema_50", "ema_200", "atr", "dist_ema50", "rsi_slope", "vol_contraction", "breakout"]
+
+
+BREAKOUT_FEATURES = [
+    "Date", "Open", "High", "Low", "Close", "ema_50", "ema_200", "rsi", "atr",
+    "dist_ema50", "rsi_slope", "vol_contraction", "breakout",
+]
+
+
+def prepare_breakout(df):
+    df = df[BREAKOUT_FEATURES].copy()
+    df["date_only"] = df["Date"].dt.date
+    return df.dropna().reset_index(drop=True)
+
+
+def load_breakout(path):
+    return prepare_breakout(load_features(path, BREAKOUT_FEATURES))
+
+
+def breakout_signals(c, dist_min=0.01, rsi_slope_min=3, atr_mult=1.5, tp_mult=3):
+    price, ema50, ema200, atr = c["Close"], c["ema_50"], c["ema_200"], c["atr"]
+    dist, rsi_slope = c["dist_ema50"], c["rsi_slope"]
+    setup = (c["vol_contraction"] != 0) & (c["breakout"] != 0)
+
+    return {
+        "long_entry": (ema50 > ema200) & (dist > dist_min) & (rsi_slope > rsi_slope_min) & setup,
+        "short_entry": (ema50 < ema200) & (dist < -dist_min) & (rsi_slope < -rsi_slope_min) & setup,
+        "long_sl": price - atr_mult * atr,
+        "long_tp": price + tp_mult * atr,
+        "short_sl": price + atr_mult * atr,
+        "short_tp": price - tp_mult * atr,
+    }
+
+
+def breakout_returns(c, trades, capital_per_trade=10000):
+    return engine.fixed_notional_pnl(trades, capital_per_trade) / capital_per_trade
+
+
+def breakout(c, capital_per_trade=10000, intrabar=False, **params):
+    trades = engine.run_trades(c["Close"], **breakout_signals(c, **params), **bar_range(c, intrabar))
+    return trades, breakout_returns(c, trades, capital_per_trade)
+
+
+# ================= money.py: ML probability thresholds, % stop / target =================
+
+ML_PROB_COLUMNS = ["Close", "prob_up"]
+
+
+def prepare_ml_prob(df):
+    return df
+
+
+def load_ml_prob(path):
+    return prepare_ml_prob(load_features(path, ["Date"] + ML_PROB_COLUMNS))
+
+
+def risk_sized_pnl(trades, initial_capital, risk_per_trade, sl_pct):
+    # risk a fraction of current cash per trade, so each size depends on the
+    # trades before it: one pass over trades, not over bars.
+    # Returns (shares, pnl, shares of the trade still open or 0.0)
+    entries = trades["entry_price"]
+    exits = trades["exit_price"]
+    shares = np.empty(len(entries))
+    pnl = np.empty(len(entries))
+
+    cash = initial_capital
+    for k in range(len(entries)):
+        risk_amt = cash * risk_per_trade
+        shares[k] = risk_amt / (entries[k] * sl_pct)
+        if trades["direction"][k] == 1:
+            pnl[k] = (exits[k]-entries[k])*shares[k]
+        else:
+            pnl[k] = (entries[k]-exits[k])*shares[k]
+        cash += pnl[k]
+
+    open_shares = 0.0
+    if trades["open"] is not None:
+        open_shares = cash * risk_per_trade / (trades["open"]["entry_price"] * sl_pct)
+    return shares, pnl, open_shares
+
+
+def ml_prob_signals(c, long_prob=0.60, short_prob=0.40, sl_pct=0.02, tp_pct=0.04):
+    price, prob = c["Close"], c["prob_up"]
+    return {
+        "long_entry": prob > long_prob,
+        "short_entry": prob < short_prob,
+        "long_sl": price*(1-sl_pct),
+        "long_tp": price*(1+tp_pct),
+        "short_sl": price*(1+sl_pct),
+        "short_tp": price*(1-tp_pct),
+    }
+
+
+def ml_prob_returns(c, trades, sl_pct=0.02, risk_per_trade=0.02, initial_capital=10000):
+    _, pnl, _ = risk_sized_pnl(trades, initial_capital, risk_per_trade, sl_pct)
+    return pnl / initial_capital
+
+
+def ml_prob(c, long_prob=0.60, short_prob=0.40, sl_pct=0.02, tp_pct=0.04,
+            risk_per_trade=0.02, initial_capital=10000, intrabar=False):
+    # intrabar needs Open / High / Low in c, the probability files only carry Close
+    trades = engine.run_trades(c["Close"], **ml_prob_signals(c, long_prob, short_prob, sl_pct, tp_pct),
+                               **bar_range(c, intrabar))
+    return trades, ml_prob_returns(c, trades, sl_pct, risk_per_trade, initial_capital)
+
+
+STRATEGIES = {
+    "regime": {
+        "load": load_regime, "prepare": prepare_regime, "columns": REGIME_COLUMNS,
+        "signals": regime_signals, "returns": regime_returns, "run": regime,
+    },
+    "trend": {
+        "load": load_trend, "prepare": prepare_trend, "columns": TREND_COLUMNS,
+        "signals": trend_signals, "returns": trend_returns, "run": trend,
+    },
+    "breakout": {
+        "load": load_breakout, "prepare": prepare_breakout, "columns": BREAKOUT_COLUMNS,
+        "signals": breakout_signals, "returns": breakout_returns, "run": breakout,
+    },
+    "ml_prob": {
+        "load": load_ml_prob, "prepare": prepare_ml_prob, "columns": ML_PROB_COLUMNS,
+        "signals": ml_prob_signals, "returns": ml_prob_returns, "run": ml_prob,
+    },
+}
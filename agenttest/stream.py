@@ -0,0 +1,383 @@
+import pandas as pd
+import math
+import time
+from collections import deque
+
+from data.util import OHLCV, clean_bars, compute_features
+from data.store import symbol_key
+from agenttest import engine
+from agenttest.strategies import STRATEGIES
+
+# Bar-by-bar version of the backtests for live / paper trading.
+#
+#   engine = StreamEngine("breakout")
+#   for symbol, bar in feed:                     # bar: {"Date", "Open", ..., "Volume"}
+#       for event in engine.on_bar(symbol, bar):
+#           send(event)                          # entry / exit with side and qty
+#
+# Every indicator of build_features is carried as running state (EWM means,
+# fixed size windows), so a bar costs the same no matter how long the history
+# is. Values follow data/indicators.py operation for operation, and the entry /
+# exit rules are the *_signals functions of strategies.py evaluated on the
+# scalars of one bar, so a replay of a CSV gives the batch trades exactly
+# (see replay below).
+
+
+def _div(a, b):
+    # a / b with NumPy's answers for b == 0 instead of ZeroDivisionError
+    if b == 0:
+        if a != a or a == 0:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1., b)
+    return a / b
+
+
+# ================= RUNNING INDICATORS =================
+
+class EWM:
+    # one step of indicators.ewm (pandas ewm(adjust=False).mean()) per update
+
+    def __init__(self, com):
+        self.alpha = 1. / (1. + com)
+        self.decay = 1. - self.alpha
+        self.mean = math.nan
+        self.old_wt = 1.
+
+    def update(self, v):
+        mean = self.mean
+        if mean == mean:
+            self.old_wt *= self.decay
+            if v == v:
+                if mean != v:
+                    self.mean = (self.old_wt * mean + self.alpha * v) / (self.old_wt + self.alpha)
+                self.old_wt = 1.
+        elif v == v:
+            self.mean = v
+        return self.mean
+
+
+class Window:
+    # the last n values; mean() adds them oldest first like indicators.rolling_mean
+
+    def __init__(self, n):
+        self.n = n
+        self.values = deque(maxlen=n)
+
+    def push(self, v):
+        self.values.append(v)
+
+    def full(self):
+        return len(self.values) == self.n
+
+    def mean(self):
+        if len(self.values) < self.n:
+            return math.nan
+        it = iter(self.values)
+        total = next(it)
+        for v in it:
+            total += v
+        return total / self.n
+
+    def max(self):
+        if len(self.values) < self.n:
+            return math.nan
+        return math.nan if any(v != v for v in self.values) else max(self.values)
+
+    def ago(self, k):
+        # value pushed k updates before the last one
+        return self.values[-1 - k] if len(self.values) > k else math.nan
+
+
+class Features:
+    # the numeric columns of build_features, one bar at a time
+
+    def __init__(self):
+        wilder = (1 - 1/14) / (1/14)
+        self.ema_50 = EWM((50 - 1) / 2)
+        self.ema_200 = EWM((200 - 1) / 2)
+        self.avg_gain = EWM(wilder)
+        self.avg_loss = EWM(wilder)
+        self.atr = EWM(wilder)
+        self.plus_dm = EWM(wilder)
+        self.minus_dm = EWM(wilder)
+        self.adx = EWM(wilder)
+
+        self.close_20 = Window(20)
+        self.close_50 = Window(50)
+        self.volume_20 = Window(20)
+        self.volatility_20 = Window(20)
+        self.high_20 = Window(20)
+        self.rsi_6 = Window(6)
+        self.prev = None          # (high, low, close) of the previous bar
+        self.adx_prev = math.nan
+
+    def update(self, high, low, close, volume):
+        f = {}
+        if self.prev is None:
+            prev_high = prev_low = prev_close = math.nan
+        else:
+            prev_high, prev_low, prev_close = self.prev
+        self.prev = (high, low, close)
+
+        self.close_20.push(close)
+        self.close_50.push(close)
+        self.volume_20.push(volume)
+        f["sma_20"] = self.close_20.mean()
+        f["sma_50"] = self.close_50.mean()
+        f["avg_volume_20"] = self.volume_20.mean()
+
+        f["ema_50"] = self.ema_50.update(close)
+        f["ema_200"] = self.ema_200.update(close)
+
+        # ---- RSI ----
+        delta = close - prev_close
+        gain = max(delta, 0.)
+        loss = -min(delta, 0.)
+        f["rsi"] = 100 - _div(100, 1 + _div(self.avg_gain.update(gain), self.avg_loss.update(loss)))
+
+        # ---- ATR ----
+        tr = high - low
+        if prev_close == prev_close:
+            tr = max(tr, abs(high - prev_close), abs(low - prev_close))
+        f["atr"] = atr = self.atr.update(tr)
+
+        # ---- ADX (same directional movement as indicators.directional_movement) ----
+        up = high - prev_high
+        down = low - prev_low
+        plus = up if up > down and up > 0 else 0.
+        minus = -down if down > plus and down > 0 else 0.
+        plus_di = 100 * _div(self.plus_dm.update(plus), atr)
+        minus_di = 100 * _div(self.minus_dm.update(minus), atr)
+        dx = _div(abs(plus_di - minus_di), plus_di + minus_di) * 100
+        f["adx"] = self.adx.update(dx)
+        f["adx_prev"] = self.adx_prev
+        self.adx_prev = f["adx"]
+
+        f["dist_ema50"] = _div(close - f["ema_50"], f["ema_50"])
+        f["volatility"] = _div(atr, close)
+
+        self.rsi_6.push(f["rsi"])
+        f["rsi_slope"] = f["rsi"] - self.rsi_6.ago(5)
+
+        self.volatility_20.push(f["volatility"])
+        f["vol_contraction"] = float(f["volatility"] < self.volatility_20.mean())
+        f["breakout"] = float(close > self.high_20.max())
+        self.high_20.push(high)
+        return f
+
+
+# ================= COLUMNS PER STRATEGY =================
+# what each strategy's loader does to the stored feature rows, bar by bar.
+# Returns the column values of the bar, or None while the strategy warms up.
+
+def _feature_row(s, bar):
+    f = s.features.update(bar["High"], bar["Low"], bar["Close"], bar["Volume"])
+    if any(v != v for v in f.values()):
+        return None          # build_features drops rows with any missing feature
+    f["Close"] = bar["Close"]
+    f["Volume"] = bar["Volume"]
+    return f
+
+
+def _trend_row(s, bar):
+    f = _feature_row(s, bar)
+    if f is None:
+        return None
+    # load_trend: 20 bar volume average over the stored rows, then ema_50 shifted
+    s.volume_20.push(f["Volume"])
+    if not s.volume_20.full():
+        return None
+    f["avg_volume_20"] = s.volume_20.mean()
+    f["ema_50_prev"] = s.ema_50_prev
+    s.ema_50_prev = f["ema_50"]
+    return f
+
+
+def _bar_row(s, bar):
+    return bar
+
+
+ROWS = {"regime": _feature_row, "trend": _trend_row, "breakout": _feature_row, "ml_prob": _bar_row}
+
+
+# ================= ONE SYMBOL =================
+
+class SymbolStream:
+    # strategy state for one symbol: indicators, the open position and cash.
+    # Orders are sized at capital_per_trade of notional, or, with risk_per_trade,
+    # at that fraction of cash over the distance to the stop.
+
+    def __init__(self, strategy, symbol, capital_per_trade=10000, risk_per_trade=None,
+                 initial_capital=10000, **params):
+        self.strategy = strategy
+        self.symbol = symbol
+        self.signals = STRATEGIES[strategy]["signals"]
+        self.row = ROWS[strategy]
+        self.params = params
+        self.capital_per_trade = capital_per_trade
+        self.risk_per_trade = risk_per_trade
+        self.cash = float(initial_capital)
+
+        self.features = Features()
+        self.volume_20 = Window(20)
+        self.ema_50_prev = math.nan
+
+        self.bars = 0             # bars the strategy has seen, run_trades' index
+        self.position = None
+
+    def on_bar(self, bar):
+        # bar: dict with Date and OHLCV (ml_prob: Date, Close, prob_up)
+        # -> list of events (empty, an exit, an entry)
+        if not _valid(bar, self.strategy):
+            return []
+        c = self.row(self, bar)
+        if c is None:
+            return []
+
+        i = self.bars
+        self.bars += 1
+        price = c["Close"]
+        sig = self.signals(c, **self.params)
+
+        if self.position is not None:
+            return self._check_exit(bar, price, sig)
+
+        # like run_trades(start=1), the first bar never enters
+        if i >= 1:
+            if sig["long_entry"]:
+                return [self._enter(bar, price, 1, sig["long_sl"], sig["long_tp"])]
+            if sig["short_entry"]:
+                return [self._enter(bar, price, -1, sig["short_sl"], sig["short_tp"])]
+        return []
+
+    def _enter(self, bar, price, direction, sl, tp):
+        sl, tp = float(sl), float(tp)
+        if self.risk_per_trade is None:
+            qty = self.capital_per_trade / price
+        else:
+            qty = self.cash * self.risk_per_trade / abs(price - sl)
+
+        self.position = {"date": bar["Date"], "direction": direction, "price": price,
+                         "sl": sl, "tp": tp, "qty": qty}
+        return {
+            "symbol": self.symbol, "date": bar["Date"], "action": "entry",
+            "side": "buy" if direction == 1 else "sell", "qty": qty,
+            "direction": direction, "price": price, "sl": sl, "tp": tp,
+        }
+
+    def _check_exit(self, bar, price, sig):
+        p = self.position
+        if p["direction"] == 1:
+            hit_sl, hit_tp, hit_signal = price <= p["sl"], price >= p["tp"], sig.get("long_exit", False)
+        else:
+            hit_sl, hit_tp, hit_signal = price >= p["sl"], price <= p["tp"], sig.get("short_exit", False)
+        if not (hit_sl or hit_tp or hit_signal):
+            return []
+
+        reason = engine.SL if hit_sl else engine.TP if hit_tp else engine.SIGNAL
+        pnl = p["direction"] * (price - p["price"]) * p["qty"]
+        self.cash += pnl
+        self.position = None
+        return [{
+            "symbol": self.symbol, "date": bar["Date"], "action": "exit",
+            "side": "sell" if p["direction"] == 1 else "buy", "qty": p["qty"],
+            "direction": p["direction"], "price": price, "entry_date": p["date"],
+            "entry_price": p["price"], "reason": str(engine.EXIT_REASONS[reason]), "pnl": pnl,
+        }]
+
+
+def _valid(bar, strategy):
+    # bars with missing prices are skipped, as clean_bars drops them in batch
+    keys = ["Close"] if strategy == "ml_prob" else OHLCV
+    return all(bar[k] == bar[k] for k in keys)
+
+
+# ================= MANY SYMBOLS =================
+
+class StreamEngine:
+
+    def __init__(self, strategy, **params):
+        self.strategy = strategy
+        self.params = params
+        self.streams = {}
+
+    def on_bar(self, symbol, bar):
+        s = self.streams.get(symbol)
+        if s is None:
+            s = self.streams[symbol] = SymbolStream(self.strategy, symbol, **self.params)
+        return s.on_bar(bar)
+
+    def positions(self):
+        return {sym: s.position for sym, s in self.streams.items() if s.position is not None}
+
+
+# ================= REPLAY =================
+
+def to_bars(df, names):
+    columns = [df[n].astype(float).tolist() for n in names]
+    return [dict(zip(names, values), Date=d) for d, *values in zip(df["Date"], *columns)]
+
+
+def replay(strategy, path, **params):
+    # feeds a file through a SymbolStream and checks every trade against the batch run.
+    # The batch side is featured from the same bars: stored features may come
+    # from a longer history (the bundled CSVs start after their warm-up).
+    spec = STRATEGIES[strategy]
+    if strategy == "ml_prob":
+        batch_df = spec["load"](path)
+        bars = to_bars(batch_df, ["Close", "prob_up"])
+    else:
+        raw = clean_bars(pd.read_csv(path))
+        batch_df = spec["prepare"](compute_features(raw))
+        bars = to_bars(raw, OHLCV)
+    stream = SymbolStream(strategy, symbol_key(path), **params)
+
+    events = []
+    start = time.perf_counter()
+    for bar in bars:
+        events.extend(stream.on_bar(bar))
+    seconds = time.perf_counter() - start
+
+    streamed = [
+        (e["entry_date"], e["date"], e["direction"], e["entry_price"], e["price"], e["reason"])
+        for e in events if e["action"] == "exit"
+    ]
+
+    trades, _ = spec["run"](engine.columns(batch_df, spec["columns"]), **params)
+    dates = list(batch_df["Date"])
+    batch = [
+        (dates[e], dates[x], int(d), float(ep), float(xp), str(engine.EXIT_REASONS[r]))
+        for e, x, d, ep, xp, r in zip(trades["entry_idx"], trades["exit_idx"], trades["direction"],
+                                      trades["entry_price"], trades["exit_price"], trades["reason"])
+    ]
+
+    open_batch = trades["open"] and (dates[trades["open"]["entry_idx"]], trades["open"]["direction"])
+    open_stream = stream.position and (stream.position["date"], stream.position["direction"])
+
+    return {
+        "symbol": stream.symbol,
+        "bars": len(bars),
+        "us_per_bar": seconds / max(len(bars), 1) * 1e6,
+        "trades": len(streamed),
+        "match": streamed == batch and open_batch == open_stream,
+        "events": events,
+    }
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    from data.fetch import SYMBOLS, raw_path
+
+    for strategy in ["regime", "trend", "breakout"]:
+        print(f"\n===== REPLAY {strategy} =====")
+        for sym in SYMBOLS:
+            r = replay(strategy, raw_path(sym))
+            mark = "✅" if r["match"] else "❌"
+            print(f"{mark} {r['symbol']:<28} {r['bars']} bars | {r['trades']} trades | "
+                  f"{r['us_per_bar']:.1f} µs/bar")
+
+    print("\n===== REPLAY ml_prob =====")
+    r = replay("ml_prob", "csvfile/tatapower_2020_2025_daily_ml_probs.csv")
+    print(f"{'✅' if r['match'] else '❌'} {r['symbol']} {r['bars']} bars | {r['trades']} trades | "
+          f"{r['us_per_bar']:.1f} µs/bar")
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from data.store import symbol_key
+from agenttest import engine, metrics
+from agenttest.strategies import STRATEGIES, split_params, with_indicators
+
+# Parameter sweeps over the strategies in strategies.py:
+#
+#   grid = {"atr_mult": [1.0, 1.5, 2.0], "adx_min": [15, 20, 25]}
+#   table = sweep("regime", grid, ["csvfile/sail_2020_2025_daily.csv", ...])
+#
+# Every (combination, symbol) pair is one row of the result. Work is split into
+# (symbol, chunk of combinations) tasks so each worker loads a symbol's columns
+# once and reuses them for the whole chunk.
+#
+# Indicator parameters (strategies.INDICATOR_PARAMS) can sit in the grid too:
+#
+#   grid = {"ema_fast": [20, 30, 50], "ema_slow": [100, 150, 200], "atr_mult": [1.5, 2.0]}
+#
+# each EMA span is computed once per symbol (data.cache) and shared by every
+# combination that uses it.
+
+STATS = ["trades", "win_rate", "mean_return", "t_stat", "max_drawdown"]
+
+_columns = {}      # per worker process: (strategy, path) -> column arrays
+
+
+def expand(grid):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def stats(returns):
+    # returns: list of per-run trade return arrays -> {stat: array over runs}
+    r = metrics.pad(returns)
+    s = metrics.trade_stats(r)
+    empty = s["trades"] == 0
+    return {
+        "trades": s["trades"],
+        "win_rate": np.where(empty, 0., s["win_rate"]),
+        "mean_return": np.where(empty, 0., s["mean_return"]),
+        "t_stat": s["t_stat"],
+        # drawdown of the summed trade returns, starting from 1
+        "max_drawdown": metrics.max_drawdown(metrics.trade_curve(r)),
+    }
+
+
+def _load(strategy, path):
+    key = (strategy, path)
+    if key not in _columns:
+        spec = STRATEGIES[strategy]
+        _columns[key] = engine.columns(spec["load"](path), spec["columns"])
+    return _columns[key]
+
+
+def _run_chunk(strategy, path, combos, keep_trades=False):
+    c = _load(strategy, path)
+    run = STRATEGIES[strategy]["run"]
+    symbol = symbol_key(path)
+    returns = []
+    for params in combos:
+        indicators, rest = split_params(params)
+        cc = with_indicators(c, symbol, **indicators) if indicators else c
+        returns.append(np.asarray(run(cc, **rest)[1], dtype=float))
+    scores = stats(returns)
+    rows = [
+        {**params, "path": path, **{k: v[i] for k, v in scores.items()}}
+        for i, params in enumerate(combos)
+    ]
+    return (rows, returns) if keep_trades else rows
+
+
+def sweep(strategy, grid, paths, workers=None, chunk_size=64, ledger=None):
+    # strategy: a key of STRATEGIES; grid: {parameter: [values]}
+    # Returns one row per (combination, path) with the parameters, STATS and the
+    # combination's index `run`. ledger: a Ledger that also receives the trade
+    # returns of every run, tagged with symbol and run.
+    combos = expand(grid)
+    keep = ledger is not None
+    tasks = [
+        (strategy, path, combos[i:i + chunk_size], keep)
+        for path in paths
+        for i in range(0, len(combos), chunk_size)
+    ]
+
+    if workers == 1:
+        chunks = [_run_chunk(*t) for t in tasks]
+    else:
+        workers = workers or min(len(tasks), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_run_chunk, *zip(*tasks)))
+
+    if keep:
+        firsts = [i for _ in paths for i in range(0, len(combos), chunk_size)]
+        for (_, path, _, _), first, (_, returns) in zip(tasks, firsts, chunks):
+            for run, r in enumerate(returns, first):
+                if len(r):
+                    ledger.extend(symbol_key(path), run=np.full(len(r), run), **{"return": r})
+        chunks = [rows for rows, _ in chunks]
+
+    table = pd.DataFrame([row for rows in chunks for row in rows])
+    table["run"] = np.tile(np.arange(len(combos)), len(paths))
+    return table[list(grid) + ["run", "path"] + STATS]
+
+
+def summarize(table, grid):
+    # one row per combination, averaged over symbols, best mean t-stat first
+    params = list(grid)
+    out = table.groupby(params, as_index=False)[STATS].mean()
+    return out.sort_values("t_stat", ascending=False).reset_index(drop=True)
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    import time
+    from agenttest.ledger import Ledger
+
+    paths = [
+        "csvfile/adanipower_2020_2025_daily.csv",
+        "csvfile/bel_2020_2025_daily.csv",
+        "csvfile/infy_2020_2025_daily.csv",
+        "csvfile/itc_2020_2025_daily.csv",
+        "csvfile/sail_2020_2025_daily.csv",
+        "csvfile/sbin_2020_2025_daily.csv",
+        "csvfile/tatapower_2020_2025_daily.csv",
+        "csvfile/wipro_2020_2025_daily.csv",
+    ]
+    grid = {
+        "atr_mult": [1.0, 1.5, 2.0, 2.5],
+        "tp_mult": [1.5, 2.0, 3.0],
+        "adx_min": [15, 20, 25, 30],
+        "rsi_long_max": [50, 60, 70],
+        "rsi_short_min": [30, 40, 50],
+    }
+
+    start = time.perf_counter()
+    ledger = Ledger()
+    table = sweep("regime", grid, paths, ledger=ledger)
+    print(f"{len(table)} runs in {time.perf_counter() - start:.2f}s")
+
+    table.to_csv("csvfile/sweep_regime.csv", index=False)
+    ledger.save("csvfile/ledger_sweep_regime.npz")
+    print(summarize(table, grid).head(10).to_string(index=False))
+
+    # EMA spans of run.py's trend rule, each span computed once per symbol
+    from data.cache import CACHE
+    ema_grid = {"ema_fast": [10, 20, 30, 40, 50], "ema_slow": [100, 150, 200, 250, 300], "atr_mult": [1.5, 2.0]}
+    start = time.perf_counter()
+    ema_table = sweep("trend", ema_grid, paths, workers=1)
+    print(f"\n{len(ema_table)} EMA span runs in {time.perf_counter() - start:.2f}s | "
+          f"indicator cache: {CACHE.stats['misses']} computed, hit rate {CACHE.hit_rate():.0%}")
+    print(summarize(ema_table, ema_grid).head(5).to_string(index=False))
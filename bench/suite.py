@@ -0,0 +1,290 @@
+import pandas as pd
+import numpy as np
+import os
+import io
+import sys
+import glob
+import json
+import time
+import platform
+import tempfile
+import contextlib
+import subprocess
+import tracemalloc
+
+from bench import synthetic
+from data import store, util
+from agenttest import engine, strategies, metrics, bootstrap
+from agenttest.ledger import Ledger
+from probaility import significance
+from ml.model import FEATURES, load_dataset, make_model
+
+# Throughput of every pipeline stage on synthetic universes of growing size.
+#
+#   results = run_suite([(1, 5), (4, 10), (16, 20)])      # (symbols, years) per size
+#   save(results)                                         # csvfile/bench/<freq>_<commit>.json
+#   compare(load(previous_path), results)                 # stages that got slower
+#
+# Per size, synthetic.write_universe writes the raw CSVs into a scratch
+# directory and every stage runs there (the pipeline's relative csvfile/ paths
+# included), so the real csvfile/ is never touched. A stage is timed `repeat`
+# times and the best run is kept; its peak memory comes from one more run under
+# tracemalloc, so tracing never slows the timed runs.
+#
+# Stages, in order (later ones read what earlier ones wrote):
+#   build_features   data/util.py, every symbol from its raw CSV
+#   regime           getdata.py's backtest + ledger (strategies.regime_run)
+#   trend            run.py's backtest, equity curve and stats (strategies.trend_run)
+#   breakout         run1.py's backtest
+#   ml_prob          money.py's backtest on a synthetic prob_up
+#   bootstrap        money.py's bootstrap of every (strategy, symbol)
+#   ttest            ttest.py: t-test + bootstrap p-value of every group
+#   ml_train         mlrun.py's pipeline fitted on every symbol
+#
+# The scaling exponent of a stage is the slope of log(seconds) against
+# log(rows) over the sizes: 1 is linear, 2 quadratic.
+
+RESULTS_DIR = os.path.abspath(os.path.join("csvfile", "bench"))
+SIZES = [(1, 5), (4, 10), (16, 20), (64, 20)]
+TOLERANCE = 0.25          # a stage regressed when its rows/sec fell by more than this
+
+
+# ================= STAGES =================
+# stage(ctx) -> rows processed; ctx holds the universe's paths and what earlier
+# stages left behind
+
+def _quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def stage_build_features(ctx):
+    return sum(_quiet(util.build_features, path) for path in ctx["paths"])
+
+
+def stage_regime(ctx):
+    ledger, rows = Ledger(), 0
+    for path in ctx["paths"]:
+        rows += len(strategies.regime_run(ledger, path, atr_mult=1.5, tp_mult=2.0)["df"])
+    ledger.save("csvfile/ledger_regime.npz")
+    return rows
+
+
+def stage_trend(ctx):
+    ledger, rows = Ledger(), 0
+    for path in ctx["paths"]:
+        with np.errstate(invalid="ignore"):       # CAGR of an equity curve that went below 0
+            rows += len(strategies.trend_run(ledger, path)["df"])
+    ledger.save("csvfile/ledger_trend.npz")
+    return rows
+
+
+def stage_breakout(ctx):
+    rows = 0
+    for path in ctx["paths"]:
+        c = engine.columns(strategies.load_breakout(path), strategies.BREAKOUT_COLUMNS)
+        _, returns = strategies.breakout(c, capital_per_trade=10000)
+        metrics.trade_stats(returns)
+        rows += len(c["Close"])
+    return rows
+
+
+def stage_ml_prob(ctx):
+    ledger, rows = Ledger(), 0
+    for path in ctx["prob_paths"]:
+        df = strategies.load_ml_prob(path)
+        c = engine.columns(df, strategies.ML_PROB_COLUMNS)
+        trades, _ = strategies.ml_prob(c)
+        shares, pnl, _ = strategies.risk_sized_pnl(trades, 10000, 0.02, 0.02)
+        ledger.append(store.symbol_key(path), trades, df["Date"], shares=shares, pnl=pnl, returns=pnl / 10000)
+        rows += len(df)
+    ledger.save("csvfile/ledger_ml_prob.npz")
+    return rows
+
+
+def stage_bootstrap(ctx):
+    trades = significance.load_ledgers()
+    series = {key: g["return"].to_numpy() for key, g in trades.groupby(["strategy", "symbol"])}
+    bootstrap.bootstrap_many(series, size=10000, seed=0)
+    return len(trades)
+
+
+def stage_ttest(ctx):
+    trades = significance.load_ledgers()
+    significance.test_groups(trades, by=["strategy", "symbol", "regime"])
+    return len(trades)
+
+
+def stage_ml_train(ctx):
+    rows = 0
+    for path in ctx["paths"]:
+        df = load_dataset(path, FEATURES, horizon=5)
+        make_model().fit(df[FEATURES], df["y"])
+        rows += len(df)
+    return rows
+
+
+STAGES = {
+    "build_features": stage_build_features,
+    "regime": stage_regime,
+    "trend": stage_trend,
+    "breakout": stage_breakout,
+    "ml_prob": stage_ml_prob,
+    "bootstrap": stage_bootstrap,
+    "ttest": stage_ttest,
+    "ml_train": stage_ml_train,
+}
+
+
+# ================= SETUP =================
+
+def _write_probs(paths, seed):
+    # a prob_up column for money.py's backtest, persistent like a real model's
+    prob_paths = []
+    for path, s in zip(paths, np.random.SeedSequence(seed).spawn(len(paths))):
+        df = store.load_features(path, ["Date", "Close"])
+        rng = np.random.default_rng(s)
+        noise = rng.standard_normal(len(df))
+        smooth = pd.Series(noise).ewm(span=10).mean().to_numpy()
+        df["prob_up"] = 0.5 + 0.35 * smooth / (np.abs(smooth).max() or 1)
+        key = store.symbol_key(path) + "_ml_probs"
+        store.write_frame(key, df)
+        prob_paths.append(os.path.join("csvfile", key + ".csv"))
+    return prob_paths
+
+
+def _measure(fn, ctx, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fn(ctx)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn(ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return rows, best, peak / 2**20
+
+
+# ================= SUITE =================
+
+def run_suite(sizes=SIZES, freq="day", stages=None, repeat=3, seed=0, log=print):
+    # -> {"meta": ..., "results": [one row per (size, stage)], "scaling": {stage: exponent}}
+    stages = stages or list(STAGES)
+    home = os.getcwd()
+    results = []
+    for symbols, years in sizes:
+        with tempfile.TemporaryDirectory() as scratch:
+            os.chdir(scratch)
+            try:
+                ctx = {"paths": synthetic.write_universe("csvfile", symbols, years, freq, seed)}
+                bars = symbols * int(round(years * synthetic.BARS_PER_YEAR * synthetic.FREQS[freq]))
+                for name in stages:
+                    if name != "build_features" and not store.exists(store.symbol_key(ctx["paths"][0])):
+                        _quiet(stage_build_features, ctx)
+                    if name == "ml_prob" and "prob_paths" not in ctx:
+                        ctx["prob_paths"] = _write_probs(ctx["paths"], seed)
+
+                    rows, seconds, peak = _measure(STAGES[name], ctx, repeat)
+                    results.append({
+                        "stage": name, "symbols": symbols, "years": years, "bars": bars, "rows": int(rows),
+                        "seconds": seconds, "rows_per_sec": rows / seconds if seconds else np.nan,
+                        "peak_mb": peak,
+                    })
+                    if log:
+                        log(f"{name:<15} {symbols:>4} x {years:<5} {rows:>10} rows {seconds:>8.3f}s "
+                            f"{rows / seconds:>12,.0f} rows/s {peak:>8.1f} MB peak")
+            finally:
+                os.chdir(home)
+
+    return {"meta": _meta(freq, sizes, repeat, seed), "results": results, "scaling": scaling(results)}
+
+
+def scaling(results):
+    df = pd.DataFrame(results)
+    out = {}
+    for name, g in df.groupby("stage", sort=False):
+        g = g[(g["rows"] > 0) & (g["seconds"] > 0)]
+        out[name] = float(np.polyfit(np.log(g["rows"]), np.log(g["seconds"]), 1)[0]) \
+            if g["rows"].nunique() > 1 else np.nan
+    return out
+
+
+def _meta(freq, sizes, repeat, seed):
+    import sklearn
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or "unknown",
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "freq": freq, "sizes": [list(s) for s in sizes], "repeat": repeat, "seed": seed,
+        "python": sys.version.split()[0], "numpy": np.__version__, "pandas": pd.__version__,
+        "sklearn": sklearn.__version__, "platform": platform.platform(), "cpus": os.cpu_count(),
+    }
+
+
+# ================= RESULTS =================
+
+def save(results, root=RESULTS_DIR):
+    os.makedirs(root, exist_ok=True)
+    meta = results["meta"]
+    path = os.path.join(root, f"{meta['freq']}_{meta['commit']}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(results, f, indent=1)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def previous(results, root=RESULTS_DIR):
+    # latest saved run of the same freq from another commit, or None
+    meta = results["meta"]
+    paths = [p for p in glob.glob(os.path.join(root, meta["freq"] + "_*.json"))
+             if load(p)["meta"]["commit"] != meta["commit"]]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def compare(old, new, tolerance=TOLERANCE):
+    # -> one row per (stage, size) present in both, rows/sec before / after
+    key = ["stage", "symbols", "years"]
+    a = pd.DataFrame(old["results"])[key + ["rows_per_sec", "peak_mb"]]
+    b = pd.DataFrame(new["results"])[key + ["rows_per_sec", "peak_mb"]]
+    df = a.merge(b, on=key, suffixes=("_old", "_new"))
+    df["speedup"] = df["rows_per_sec_new"] / df["rows_per_sec_old"]
+    df["regression"] = df["speedup"] < 1 - tolerance
+    return df
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    FREQ = "day"            # "minute": sizes are then (symbols, years) of 375 bars a day
+    sizes = SIZES if FREQ == "day" else [(1, 0.05), (4, 0.1), (16, 0.2)]
+
+    results = run_suite(sizes, FREQ)
+    path = save(results)
+    print("\nSaved:", path)
+
+    print("\n===== SCALING (seconds ~ rows ^ k) =====")
+    for name, k in results["scaling"].items():
+        print(f"{name:<15} k = {k:.2f}")
+
+    before = previous(results)
+    if before:
+        print(f"\n===== VS {load(before)['meta']['commit']} =====")
+        diff = compare(load(before), results)
+        print(diff.round(3).to_string(index=False))
+        if diff["regression"].any():
+            print(f"\n❌ {int(diff['regression'].sum())} stage(s) more than {TOLERANCE:.0%} slower")
+        else:
+            print("\n✅ No regressions")
@@ -0,0 +1,67 @@
+import pandas as pd
+import numpy as np
+import os
+
+# Seeded synthetic OHLCV in the raw CSV format of data/fetch.py, so any number
+# of symbols and years can go through the pipeline without a network.
+#
+#   df = bars(252 * 10, seed=1)                          # one symbol, 10 years of daily bars
+#   paths = write_universe("csvfile", symbols=16, years=20)
+#   paths = write_universe("csvfile", symbols=4, years=0.1, freq="minute")
+#
+# Closes are a random walk whose drift and volatility switch between a calm,
+# a trending and a volatile regime (a Markov chain), so the strategies see
+# trends, ranges and breakouts. Every symbol has its own child seed: symbol k
+# is the same series whatever the number of symbols.
+
+FREQS = {"day": 1, "minute": 375}       # bars per trading day (NSE: 09:15 - 15:30)
+BARS_PER_YEAR = 252
+
+# regime: (drift, volatility) per day, and the chance per day of leaving it
+REGIMES = np.array([[0.0, 0.010], [0.0015, 0.015], [-0.0005, 0.030]])
+SWITCH = 0.02
+
+
+def dates(n, freq="day", start="2000-01-03"):
+    per_day = FREQS[freq]
+    days = pd.bdate_range(start, periods=-(-n // per_day))
+    if per_day == 1:
+        return pd.DatetimeIndex(days[:n])
+    minutes = pd.to_timedelta(9 * 60 + 15 + np.arange(per_day), unit="min")
+    return pd.DatetimeIndex((days.to_numpy()[:, None] + minutes.to_numpy()[None, :]).ravel()[:n])
+
+
+def bars(n, freq="day", seed=0, start="2000-01-03"):
+    rng = np.random.default_rng(seed)
+    per_day = FREQS[freq]
+
+    # one regime per day, held for all of the day's bars
+    days = -(-n // per_day)
+    switch = rng.random(days) < SWITCH
+    step = rng.integers(1, len(REGIMES), size=days)
+    state = np.cumsum(np.where(switch, step, 0)) % len(REGIMES)
+    drift, vol = REGIMES[np.repeat(state, per_day)[:n]].T / np.array([[per_day], [np.sqrt(per_day)]])
+
+    ret = drift + vol * rng.standard_normal(n)
+    close = 100 * np.exp(np.cumsum(ret))
+    open_ = np.concatenate([[100.], close[:-1]]) * np.exp(vol * 0.2 * rng.standard_normal(n))
+    high = np.maximum(open_, close) * np.exp(vol * np.abs(rng.standard_normal(n)) * 0.5)
+    low = np.minimum(open_, close) * np.exp(-vol * np.abs(rng.standard_normal(n)) * 0.5)
+    volume = np.round(1e6 / per_day * np.exp(0.3 * rng.standard_normal(n)) * (1 + 20 * np.abs(ret)))
+
+    return pd.DataFrame({
+        "Date": dates(n, freq, start),
+        "Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume,
+    })
+
+
+def write_universe(folder, symbols=8, years=5, freq="day", seed=0):
+    # -> paths of the written CSVs, synth0000_day.csv, synth0001_day.csv, ...
+    os.makedirs(folder, exist_ok=True)
+    n = int(round(years * BARS_PER_YEAR * FREQS[freq]))
+    paths = []
+    for k, s in enumerate(np.random.SeedSequence(seed).spawn(symbols)):
+        path = os.path.join(folder, f"synth{k:04d}_{freq}.csv")
+        bars(n, freq, s).to_csv(path, index=False)
+        paths.append(path)
+    return paths
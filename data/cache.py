@@ -0,0 +1,188 @@
+import numpy as np
+import os
+import hashlib
+import tempfile
+from collections import OrderedDict
+
+from data import indicators
+
+# Indicators on demand, computed once per (symbol, indicator, parameters, data).
+#
+#   cache = IndicatorCache()
+#   for span in range(20, 220, 20):
+#       ema = cache.ema("tatapower", df["Close"], span)
+#
+# The data part of the key is a hash of the input arrays, so a refreshed symbol
+# (new bars, corrected prices) misses and recomputes, while an unchanged one hits.
+# Results live in an in-memory LRU and as .npy files on disk; both are trimmed
+# least-recently-used first when they outgrow their byte budget.
+
+CACHE_DIR = os.path.join("csvfile", "cache")
+
+
+def fingerprint(*arrays):
+    h = hashlib.blake2b(digest_size=16)
+    for a in arrays:
+        a = np.ascontiguousarray(a, dtype=float)
+        h.update(str(a.shape).encode())
+        h.update(a.tobytes())
+    return h.hexdigest()
+
+
+class IndicatorCache:
+
+    def __init__(self, root=CACHE_DIR, max_bytes=256 * 2**20, max_disk_bytes=2 * 2**30):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.nbytes = 0
+        self.disk_bytes = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    # ================= CORE =================
+
+    def get(self, symbol, name, params, inputs, compute):
+        # inputs: arrays the indicator depends on, compute: fn(*inputs) -> array
+        key = (symbol, name, tuple(sorted(params.items())), fingerprint(*inputs))
+
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return self.memory[key]
+
+        path = self._path(key)
+        values = self._load(path) if self.root is not None else None
+        if values is not None:
+            self.stats["disk_hits"] += 1
+        else:
+            values = np.asarray(compute(*inputs))
+            self.stats["misses"] += 1
+            if self.root is not None:
+                self._save(path, values)
+
+        values.flags.writeable = False
+        self._remember(key, values)
+        return values
+
+    def _path(self, key):
+        symbol, name, params, fp = key
+        params = "_".join(f"{k}{v}" for k, v in params)
+        return os.path.join(self.root, str(symbol), f"{name}_{params}_{fp}.npy")
+
+    def _load(self, path):
+        # None on a miss, including a file another process just trimmed away
+        try:
+            values = np.load(path)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return values
+
+    def _remember(self, key, values):
+        self.memory[key] = values
+        self.nbytes += values.nbytes
+        while self.nbytes > self.max_bytes and len(self.memory) > 1:
+            _, old = self.memory.popitem(last=False)
+            self.nbytes -= old.nbytes
+            self.stats["evictions"] += 1
+
+    def _save(self, path, values):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        old = _size(path)
+        # a temp file of our own: sweep workers compute the same keys side by side
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp.npy")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, values)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        if self.disk_bytes is None:
+            self._trim_disk()
+        else:
+            # an overwritten entry only adds the difference
+            self.disk_bytes += _size(path) - old
+            if self.disk_bytes > self.max_disk_bytes:
+                self._trim_disk()
+
+    def _trim_disk(self):
+        # only walks the directory on the first write and when over budget
+        files = []
+        for folder, _, names in os.walk(self.root):
+            for n in names:
+                if n.endswith(".npy") and not n.endswith(".tmp.npy"):
+                    p = os.path.join(folder, n)
+                    try:
+                        st = os.stat(p)
+                    except FileNotFoundError:       # trimmed by another process
+                        continue
+                    files.append((st.st_mtime, st.st_size, p))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, p in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.stats["evictions"] += 1
+        self.disk_bytes = total
+
+    def clear(self):
+        self.memory.clear()
+        self.nbytes = 0
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    # ================= INDICATORS =================
+    # 1-D input gives a 1-D result, a (symbols, dates) panel gives a panel
+
+    def sma(self, symbol, close, n):
+        return self.get(symbol, "sma", {"n": n}, [close],
+                        lambda c: _shape(indicators.rolling_mean(c, n), c))
+
+    def ema(self, symbol, close, span):
+        return self.get(symbol, "ema", {"span": span}, [close],
+                        lambda c: _shape(indicators.ema(c, span), c))
+
+    def rsi(self, symbol, close, n=14):
+        return self.get(symbol, "rsi", {"n": n}, [close],
+                        lambda c: _shape(indicators.rsi(c, n), c))
+
+    def atr(self, symbol, high, low, close, n=14):
+        return self.get(symbol, "atr", {"n": n}, [high, low, close],
+                        lambda h, l, c: _shape(indicators.atr(h, l, c, n), c))
+
+    def adx(self, symbol, high, low, close, n=14):
+        atr = self.atr(symbol, high, low, close, n)
+        return self.get(symbol, "adx", {"n": n}, [high, low, close],
+                        lambda h, l, c: _shape(indicators.adx(h, l, indicators.panel(atr), n), c))
+
+    def breakout_high(self, symbol, high, n=20):
+        # highest High of the previous n bars, what `breakout` compares Close with
+        return self.get(symbol, "breakout_high", {"n": n}, [high],
+                        lambda h: _shape(indicators.lag(indicators.rolling_max(h, n)), h))
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _shape(result, like):
+    return result[0] if np.ndim(like) == 1 else result
+
+
+# shared by everything in one process
+CACHE = IndicatorCache()
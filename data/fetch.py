@@ -1,37 +1,172 @@
-import yfinance as yf
 import pandas as pd
 import os
-from datetime import datetime
-
-SYMBOL = "SAIL.NS"
-SAVE_PATH = "data/csvfile/sail_2020_2025_daily.csv"
-
-# Fetch INFY data from 2020 to Dec 31, 2025
-df = yf.download(
-    SYMBOL,
-    start="2020-01-01",      # ✅ Start of 2020
-    end="2025-12-31",        # ✅ End of 2025 (exclusive, so Dec 30 last trading day)
-    interval="1d",           # ✅ Daily data
-    auto_adjust=False,
-    progress=False
-)
-
-# Reset index to get Date column
-df.reset_index(inplace=True)
-
-# Keep only required columns
-df = df[["Date", "Open", "High", "Low", "Close", "Volume"]]
-
-# Ensure directory exists
-os.makedirs(os.path.dirname(SAVE_PATH), exist_ok=True)
-
-# Save CSV
-df.to_csv(SAVE_PATH, index=False)
-
-print("✅ INFY 2020-2025 Daily data fetched successfully")
-print(f"Date range: {df['Date'].min()} to {df['Date'].max()}")
-print(f"Total rows: {len(df)}")
-print("\nFirst 5 rows:")
-print(df.head())
-print("\nLast 5 rows:")
-print(df.tail())
+import time
+import shutil
+import traceback
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from data.instrument import stage, timed
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+START = "2020-01-01"      # ✅ first bar for a symbol we have never fetched
+
+# Ticker -> raw CSV in csvfile/ the rest of the pipeline reads. Anything not
+# listed here lands in <ticker>_daily.csv.
+SYMBOLS = {
+    "ADANIPOWER.NS": "adanipower_2020_2025_daily.csv",
+    "BEL.NS": "bel_2020_2025_daily.csv",
+    "INFY.NS": "infy_2020_2025_daily.csv",
+    "ITC.NS": "itc_2020_2025_daily.csv",
+    "SAIL.NS": "sail_2020_2025_daily.csv",
+    "SBIN.NS": "sbin_2020_2025_daily.csv",
+    "TATAPOWER.NS": "tatapower_2020_2025_daily.csv",
+    "WIPRO.NS": "wipro_2020_2025_daily.csv",
+}
+
+
+def raw_path(symbol, folder="csvfile"):
+    name = SYMBOLS.get(symbol) or symbol.split(".")[0].lower() + "_daily.csv"
+    return os.path.join(folder, name)
+
+
+# ================= PROVIDERS =================
+# A provider is fn(symbol, start, end) -> DataFrame[Date, Open, High, Low, Close, Volume]
+# with start inclusive and end exclusive (both "YYYY-MM-DD").
+
+def yahoo_provider(symbol, start, end):
+    import yfinance as yf
+
+    df = yf.download(
+        symbol,
+        start=start,
+        end=end,                 # ✅ exclusive
+        interval="1d",           # ✅ Daily data
+        auto_adjust=False,
+        progress=False
+    )
+
+    # newer yfinance returns (field, ticker) columns even for one ticker
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+
+    df.reset_index(inplace=True)
+    return df
+
+
+def csv_provider(folder):
+    # replays CSVs already on disk, e.g. a fixture directory in place of Yahoo
+    def provider(symbol, start, end):
+        df = pd.read_csv(raw_path(symbol, folder))
+        df["Date"] = pd.to_datetime(df["Date"])
+        return df[(df["Date"] >= start) & (df["Date"] < end)]
+
+    return provider
+
+
+# ================= FETCH ONE =================
+
+def last_stored_date(path):
+    if not os.path.exists(path):
+        return None
+    dates = pd.read_csv(path, usecols=["Date"])["Date"]
+    return pd.to_datetime(dates).max() if len(dates) else None
+
+
+def merge_raw(path, new):
+    # append bars after the last stored date; the file is rebuilt next to the
+    # old one and swapped in, so a crash never leaves a half written CSV
+    new = new[["Date"] + OHLCV].copy()
+    new["Date"] = pd.to_datetime(new["Date"])
+    new = new.dropna(subset=OHLCV).drop_duplicates("Date", keep="last").sort_values("Date")
+
+    last = last_stored_date(path)
+    if last is not None:
+        new = new[new["Date"] > last]
+    if new.empty:
+        return 0
+
+    tmp = path + ".tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    if last is None:
+        new.to_csv(tmp, index=False)
+    else:
+        columns = pd.read_csv(path, nrows=0).columns
+        shutil.copyfile(path, tmp)
+        with open(tmp, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        new.reindex(columns=columns).to_csv(tmp, mode="a", header=False, index=False)
+
+    os.replace(tmp, path)
+    return len(new)
+
+
+@timed("fetch_symbol", symbol=lambda symbol, *args, **kwargs: symbol)
+def fetch_symbol(symbol, provider=yahoo_provider, folder="csvfile", end=None, retries=3, backoff=1.0):
+    start_time = time.perf_counter()
+    path = raw_path(symbol, folder)
+    result = {"symbol": symbol, "path": path, "status": "ok", "rows": 0, "error": None}
+
+    last = last_stored_date(path)
+    start = START if last is None else (last + timedelta(days=1)).strftime("%Y-%m-%d")
+    end = end or (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    if start >= end:
+        result["status"] = "up to date"
+    else:
+        for attempt in range(retries + 1):
+            try:
+                with stage("download", symbol=symbol, attempt=attempt):
+                    new = provider(symbol, start, end)
+                with stage("merge_raw", symbol=symbol, rows=len(new)):
+                    result["rows"] = merge_raw(path, new)
+                result["status"] = "ok" if result["rows"] else "up to date"
+                result["error"] = None
+                break
+            except Exception as e:
+                result["status"] = "error"
+                result["error"] = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+                if attempt < retries:
+                    with stage("backoff", symbol=symbol, attempt=attempt):
+                        time.sleep(backoff * 2 ** attempt)
+
+    result["seconds"] = time.perf_counter() - start_time
+    return result
+
+
+# ================= FETCH MANY =================
+
+def fetch_universe(symbols=None, provider=yahoo_provider, folder="csvfile", workers=8,
+                   end=None, retries=3, backoff=1.0):
+    # generator: one result per symbol as it completes. Downloads are I/O bound,
+    # so a thread pool is enough and the provider does not need to be picklable.
+    symbols = list(SYMBOLS) if symbols is None else symbols
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(fetch_symbol, s, provider, folder, end, retries, backoff)
+            for s in symbols
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    from data.util import build_universe
+
+    for r in fetch_universe():
+        if r["status"] == "error":
+            print(f"❌ {r['symbol']} | {r['error'].splitlines()[0]}")
+        else:
+            print(f"✅ {r['symbol']} | +{r['rows']} bars | {r['seconds']:.2f}s")
+
+    # new raw bars -> incremental feature update
+    for r in build_universe("csvfile"):
+        if r["status"] == "error":
+            print(f"❌ features {r['symbol']} | {r['error'].splitlines()[0]}")
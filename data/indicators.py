@@ -0,0 +1,265 @@
+import numpy as np
+
+# Indicator kernels on panels: 2-D float arrays of shape (symbols, dates), NaN
+# padded where a symbol has no bar. 1-D input is treated as a single symbol.
+#
+# Windowed kernels (rolling_*, lag, diff) look back along the date axis only.
+# Recursive kernels (ewm and everything built on it) carry a state array so a
+# panel can be continued later with only the new dates:
+#
+#   state = {}
+#   a = rsi(close[:, :1000], state=state)
+#   b = rsi(close[:, 990:], state=state, context=10)   # same as rsi(close)[:, 1000:]
+#
+# `context` is the number of leading dates that were already processed; they are
+# used for windows and lags but produce no output. Every kernel returns only the
+# new dates, so the result has shape (symbols, dates - context).
+
+
+def panel(x):
+    x = np.asarray(x, dtype=float)
+    return x.reshape(1, -1) if x.ndim == 1 else x
+
+
+def _out(out, shape):
+    return np.empty(shape) if out is None else out
+
+
+# ================= CENTRE OF MASS =================
+# pandas turns span / alpha into a centre of mass before smoothing, we do the same
+
+def span_com(span):
+    return (span - 1) / 2
+
+
+def wilder_com(n):
+    return (1 - 1/n) / (1/n)
+
+
+# ================= WINDOWS =================
+
+def lag(x, k=1, out=None):
+    x = panel(x)
+    out = _out(out, x.shape)
+    out[:, :k] = np.nan
+    out[:, k:] = x[:, :x.shape[1] - k]
+    return out
+
+
+def diff(x, k=1, out=None):
+    out = lag(x, k, out)
+    np.subtract(panel(x), out, out=out)
+    return out
+
+
+def rolling_mean(x, n, out=None):
+    # plain window sum left to right, so a value only depends on its own window
+    x = panel(x)
+    out = _out(out, x.shape)
+    out[:] = np.nan
+    m = x.shape[1] - n + 1
+    if m > 0:
+        total = out[:, n - 1:]
+        total[:] = x[:, :m]
+        for k in range(1, n):
+            total += x[:, k:k + m]
+        total /= n
+    return out
+
+
+def rolling_max(x, n, out=None):
+    x = panel(x)
+    out = _out(out, x.shape)
+    out[:] = np.nan
+    m = x.shape[1] - n + 1
+    if m > 0:
+        top = out[:, n - 1:]
+        top[:] = x[:, :m]
+        for k in range(1, n):
+            np.maximum(top, x[:, k:k + m], out=top)
+    return out
+
+
+# ================= SMOOTHING =================
+
+def ewm_state(n_symbols):
+    # row 0: running mean, row 1: weight of the previous mean
+    state = np.empty((2, n_symbols))
+    state[0] = np.nan
+    state[1] = 1.
+    return state
+
+
+def ewm(x, com, out=None, state=None):
+    # pandas ewm(adjust=False).mean(), one step per date for all symbols at once
+    x = panel(x)
+    n_symbols, n_dates = x.shape
+    out = _out(out, x.shape)
+    state = ewm_state(n_symbols) if state is None else state
+    alpha = 1. / (1. + com)
+    decay = 1. - alpha
+
+    if n_symbols == 1:
+        # a single row is cheaper on Python floats than on length-1 arrays
+        mean, old_wt = float(state[0, 0]), float(state[1, 0])
+        row = out[0]
+        for t, v in enumerate(x[0].tolist()):
+            if mean == mean:
+                old_wt *= decay
+                if v == v:
+                    if mean != v:
+                        mean = (old_wt * mean + alpha * v) / (old_wt + alpha)
+                    old_wt = 1.
+            elif v == v:
+                mean = v
+            row[t] = mean
+        state[0, 0], state[1, 0] = mean, old_wt
+        return out
+
+    mean, old_wt = state[0], state[1]
+    xt = np.ascontiguousarray(x.T)
+    out_t = np.empty((n_dates, n_symbols))
+    step = np.empty(n_symbols)
+    has_mean = np.empty(n_symbols, dtype=bool)
+    seen = np.empty(n_symbols, dtype=bool)
+    move = np.empty(n_symbols, dtype=bool)
+
+    with np.errstate(invalid="ignore"):
+        for t in range(n_dates):
+            v = xt[t]
+            np.equal(mean, mean, out=has_mean)
+            np.equal(v, v, out=seen)
+
+            np.multiply(old_wt, decay, out=old_wt, where=has_mean)
+            np.logical_and(has_mean, seen, out=move)
+
+            # (old_wt * mean + alpha * v) / (old_wt + alpha) where the mean moves
+            np.multiply(old_wt, mean, out=step)
+            step += alpha * v
+            step /= old_wt + alpha
+            np.copyto(mean, step, where=move & (mean != v))
+            np.copyto(old_wt, 1., where=move)
+
+            # first observation starts the mean
+            np.copyto(mean, v, where=seen & ~has_mean)
+            out_t[t] = mean
+
+    out[:] = out_t.T
+    return out
+
+
+def _smooth(state, name, x, com, n_symbols):
+    if name not in state:
+        state[name] = ewm_state(n_symbols)
+    return ewm(x, com, state=state[name])
+
+
+def ema(close, span, state=None, context=0, name=None):
+    close = panel(close)
+    state = {} if state is None else state
+    return _smooth(state, name or f"ema_{span}", close[:, context:], span_com(span), close.shape[0])
+
+
+# ================= RSI / ATR / ADX =================
+
+def rsi(close, n=14, state=None, context=0):
+    close = panel(close)
+    state = {} if state is None else state
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = diff(close)[:, context:]
+        gain = np.clip(delta, 0, None)
+        loss = -np.clip(delta, None, 0)
+
+        avg_gain = _smooth(state, "avg_gain", gain, wilder_com(n), close.shape[0])
+        avg_loss = _smooth(state, "avg_loss", loss, wilder_com(n), close.shape[0])
+
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+def true_range(high, low, close):
+    high, low, close = panel(high), panel(low), panel(close)
+    prev_close = lag(close)
+    tr = np.abs(high - prev_close)
+    np.fmax(tr, np.abs(low - prev_close), out=tr)
+    np.fmax(high - low, tr, out=tr)
+    return tr
+
+
+def atr(high, low, close, n=14, state=None, context=0):
+    state = {} if state is None else state
+    tr = true_range(high, low, close)[:, context:]
+    return _smooth(state, "atr", tr, wilder_com(n), tr.shape[0])
+
+
+def directional_movement(high, low):
+    high, low = panel(high), panel(low)
+    plus_dm = diff(high)
+    minus_dm = diff(low)
+
+    plus_dm = np.where((plus_dm > minus_dm) & (plus_dm > 0), plus_dm, 0.0)
+    minus_dm = np.where((minus_dm > plus_dm) & (minus_dm > 0), -minus_dm, 0.0)
+    return plus_dm, minus_dm
+
+
+def adx(high, low, atr_values, n=14, state=None, context=0):
+    # atr_values: ATR for the new dates only, as returned by atr(..., context=context)
+    state = {} if state is None else state
+    plus_dm, minus_dm = directional_movement(high, low)
+    n_symbols = plus_dm.shape[0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = 100 * (_smooth(state, "plus_dm", plus_dm[:, context:], wilder_com(n), n_symbols) / atr_values)
+        minus_di = 100 * (_smooth(state, "minus_dm", minus_dm[:, context:], wilder_com(n), n_symbols) / atr_values)
+
+        dx = (np.abs(plus_di - minus_di) / (plus_di + minus_di)) * 100
+    return _smooth(state, "adx", dx, wilder_com(n), n_symbols)
+
+
+# ================= FEATURE SET =================
+
+def feature_panel(high, low, close, volume, state=None, context=0, history=None):
+    # the numeric columns of build_features for a whole panel.
+    # history: derived series (rsi, volatility, adx) for the context dates, needed
+    # by rsi_slope, vol_contraction and adx_prev when continuing a panel
+    high, low, close, volume = panel(high), panel(low), panel(close), panel(volume)
+    state = {} if state is None else state
+    history = {} if history is None else history
+    n_symbols = close.shape[0]
+
+    def with_history(name, values):
+        past = np.asarray(history.get(name, np.empty((n_symbols, 0))), dtype=float).reshape(n_symbols, -1)
+        return np.concatenate([past, values], axis=1)
+
+    close_new = close[:, context:]
+    f = {}
+
+    f["sma_20"] = rolling_mean(close, 20)[:, context:]
+    f["sma_50"] = rolling_mean(close, 50)[:, context:]
+
+    f["ema_50"] = ema(close, 50, state, context)
+    f["ema_200"] = ema(close, 200, state, context)
+
+    f["rsi"] = rsi(close, 14, state, context)
+    f["atr"] = atr(high, low, close, 14, state, context)
+    f["adx"] = adx(high, low, f["atr"], 14, state, context)
+
+    adx_full = with_history("adx", f["adx"])
+    f["adx_prev"] = lag(adx_full)[:, adx_full.shape[1] - close_new.shape[1]:]
+
+    f["avg_volume_20"] = rolling_mean(volume, 20)[:, context:]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f["dist_ema50"] = (close_new - f["ema_50"]) / f["ema_50"]
+        f["volatility"] = f["atr"] / close_new
+
+    rsi_full = with_history("rsi", f["rsi"])
+    volatility_full = with_history("volatility", f["volatility"])
+    skip = rsi_full.shape[1] - close_new.shape[1]
+
+    f["rsi_slope"] = diff(rsi_full, 5)[:, skip:]
+    with np.errstate(invalid="ignore"):
+        f["vol_contraction"] = f["volatility"] < rolling_mean(volatility_full, 20)[:, skip:]
+        f["breakout"] = close_new > lag(rolling_max(high, 20))[:, context:]
+    return f
@@ -0,0 +1,280 @@
+import pandas as pd
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import threading
+import contextlib
+import tracemalloc
+
+# Stage timers for the scripts, written as one JSON record per stage.
+#
+#   QUANT_PROFILE=1 python -m agenttest.run                  # -> csvfile/profile/profile.jsonl
+#   QUANT_PROFILE=/tmp/nightly.jsonl QUANT_PROFILE_MEMORY=1 python -m ml.money
+#   python -m data.instrument                                # hottest stages of the file
+#
+#   with stage("indicators", symbol=key):
+#       ...
+#
+#   @timed("load")
+#   def load_regime(path): ...
+#
+#   with laps(symbol=key) as lap:   # flat scripts: each call ends the previous stage
+#       lap("load") ... lap("backtest") ...
+#
+# Off (the default) stage() hands back one shared no-op context manager and
+# timed() calls straight through: under a microsecond per stage.
+# On, a record holds the stage, symbol, script, pid, parent stage, wall and CPU
+# seconds, self seconds (minus nested stages) and the RSS at exit. With memory
+# on, also the tracemalloc peak of allocations and the peak RSS of a 5 ms
+# sampler thread within the stage; nested stages roll their peaks up into the
+# parent's.
+#
+# Records are appended one line per write, so worker processes (which inherit
+# the environment) and threads share the file. tracemalloc's peak is one per
+# process, so the memory of stages running in parallel threads overlaps.
+
+PROFILE_DIR = os.path.join("csvfile", "profile")
+SAMPLE_EVERY = 0.005
+
+_config = {"on": False, "path": None, "memory": False}
+_local = threading.local()      # per thread: stack of open stages
+_lock = threading.Lock()
+_sampler = {"thread": None, "peak": 0}
+_off = contextlib.nullcontext()
+
+
+def _rss():
+    # resident set size in bytes, 0 where /proc is missing
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _sample():
+    while _config["memory"]:
+        _sampler["peak"] = max(_sampler["peak"], _rss())
+        time.sleep(SAMPLE_EVERY)
+
+
+def _start_sampler():
+    _sampler["thread"] = threading.Thread(target=_sample, daemon=True)
+    _sampler["thread"].start()
+
+
+def _after_fork():
+    # a forked worker starts with no open stages and without the parent's threads
+    global _lock
+    _lock = threading.Lock()
+    _local.stack = []
+    if _config["memory"]:
+        _start_sampler()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+# ================= SWITCH =================
+
+def enable(path=None, memory=False):
+    path = path or os.path.join(PROFILE_DIR, "profile.jsonl")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    _config.update(on=True, path=path, memory=memory)
+    if memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if _sampler["thread"] is None:
+            _start_sampler()
+
+
+def disable():
+    _config.update(on=False, memory=False)
+    _sampler["thread"] = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def enabled():
+    return _config["on"]
+
+
+# ================= TIMERS =================
+
+class _Stage:
+
+    def __init__(self, name, symbol, fields):
+        self.name = name
+        self.symbol = symbol
+        self.fields = fields
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1] if stack else None
+        if self.symbol is None and self.parent is not None:
+            self.symbol = self.parent.symbol
+        self.children = 0.
+        if _config["memory"]:
+            # peaks only go up: remember the parent's so far, then measure ours from here
+            self.alloc_start, alloc_peak = tracemalloc.get_traced_memory()
+            self.rss_peak = 0
+            if self.parent is not None:
+                self.parent.alloc_peak = max(self.parent.alloc_peak, alloc_peak)
+                self.parent.rss_peak = max(self.parent.rss_peak, _sampler["peak"])
+            tracemalloc.reset_peak()
+            _sampler["peak"] = _rss()
+            self.alloc_peak = 0
+        stack.append(self)
+        self.cpu = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        cpu = time.process_time() - self.cpu
+        _local.stack.pop()
+        record = {
+            "stage": self.name, "symbol": self.symbol,
+            "script": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "",
+            "pid": os.getpid(), "parent": self.parent.name if self.parent else None,
+            "time": time.time() - seconds, "seconds": seconds, "self_seconds": seconds - self.children,
+            "cpu_seconds": cpu, "rss_mb": _rss() / 2**20, "error": exc[0].__name__ if exc[0] else None,
+        }
+        if _config["memory"]:
+            current, alloc_peak = tracemalloc.get_traced_memory()
+            self.alloc_peak = max(self.alloc_peak, alloc_peak)
+            self.rss_peak = max(self.rss_peak, _sampler["peak"], _rss())
+            record["alloc_peak_mb"] = (self.alloc_peak - self.alloc_start) / 2**20
+            record["rss_peak_mb"] = self.rss_peak / 2**20
+            if self.parent is not None:
+                self.parent.alloc_peak = max(self.parent.alloc_peak, self.alloc_peak)
+                self.parent.rss_peak = max(self.parent.rss_peak, self.rss_peak)
+        if self.parent is not None:
+            self.parent.children += seconds
+        record.update(self.fields)
+        _write(record)
+        return False
+
+
+def _write(record):
+    line = json.dumps(record, default=str) + "\n"
+    with _lock, open(_config["path"], "a") as f:
+        f.write(line)
+
+
+def stage(name, symbol=None, **fields):
+    # fields: anything else to keep in the record (rows, path, ...)
+    if not _config["on"]:
+        return _off
+    return _Stage(name, symbol, fields)
+
+
+def timed(name=None, symbol=None):
+    # decorator; symbol: fn(*args, **kwargs) -> symbol of the call
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _config["on"]:
+                return fn(*args, **kwargs)
+            with _Stage(label, symbol(*args, **kwargs) if symbol else None, {}):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+class _Laps:
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.current = None
+
+    def __call__(self, name, **fields):
+        self.close()
+        self.current = _Stage(name, self.symbol, fields).__enter__()
+
+    def close(self, *exc):
+        if self.current is not None:
+            self.current.__exit__(*(exc or (None, None, None)))
+            self.current = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # an exception still ends the open stage, so it is not left on the stack
+        # as the parent of every later stage of the thread
+        self.close(*exc)
+        return False
+
+
+class _NoLaps:
+
+    def __call__(self, name, **fields):
+        pass
+
+    def close(self, *exc):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_LAPS = _NoLaps()       # for code that takes a lap argument and may run unprofiled
+
+
+def laps(symbol=None):
+    return _Laps(symbol) if _config["on"] else NO_LAPS
+
+
+# ================= REPORT =================
+
+def load(path=None):
+    path = path or _config["path"] or os.path.join(PROFILE_DIR, "profile.jsonl")
+    with open(path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def report(records=None, by=("script", "stage"), top=20):
+    # hottest stages by self time: calls, total / self / mean / max seconds,
+    # share of all self time and the largest memory peaks seen
+    df = load() if records is None else records
+    if df.empty:
+        return df
+    agg = {"calls": ("seconds", "size"), "seconds": ("seconds", "sum"), "self_seconds": ("self_seconds", "sum"),
+           "mean": ("seconds", "mean"), "max": ("seconds", "max"), "cpu_seconds": ("cpu_seconds", "sum"),
+           "symbols": ("symbol", "nunique")}
+    for col in ("alloc_peak_mb", "rss_peak_mb"):
+        if col in df:
+            agg[col] = (col, "max")
+    out = df.groupby(list(by), dropna=False).agg(**agg)
+    out["share"] = out["self_seconds"] / out["self_seconds"].sum()
+    return out.sort_values("self_seconds", ascending=False).head(top)
+
+
+# ================= ENVIRONMENT =================
+# QUANT_PROFILE=1 or a file path turns the timers on for the whole process
+
+if os.environ.get("QUANT_PROFILE") and os.environ["QUANT_PROFILE"] != "0":
+    enable(None if os.environ["QUANT_PROFILE"] == "1" else os.environ["QUANT_PROFILE"],
+           memory=os.environ.get("QUANT_PROFILE_MEMORY", "0") not in ("", "0"))
+    atexit.register(disable)
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    path = os.environ.get("QUANT_PROFILE")
+    df = load(None if path in (None, "", "0", "1") else path)
+    print(f"{len(df)} stage records from {df['script'].nunique()} script(s), {df['pid'].nunique()} process(es)")
+    print("\n===== HOTTEST STAGES (self time) =====")
+    print(report(df).round(4).to_string())
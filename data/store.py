@@ -0,0 +1,196 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import shutil
+
+# One directory per symbol, one raw little-endian file per column plus a schema:
+#
+#   csvfile/store/tatapower_2020_2025_daily/
+#       schema.json        {"version": 1, "rows": 1272, "columns": {"Close": "<f8", ...}}
+#       Date.bin  Close.bin  ema_50.bin ...
+#
+# Columns are opened with np.memmap so a reader only touches the columns it asks
+# for, and appending a bar is a write at the end of each column file.
+
+STORE_DIR = os.path.join("csvfile", "store")
+SCHEMA_VERSION = 1
+
+# canonical order; anything else is kept after these in the order it arrived
+COLUMNS = [
+    "Date", "Open", "High", "Low", "Close", "Volume",
+    "weekday", "is_monday", "is_friday", "week", "year",
+    "sma_20", "sma_50", "ema_50", "ema_200", "rsi", "atr", "adx", "adx_prev",
+    "avg_volume_20", "dist_ema50", "rsi_slope", "volatility", "vol_contraction", "breakout",
+]
+
+# duplicate names found in the old CSVs -> the column they duplicate
+ALIASES = {"volume_sma20": "avg_volume_20"}
+
+
+def symbol_key(path):
+    # "csvfile/tatapower_2020_2025_daily.csv" -> "tatapower_2020_2025_daily"
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def symbol_dir(key, root=STORE_DIR):
+    return os.path.join(root, key)
+
+
+def exists(key, root=STORE_DIR):
+    return os.path.exists(os.path.join(symbol_dir(key, root), "schema.json"))
+
+
+def read_schema(key, root=STORE_DIR):
+    with open(os.path.join(symbol_dir(key, root), "schema.json")) as f:
+        schema = json.load(f)
+    if schema["version"] != SCHEMA_VERSION:
+        raise ValueError(
+            f"{key}: store schema v{schema['version']}, expected v{SCHEMA_VERSION} - rebuild it"
+        )
+    return schema
+
+
+def _write_schema(folder, schema):
+    tmp = os.path.join(folder, "schema.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(schema, f, indent=1)
+    os.replace(tmp, os.path.join(folder, "schema.json"))
+
+
+# ================= NORMALISE =================
+
+def normalize(df):
+    df = df.copy()
+
+    for legacy, name in ALIASES.items():
+        if legacy in df.columns:
+            if name not in df.columns:
+                df[name] = df[legacy]
+            df = df.drop(columns=legacy)
+
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"]).astype("datetime64[ns]")
+
+    order = [c for c in COLUMNS if c in df.columns]
+    order += [c for c in df.columns if c not in order]
+    return df[order]
+
+
+def _column_array(series):
+    values = series.to_numpy()
+    if values.dtype == object:
+        raise ValueError(f"Column {series.name!r} is not numeric, cannot store it")
+    return np.ascontiguousarray(values)
+
+
+# ================= WRITE =================
+
+def write_frame(key, df, root=STORE_DIR):
+    df = normalize(df)
+    folder = symbol_dir(key, root)
+    tmp = folder + ".tmp"
+
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = {}
+    for col in df.columns:
+        values = _column_array(df[col])
+        values.tofile(os.path.join(tmp, col + ".bin"))
+        columns[col] = values.dtype.str
+
+    _write_schema(tmp, {"version": SCHEMA_VERSION, "rows": len(df), "columns": columns})
+
+    # swap the finished directory in so readers never see a half written symbol
+    old = folder + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(folder):
+        os.replace(folder, old)
+    os.replace(tmp, folder)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def append_frame(key, df, root=STORE_DIR):
+    schema = read_schema(key, root)
+    folder = symbol_dir(key, root)
+    df = normalize(df)
+
+    missing = set(schema["columns"]) - set(df.columns)
+    if missing:
+        raise ValueError(f"{key}: appended rows are missing columns {sorted(missing)}")
+
+    # columns are appended first and the row count committed last, a crash in
+    # between leaves extra bytes that readers ignore and the next append overwrites
+    for col, dtype in schema["columns"].items():
+        values = _column_array(df[col]).astype(dtype)
+        with open(os.path.join(folder, col + ".bin"), "r+b") as f:
+            f.seek(schema["rows"] * values.dtype.itemsize)
+            f.write(values.tobytes())
+            f.truncate()
+
+    schema["rows"] += len(df)
+    _write_schema(folder, schema)
+
+
+# ================= READ =================
+
+def read_columns(key, columns=None, root=STORE_DIR):
+    # dict of read-only memory maps, nothing is copied
+    schema = read_schema(key, root)
+    folder = symbol_dir(key, root)
+    columns = list(schema["columns"]) if columns is None else columns
+
+    out = {}
+    for col in columns:
+        col = ALIASES.get(col, col)
+        if col not in schema["columns"]:
+            raise KeyError(f"{key}: no column {col!r} in store")
+        dtype = np.dtype(schema["columns"][col])
+        if schema["rows"] == 0:
+            out[col] = np.empty(0, dtype=dtype)
+        else:
+            out[col] = np.memmap(
+                os.path.join(folder, col + ".bin"), dtype=dtype, mode="r", shape=(schema["rows"],)
+            )
+    return out
+
+
+def read_frame(key, columns=None, root=STORE_DIR):
+    return pd.DataFrame(read_columns(key, columns, root))
+
+
+def import_csv(csv_path, root=STORE_DIR):
+    key = symbol_key(csv_path)
+    write_frame(key, pd.read_csv(csv_path), root)
+    return key
+
+
+def load_features(path, columns=None, root=STORE_DIR):
+    # drop-in for pd.read_csv(path) + pd.to_datetime: the CSV is imported the
+    # first time a symbol is asked for, after that only the store is read
+    key = symbol_key(path)
+    if not exists(key, root):
+        import_csv(path, root)
+    return read_frame(key, columns, root)
+
+
+# ================= STATE =================
+# build_features keeps its incremental indicator state alongside the columns
+
+def load_state(key, root=STORE_DIR):
+    path = os.path.join(symbol_dir(key, root), "state.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(key, state, root=STORE_DIR):
+    folder = symbol_dir(key, root)
+    tmp = os.path.join(folder, "state.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, os.path.join(folder, "state.json"))
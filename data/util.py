@@ -1,24 +1,49 @@
 import pandas as pd
 import numpy as np
 import os
-
-def build_features(csv_path):
-    print(f"Processing: {csv_path}")
-
-    # ================= LOAD =================
-    df = pd.read_csv(csv_path)
-
-    # ================= NUMERIC CLEAN =================
-    for col in ["Open", "High", "Low", "Close", "Volume"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    df = df.dropna().reset_index(drop=True)
-
-    # ================= DATE FIX =================
-    if "Date" not in df.columns:
-        df.reset_index(inplace=True)
-
-    df["Date"] = pd.to_datetime(df["Date"])
+import io
+import time
+import traceback
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from data import store, indicators
+from data.instrument import stage, timed
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+FEATURES = [
+    "weekday", "is_monday", "is_friday", "week", "year",
+    "sma_20", "sma_50", "ema_50", "ema_200", "rsi", "atr", "adx", "adx_prev",
+    "avg_volume_20", "dist_ema50", "rsi_slope", "volatility", "vol_contraction", "breakout",
+]
+
+# raw bars kept in the state file, enough for the longest window (sma_50)
+STATE_TAIL = 50
+STATE_VERSION = 1
+
+# recursive indicators whose running state is saved between builds
+SMOOTHED = ["ema_50", "ema_200", "avg_gain", "avg_loss", "atr", "plus_dm", "minus_dm", "adx"]
+
+
+def _compute_features(df, state=None):
+    # df holds only bars that have not been featured yet; the tail of earlier
+    # bars and the smoothing state come from `state` (None = start from bar 0).
+    # The math itself lives in data/indicators.py, run here on a 1 x dates panel.
+    tail = state["tail"] if state is not None else {}
+    n_tail = len(tail.get("Close", []))
+
+    def with_tail(name, values):
+        return np.concatenate([np.asarray(tail.get(name, []), dtype=float), values])
+
+    close = with_tail("Close", df["Close"].to_numpy(dtype=float))
+    high = with_tail("High", df["High"].to_numpy(dtype=float))
+    low = with_tail("Low", df["Low"].to_numpy(dtype=float))
+    volume = with_tail("Volume", df["Volume"].to_numpy(dtype=float))
+
+    smooth = {}
+    if state is not None:
+        smooth = {name: np.array(v, dtype=float).reshape(2, 1) for name, v in state["ewm"].items()}
+    history = {name: tail[name] for name in ("rsi", "volatility", "adx") if name in tail}
 
     # ================= TIME FEATURES =================
     df["weekday"] = df["Date"].dt.weekday
@@ -27,79 +52,178 @@ def build_features(csv_path):
     df["week"] = df["Date"].dt.isocalendar().week.astype(int)
     df["year"] = df["Date"].dt.year
 
-    # ================= SMA (PRICE) =================
-    df["sma_20"] = df["Close"].rolling(window=20).mean()
-    df["sma_50"] = df["Close"].rolling(window=50).mean()
-
-    # ================= EMA =================
-    df["ema_50"] = df["Close"].ewm(span=50, adjust=False).mean()
-    df["ema_200"] = df["Close"].ewm(span=200, adjust=False).mean()
-
-    # ================= RSI (WILDER) =================
-    delta = df["Close"].diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
+    # ================= SMA / EMA / RSI / ATR / ADX / VOLUME =================
+    f = indicators.feature_panel(high, low, close, volume, smooth, n_tail, history)
+    for name in FEATURES:
+        if name in f:
+            df[name] = f[name][0]
+
+    # ================= STATE =================
+    series = {
+        "Close": close, "High": high, "Low": low, "Volume": volume,
+        "rsi": with_tail("rsi", f["rsi"][0]),
+        "volatility": with_tail("volatility", f["volatility"][0]),
+        "adx": with_tail("adx", f["adx"][0]),
+    }
+    new_state = {
+        "version": STATE_VERSION,
+        "last_date": df["Date"].iloc[-1].isoformat() if len(df) else state["last_date"],
+        "ewm": {name: smooth[name][:, 0].tolist() for name in SMOOTHED},
+        "tail": {name: values[-STATE_TAIL:].tolist() for name, values in series.items()},
+    }
+    return df, new_state
+
+
+def load_state(key):
+    state = store.load_state(key)
+    if state is None or state.get("version") != STATE_VERSION:
+        return None
+    return state
+
+
+def clean_bars(df):
+    for col in OHLCV:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    avg_gain = gain.ewm(alpha=1/14, adjust=False).mean()
-    avg_loss = loss.ewm(alpha=1/14, adjust=False).mean()
+    df = df.dropna(subset=OHLCV).reset_index(drop=True)
+    df["Date"] = pd.to_datetime(df["Date"])
+    return df
 
-    rs = avg_gain / avg_loss
-    df["rsi"] = 100 - (100 / (1 + rs))
 
-    # ================= ATR =================
-    high_low = df["High"] - df["Low"]
-    high_close = (df["High"] - df["Close"].shift()).abs()
-    low_close = (df["Low"] - df["Close"].shift()).abs()
+@timed("build_features", symbol=lambda csv_path, *args, **kwargs: store.symbol_key(csv_path))
+def build_features(csv_path, incremental=False):
+    # reads the raw CSV, writes the featured frame to the binary feature store
+    print(f"Processing: {csv_path}")
 
-    tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-    df["atr"] = tr.ewm(alpha=1/14, adjust=False).mean()
+    key = store.symbol_key(csv_path)
+    state = load_state(key) if incremental and store.exists(key) else None
 
-    # ================= ADX =================
-    plus_dm = df["High"].diff()
-    minus_dm = df["Low"].diff()
+    # ================= LOAD =================
+    with stage("read_csv"):
+        df = pd.read_csv(csv_path)
 
-    plus_dm = plus_dm.where((plus_dm > minus_dm) & (plus_dm > 0), 0.0)
-    minus_dm = (-minus_dm).where((minus_dm > plus_dm) & (minus_dm > 0), 0.0)
+    # ================= DATE FIX =================
+    if "Date" not in df.columns:
+        df.reset_index(inplace=True)
 
-    plus_di = 100 * (plus_dm.ewm(alpha=1/14, adjust=False).mean() / df["atr"])
-    minus_di = 100 * (minus_dm.ewm(alpha=1/14, adjust=False).mean() / df["atr"])
+    # ================= NUMERIC CLEAN =================
+    with stage("clean_bars"):
+        df = clean_bars(df)
+    if df.empty:
+        raise ValueError(f"{csv_path}: no valid OHLCV rows")
 
-    dx = (abs(plus_di - minus_di) / (plus_di + minus_di)) * 100
-    df["adx"] = dx.ewm(alpha=1/14, adjust=False).mean()
-    df["adx_prev"] = df["adx"].shift(1)
+    # ================= INCREMENTAL =================
+    # only bars after the saved state are computed and appended to the store
+    if state is not None:
+        added = append_features(csv_path, df[["Date"] + OHLCV])
+        print(f"✅ Appended {added} bars\n" if added else "✅ Already up to date\n")
+        return added
 
-    # ================= VOLUME FILTER =================
-    df['avg_volume_20'] = df['Volume'].rolling(20).mean()
+    with stage("indicators", rows=len(df)):
+        df, state = _compute_features(df[["Date"] + OHLCV].copy())
 
-    df["dist_ema50"] = (df["Close"] - df["ema_50"]) / df["ema_50"]              # Distance from EMA
-    df["rsi_slope"] = df["rsi"].diff(5)                                        # RSI momentum slope
-    df["volatility"] = df["atr"] / df["Close"]                                 # Volatility regime
-    df["vol_contraction"] = df["volatility"] < df["volatility"].rolling(20).mean()
-    df["breakout"] = df["Close"] > df["High"].rolling(20).max().shift(1)  
     # ================= FINAL CLEAN =================
     df = df.dropna().reset_index(drop=True)
 
     # ================= SAVE =================
-    df.to_csv(csv_path, index=False)
+    with stage("write_store", rows=len(df)):
+        store.write_frame(key, df)
+        store.save_state(key, state)
 
     print(f"✅ Features created successfully | Rows: {len(df)}")
     print(
         "Added: SMA20, SMA50, EMA50, EMA200, RSI, ATR, ADX, "
         "Volume_SMA20, Time Filters\n"
     )
+    return len(df)
+
+
+def compute_features(bars):
+    # the frame build_features would store for these raw bars, kept in memory
+    df, _ = _compute_features(clean_bars(bars.copy())[["Date"] + OHLCV].copy())
+    return df.dropna().reset_index(drop=True)
+
+
+@timed("append_features", symbol=lambda csv_path, *args, **kwargs: store.symbol_key(csv_path))
+def append_features(csv_path, bars):
+    # O(new bars): the featured history is never read, rows go on the end of the store
+    key = store.symbol_key(csv_path)
+    state = load_state(key)
+    if state is None:
+        raise ValueError(f"No feature state for {key}, run build_features first")
+
+    bars = clean_bars(bars.copy())
+    bars = bars[bars["Date"] > pd.Timestamp(state["last_date"])].reset_index(drop=True)
+    if bars.empty:
+        return 0
+
+    with stage("indicators", rows=len(bars)):
+        bars, state = _compute_features(bars[["Date"] + OHLCV].copy(), state)
+    bars = bars.dropna(subset=FEATURES)
+
+    with stage("write_store", rows=len(bars)):
+        store.append_frame(key, bars)
+        store.save_state(key, state)
+    return len(bars)
+
+
+# ================= UNIVERSE =================
+
+def _build_one(csv_path, incremental):
+    # runs in a worker: every failure is caught and sent back as a result, so
+    # one bad file never takes the pool down
+    start = time.perf_counter()
+    result = {"path": csv_path, "symbol": store.symbol_key(csv_path), "status": "ok", "rows": 0, "error": None}
+
+    try:
+        columns = pd.read_csv(csv_path, nrows=0).columns
+        if not set(OHLCV) <= set(columns):
+            result["status"] = "skipped"
+        else:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result["rows"] = build_features(csv_path, incremental=incremental)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def build_universe(folder="csvfile", workers=None, max_in_flight=None, incremental=True):
+    # generator: yields one result dict per symbol as soon as it finishes.
+    # at most max_in_flight symbols are submitted at once, which caps memory
+    paths = sorted(
+        os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".csv")
+    )
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
 
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
 
-# ================= RUN =================
-
+        for path in paths:
+            pending.add(pool.submit(_build_one, path, incremental))
+            if len(pending) < max_in_flight:
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
 
+        for future in as_completed(pending):
+            yield future.result()
 
-#BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-#folder_path = os.path.join(BASE_DIR, "csvfile")
 
-for filename in os.listdir("csvfile"):
-    if filename.endswith(".csv"):
-        build_features(os.path.join("csvfile", filename))
+# ================= RUN =================
 
-       
+if __name__ == "__main__":
+    counts = {"ok": 0, "skipped": 0, "error": 0}
 
+    for n, r in enumerate(build_universe("csvfile"), 1):
+        counts[r["status"]] += 1
+        if r["status"] == "ok":
+            print(f"✅ [{n}] {r['symbol']} | Rows: {r['rows']} | {r['seconds']:.2f}s")
+        elif r["status"] == "error":
+            print(f"❌ [{n}] {r['symbol']} | {r['error'].splitlines()[0]}")
 
+    print(f"\nDone: {counts['ok']} built, {counts['skipped']} skipped, {counts['error']} failed")
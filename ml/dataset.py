@@ -0,0 +1,173 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import shutil
+
+from data import store
+from ml.model import FEATURES
+
+# Training matrices for every symbol and horizon, built once and memory-mapped.
+#
+#   csvfile/datasets/default/
+#       meta.json     {"rows": ..., "features": [...], "horizons": [1, 5, 10, 20], "symbols": [...]}
+#       X.bin         float32 (rows, features), C order
+#       ret.bin       float32 (rows, horizons)  forward return, NaN past a symbol's last bar
+#       y.bin         int8    (rows, horizons)  1 up / 0 not up / -1 unknown
+#       symbol.bin    int32   (rows,)           index into meta["symbols"]
+#       Date.bin      datetime64[ns] (rows,)
+#
+#   build(paths, horizons=(1, 5, 10, 20))
+#   ds = open_dataset()
+#   X, y = ds["X"][ds["y"][:, k] >= 0], ...      # numpy views of the files, no copy
+#
+# Rows are grouped by symbol in date order. A row is kept when all its features
+# are present; a missing label only marks that horizon unknown (y = -1), so a
+# long horizon no longer drops rows from the short ones. All horizons of all
+# symbols come from one shift over the concatenated closes.
+
+DATASET_DIR = os.path.join("csvfile", "datasets")
+HORIZONS = [1, 5, 10, 20]
+
+
+def _folder(name, root):
+    return os.path.join(root, name)
+
+
+# ================= LABELS =================
+
+def forward_returns(close, segment_end, horizons):
+    # close: concatenated closes, segment_end: end (exclusive) of every row's
+    # symbol -> (rows, horizons) close[i + h] / close[i] - 1, NaN past the end
+    n = len(close)
+    i = np.arange(n)
+    out = np.full((n, len(horizons)), np.nan)
+    for k, h in enumerate(horizons):
+        j = i + h
+        ok = j < segment_end
+        out[ok, k] = close[j[ok]] / close[ok] - 1
+    return out
+
+
+# ================= BUILD =================
+
+def build(paths, features=FEATURES, horizons=HORIZONS, name="default", root=DATASET_DIR):
+    frames = [store.load_features(p, ["Date", "Close"] + features) for p in paths]
+    symbols = [store.symbol_key(p) for p in paths]
+    lengths = np.array([len(f) for f in frames])
+
+    close = np.concatenate([f["Close"].to_numpy(dtype=float) for f in frames])
+    segment_end = np.repeat(np.cumsum(lengths), lengths)
+    ret = forward_returns(close, segment_end, horizons)
+    y = np.where(np.isnan(ret), -1, ret > 0).astype(np.int8)
+
+    X = np.concatenate([f[features].to_numpy(dtype=float) for f in frames])
+    keep = np.isfinite(X).all(axis=1)
+    columns = {
+        "X": np.ascontiguousarray(X[keep], dtype=np.float32),
+        "ret": np.ascontiguousarray(ret[keep], dtype=np.float32),
+        "y": np.ascontiguousarray(y[keep]),
+        "symbol": np.repeat(np.arange(len(paths), dtype=np.int32), lengths)[keep],
+        "Date": np.concatenate([f["Date"].to_numpy(dtype="datetime64[ns]") for f in frames])[keep],
+    }
+
+    # written next to the old dataset and swapped in, like store.write_frame
+    folder = _folder(name, root)
+    tmp = folder + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    meta = {
+        "rows": int(keep.sum()),
+        "features": list(features),
+        "horizons": list(horizons),
+        "symbols": symbols,
+        "dtypes": {}, "shapes": {},
+    }
+    for col, values in columns.items():
+        values.tofile(os.path.join(tmp, col + ".bin"))
+        meta["dtypes"][col] = values.dtype.str
+        meta["shapes"][col] = list(values.shape)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+
+    old = folder + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(folder):
+        os.replace(folder, old)
+    os.replace(tmp, folder)
+    shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+# ================= READ =================
+
+def open_dataset(name="default", root=DATASET_DIR, mode="r"):
+    # -> {"meta", "X", "ret", "y", "symbol", "Date"}, the arrays memory-mapped
+    folder = _folder(name, root)
+    with open(os.path.join(folder, "meta.json")) as f:
+        meta = json.load(f)
+    ds = {"meta": meta}
+    for col, dtype in meta["dtypes"].items():
+        shape = tuple(meta["shapes"][col])
+        if meta["rows"] == 0:
+            ds[col] = np.empty(shape, dtype=dtype)
+        else:
+            ds[col] = np.memmap(os.path.join(folder, col + ".bin"), dtype=dtype, mode=mode, shape=shape)
+    return ds
+
+
+def horizon(ds, h):
+    # rows with a known label at horizon h -> (row indexes, labels)
+    k = ds["meta"]["horizons"].index(h)
+    rows = np.flatnonzero(ds["y"][:, k] >= 0)
+    return rows, ds["y"][rows, k]
+
+
+def symbol_rows(ds, symbol):
+    # rows of one symbol, a slice since rows are grouped by symbol
+    code = ds["meta"]["symbols"].index(symbol)
+    a, b = np.searchsorted(ds["symbol"], [code, code + 1])
+    return slice(int(a), int(b))
+
+
+def index(ds):
+    # (symbol, Date) MultiIndex of the rows
+    return pd.MultiIndex.from_arrays([
+        np.asarray(ds["meta"]["symbols"], dtype=object)[ds["symbol"]],
+        pd.DatetimeIndex(ds["Date"]),
+    ], names=["symbol", "Date"])
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    import time
+    from sklearn.metrics import roc_auc_score
+    from data.fetch import SYMBOLS, raw_path
+    from ml.model import load_dataset, make_model
+
+    paths = [raw_path(s) for s in SYMBOLS]
+    start = time.perf_counter()
+    meta = build(paths)
+    print(f"Built {meta['rows']} rows x {len(meta['features'])} features x horizons {meta['horizons']} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    ds = open_dataset()
+    print(f"Opened in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    # same labels as mlrun.py's load_dataset at its horizon
+    df = load_dataset(paths[0], horizon=5)
+    rows = symbol_rows(ds, store.symbol_key(paths[0]))
+    k = meta["horizons"].index(5)
+    y5 = ds["y"][rows, k]
+    print("H=5 labels match load_dataset:", np.array_equal(y5[y5 >= 0], df["y"].to_numpy()))
+
+    # one pooled model per horizon straight from the mapped files
+    split = np.datetime64("2024-01-01")
+    for h in meta["horizons"]:
+        rows, y = horizon(ds, h)
+        train, test = ds["Date"][rows] < split, ds["Date"][rows] >= split
+        pipe = make_model().fit(ds["X"][rows[train]], y[train])
+        auc = roc_auc_score(y[test], pipe.predict_proba(ds["X"][rows[test]])[:, 1])
+        print(f"H={h:>2}: {len(rows)} labelled rows, test AUC {auc:.3f}")
@@ -0,0 +1,30 @@
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import Pipeline
+
+from data import store
+
+# The alpha model of mlrun.py: engineered features -> P(next H-day return > 0)
+
+FEATURES = [
+    "dist_ema50", "rsi_slope", "volatility", "vol_contraction", "breakout",
+    "ema_50", "ema_200", "rsi"
+]
+H = 5
+
+
+def load_dataset(path, features=FEATURES, horizon=H):
+    df = store.load_features(path, ["Date", "Close"] + features)
+
+    # 1 if next `horizon`-day return is positive, else 0
+    df[f"future_ret_{horizon}"] = df["Close"].shift(-horizon) / df["Close"] - 1
+    df["y"] = (df[f"future_ret_{horizon}"] > 0).astype(int)
+
+    return df.dropna().reset_index(drop=True)
+
+
+def make_model(C=1.0, max_iter=2000):
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("model", LogisticRegression(C=C, max_iter=max_iter))
+    ])
@@ -1,121 +1,118 @@
 # ml_prob_backtest_with_stats.py
 # End-to-end: trade using ML probabilities + backtest + t-test + bootstrap confidence
 
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.stats import ttest_1samp
 
+from data import store
+from agenttest import engine, strategies, metrics, bootstrap
+from agenttest.ledger import Ledger
+from data.instrument import laps
+
 # ================== PATH ==================
 PATH = "csvfile/tatapower_2020_2025_daily_ml_probs.csv"  # change per stock
 
 # ================== LOAD ==================
-df = pd.read_csv(PATH)
-df["Date"] = pd.to_datetime(df["Date"])
-
-# ================== PARAMETERS ==================
-INITIAL_CAPITAL = 10000
-RISK_PER_TRADE = 0.02        # 2% risk per trade
-SL_PCT = 0.02                # 2% stop loss
-TP_PCT = 0.04                # 4% take profit
-LONG_PROB = 0.60
-SHORT_PROB = 0.40
-
-# ================== STATE ==================
-cash = INITIAL_CAPITAL
-position = 0        # 1 long, -1 short, 0 flat
-entry = 0
-shares = 0
-
-equity = [INITIAL_CAPITAL]
-trade_returns = []
-trade_log = []
-
-# ================== BACKTEST ==================
-for i in range(1, len(df)):
-    price = df.loc[i, "Close"]
-    prob = df.loc[i, "prob_up"]
-
-    equity.append(cash + shares * price)
-
-    # ENTRY
-    if position == 0:
-        risk_amt = cash * RISK_PER_TRADE
-        if prob > LONG_PROB:
-            position = 1
-            entry = price
-            shares = risk_amt / (price * SL_PCT)
-        elif prob < SHORT_PROB:
-            position = -1
-            entry = price
-            shares = risk_amt / (price * SL_PCT)
-
-    # EXIT
-    elif position != 0:
-        if position == 1:
-            if price <= entry*(1-SL_PCT) or price >= entry*(1+TP_PCT):
-                pnl = (price-entry)*shares
-                cash += pnl
-                trade_returns.append(pnl / INITIAL_CAPITAL)
-                trade_log.append((df.loc[i, "Date"], position, entry, price, pnl))
-                position = 0
-                shares = 0
-        else:
-            if price >= entry*(1+SL_PCT) or price <= entry*(1-TP_PCT):
-                pnl = (entry-price)*shares
-                cash += pnl
-                trade_returns.append(pnl / INITIAL_CAPITAL)
-                trade_log.append((df.loc[i, "Date"], position, entry, price, pnl))
-                position = 0
-                shares = 0
-
-# ================== RESULTS ==================
-final_capital = equity[-1]
-total_return = (final_capital/INITIAL_CAPITAL - 1) * 100
-years = (df["Date"].iloc[-1] - df["Date"].iloc[0]).days / 365.25
-cagr = ((final_capital/INITIAL_CAPITAL)**(1/years) - 1) * 100
-
-wins = [r for r in trade_returns if r > 0]
-losses = [r for r in trade_returns if r < 0]
-
-print("\n===== ML PROBABILITY BACKTEST RESULTS =====")
-print("Final Capital :", round(final_capital, 2))
-print("Total Return  :", round(total_return, 2), "%")
-print("CAGR          :", round(cagr, 2), "%")
-print("Trades        :", len(trade_returns))
-print("Win Rate      :", round(len(wins)/len(trade_returns)*100, 2) if trade_returns else 0)
-print("Avg Win       :", round(np.mean(wins)*100, 2) if wins else 0)
-print("Avg Loss      :", round(np.mean(losses)*100, 2) if losses else 0)
-
-# ================== T-TEST ==================
-r = np.array(trade_returns)
-t_stat, p_val = ttest_1samp(r, 0)
-
-print("\n===== T-TEST =====")
-print("Mean Return per Trade :", round(np.mean(r)*100, 4), "%")
-print("T-Statistic           :", round(t_stat, 4))
-print("P-Value               :", round(p_val, 6))
-print("EDGE:", "REAL" if p_val < 0.05 else "NO EDGE")
-
-# ================== BOOTSTRAP CONFIDENCE ==================
-boot_means = []
-for _ in range(10000):
-    sample = np.random.choice(r, size=len(r), replace=True)
-    boot_means.append(np.mean(sample))
-
-ci_low, ci_high = np.percentile(boot_means, [2.5, 97.5])
-
-print("\n===== BOOTSTRAP CONFIDENCE =====")
-print("95% CI:", round(ci_low*100, 3), "% to", round(ci_high*100, 3), "%")
-print("PROFIT PROBABILITY:", "HIGH" if ci_low > 0 else "LOW")
-
-# ================== PLOT ==================
-plt.figure(figsize=(12,6))
-plt.plot(equity, label="Equity Curve")
-plt.title("ML Probability Trading Equity Curve")
-plt.xlabel("Time")
-plt.ylabel("Capital")
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.show()
+with laps(symbol=store.symbol_key(PATH)) as lap:
+    lap("load")
+    df = strategies.load_ml_prob(PATH)
+
+    # ================== PARAMETERS ==================
+    INITIAL_CAPITAL = 10000
+    RISK_PER_TRADE = 0.02        # 2% risk per trade
+    SL_PCT = 0.02                # 2% stop loss
+    TP_PCT = 0.04                # 4% take profit
+    LONG_PROB = 0.60
+    SHORT_PROB = 0.40
+
+    # ================== BACKTEST ==================
+    lap("backtest", rows=len(df))
+    c = engine.columns(df, strategies.ML_PROB_COLUMNS)
+    price = c["Close"]
+
+    trades, _ = strategies.ml_prob(
+        c,
+        long_prob=LONG_PROB,
+        short_prob=SHORT_PROB,
+        sl_pct=SL_PCT,
+        tp_pct=TP_PCT,
+        risk_per_trade=RISK_PER_TRADE,
+        initial_capital=INITIAL_CAPITAL,
+    )
+    shares, pnl, open_shares = strategies.risk_sized_pnl(trades, INITIAL_CAPITAL, RISK_PER_TRADE, SL_PCT)
+
+    # shares are held from the bar after entry up to and including the exit bar
+    held = np.zeros(len(df))
+    for e, x, sh in zip(trades["entry_idx"], trades["exit_idx"], shares):
+        held[e+1:x+1] = sh
+    if trades["open"] is not None:
+        held[trades["open"]["entry_idx"]+1:] = open_shares
+
+    equity = engine.cash_curve(pnl, trades["exit_idx"], INITIAL_CAPITAL, len(df)) + held * price
+    equity[0] = INITIAL_CAPITAL
+
+    lap("ledger")
+    trade_log = Ledger()
+    trade_log.append(store.symbol_key(PATH), trades, df["Date"], shares=shares, pnl=pnl, returns=pnl / INITIAL_CAPITAL)
+    trade_log.save("csvfile/ledger_ml_prob.npz")
+    trade_returns = trade_log["return"]
+
+    # ================== RESULTS ==================
+    lap("stats", trades=len(trade_returns))
+    final_capital = equity[-1]
+    total_return = (final_capital/INITIAL_CAPITAL - 1) * 100
+    years = metrics.years_between(df["Date"])
+    cagr = metrics.cagr(equity, years) * 100
+
+    stats = metrics.trade_stats(trade_returns)
+    curve = metrics.equity_stats(
+        equity, years,
+        in_market=held != 0,
+        traded_notional=(shares * (trades["entry_price"] + trades["exit_price"])).sum(),
+    )
+
+    print("\n===== ML PROBABILITY BACKTEST RESULTS =====")
+    print("Final Capital :", round(final_capital, 2))
+    print("Total Return  :", round(total_return, 2), "%")
+    print("CAGR          :", round(cagr, 2), "%")
+    print("Max Drawdown  :", round(curve["max_drawdown"]*100, 2), "%")
+    print("Sharpe        :", round(curve["sharpe"], 2))
+    print("Exposure      :", round(curve["exposure"]*100, 2), "%")
+    print("Turnover      :", round(curve["turnover"], 2), "x / year")
+    print("Trades        :", stats["trades"])
+    print("Win Rate      :", round(stats["win_rate"]*100, 2) if stats["trades"] else 0)
+    print("Avg Win       :", round(stats["avg_win"]*100, 2) if stats["wins"] else 0)
+    print("Avg Loss      :", round(stats["avg_loss"]*100, 2) if stats["losses"] else 0)
+
+    # ================== T-TEST ==================
+    lap("ttest")
+    r = np.array(trade_returns)
+    t_stat, p_val = ttest_1samp(r, 0)
+
+    print("\n===== T-TEST =====")
+    print("Mean Return per Trade :", round(np.mean(r)*100, 4), "%")
+    print("T-Statistic           :", round(t_stat, 4))
+    print("P-Value               :", round(p_val, 6))
+    print("EDGE:", "REAL" if p_val < 0.05 else "NO EDGE")
+
+    # ================== BOOTSTRAP CONFIDENCE ==================
+    lap("bootstrap", trades=len(r))
+    boot_means = bootstrap.bootstrap(r, size=10000, seed=0)
+    ci_low, ci_high = bootstrap.confidence_interval(boot_means, 0.95)
+
+    print("\n===== BOOTSTRAP CONFIDENCE =====")
+    print("95% CI:", round(ci_low*100, 3), "% to", round(ci_high*100, 3), "%")
+    print("PROFIT PROBABILITY:", "HIGH" if ci_low > 0 else "LOW")
+
+    # ================== PLOT ==================
+    lap("plot")
+    plt.figure(figsize=(12,6))
+    plt.plot(equity, label="Equity Curve")
+    plt.title("ML Probability Trading Equity Curve")
+    plt.xlabel("Time")
+    plt.ylabel("Capital")
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    plt.show()
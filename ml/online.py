@@ -0,0 +1,227 @@
+import pandas as pd
+import numpy as np
+import os
+import pickle
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.preprocessing import StandardScaler
+
+from data import store
+from ml.model import FEATURES, H, load_dataset
+
+# Daily model updates that cost in proportion to the new rows, not the history.
+#
+#   report = update(paths)            # after new bars were appended to the store
+#   prob = predict(state, X)          # state = load_state(symbol)
+#
+# mlrun.py's scaler + LogisticRegression has no incremental fit, so the online
+# model is StandardScaler.partial_fit (running mean / variance) followed by an
+# SGDClassifier with log loss (the same logistic model, fitted by SGD) and its
+# partial_fit.
+#
+# A row can only be learned once its label is known, `horizon` bars later. Every
+# update scores the feature rows that arrived since the last one with the
+# current model and keeps those predictions; when a row's label arrives it is
+# paired with the prediction made back then and the row is learned. The pairs go
+# into a rolling window; when its AUC drops more than `tolerance` below the
+# holdout AUC of the last full fit, the symbol is refitted from scratch.
+#
+# An update reads only the store rows after the last learned one, straight from
+# the memory maps of data/store.py; the whole history is loaded for full fits only.
+#
+# State per symbol is checkpointed to csvfile/models/online/<symbol>.pkl.
+
+ONLINE_DIR = os.path.join("csvfile", "models", "online")
+DRIFT_WINDOW = 120        # labelled rows in the rolling AUC
+MIN_WINDOW = 60           # rows before the drift check is trusted
+TOLERANCE = 0.05
+HOLDOUT = 0.2             # last share of history that scores a full fit
+
+
+def make_online_model(alpha=1e-4):
+    return StandardScaler(), SGDClassifier(loss="log_loss", alpha=alpha, random_state=0)
+
+
+def _auc(y, p):
+    return roc_auc_score(y, p) if len(np.unique(y)) == 2 else np.nan
+
+
+# ================= STATE =================
+
+def _state_path(symbol, root):
+    return os.path.join(root, symbol + ".pkl")
+
+
+def load_state(symbol, root=ONLINE_DIR):
+    path = _state_path(symbol, root)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def save_state(state, root=ONLINE_DIR):
+    os.makedirs(root, exist_ok=True)
+    path = _state_path(state["symbol"], root)
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def predict(state, X):
+    return state["model"].predict_proba(state["scaler"].transform(X))[:, 1]
+
+
+# ================= FIT =================
+
+def full_fit(symbol, X, y, last_date, features=FEATURES, horizon=H, alpha=1e-4):
+    # baseline AUC from a fit on all but the last HOLDOUT of the rows, then the
+    # model that goes forward is fitted on everything
+    cut = int(len(y) * (1 - HOLDOUT))
+    scaler, model = make_online_model(alpha)
+    model.fit(scaler.fit_transform(X[:cut]), y[:cut])
+    baseline = _auc(y[cut:], model.predict_proba(scaler.transform(X[cut:]))[:, 1])
+
+    scaler, model = make_online_model(alpha)
+    scaler.partial_fit(X)
+    model.fit(scaler.transform(X), y)
+    return {
+        "symbol": symbol, "features": list(features), "horizon": horizon, "alpha": alpha,
+        "scaler": scaler, "model": model, "last_date": last_date, "rows": len(y),
+        "baseline_auc": baseline, "refits": 0,
+        # predictions made when a row's features arrived, waiting for its label
+        "pending_dates": np.empty(0, dtype="datetime64[ns]"), "pending_p": np.empty(0),
+        "window_y": np.empty(0, dtype=np.int8), "window_p": np.empty(0),
+    }
+
+
+def _rows_after(key, features, horizon, after, until=None):
+    # store rows dated after `after` (up to `until`), read from the memory maps;
+    # a row is labelled when the close `horizon` rows later is already there
+    # -> (labelled rows with y, feature rows), DataFrames with Date + features
+    cols = store.read_columns(key, ["Date", "Close"] + features)
+    dates = cols["Date"]
+    a = int(np.searchsorted(dates, np.datetime64(after), side="right"))
+    b = len(dates) if until is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(until)), side="right"))
+    df = pd.DataFrame({col: np.asarray(cols[col][a:b]) for col in ["Date"] + features})
+
+    close = np.asarray(cols["Close"][a:b], dtype=float)
+    future = np.full(len(close), np.nan)
+    known = max(len(close) - horizon, 0)
+    future[:known] = close[horizon:] / close[:known] - 1
+
+    ok = np.isfinite(df[features].to_numpy(dtype=float)).all(axis=1) & np.isfinite(close)
+    labelled = df[ok & np.isfinite(future)].assign(y=(future[ok & np.isfinite(future)] > 0).astype(int))
+    return labelled.reset_index(drop=True), df[ok].reset_index(drop=True)
+
+
+def _history(path, features, horizon, until):
+    # every labelled row up to `until`, for full fits
+    df = load_dataset(path, features, horizon)
+    if until is not None:
+        # a label needs the close `horizon` bars later, which must be <= until
+        df = df.iloc[:max(int((df["Date"] <= pd.Timestamp(until)).sum()) - horizon, 0)]
+    return df
+
+
+def _predict_new(state, bars, features):
+    # score the feature rows that arrived since the last prediction
+    seen = state["pending_dates"][-1] if len(state["pending_dates"]) else state["last_date"]
+    new = bars[bars["Date"].to_numpy() > np.datetime64(seen)]
+    if len(new):
+        state["pending_dates"] = np.concatenate([state["pending_dates"], new["Date"].to_numpy()])
+        state["pending_p"] = np.concatenate([state["pending_p"], predict(state, new[features].to_numpy(dtype=float))])
+
+
+def update_symbol(path, features=FEATURES, horizon=H, until=None, alpha=1e-4,
+                  tolerance=TOLERANCE, root=ONLINE_DIR):
+    # until: only use bars up to this date (replaying history)
+    # -> (state, report row)
+    symbol = store.symbol_key(path)
+    state = load_state(symbol, root)
+    report = {"symbol": symbol, "new_rows": 0, "window_auc": np.nan, "refit": False}
+
+    if state is None or state["features"] != list(features) or state["horizon"] != horizon:
+        df = _history(path, features, horizon, until)
+        X, y = df[features].to_numpy(dtype=float), df["y"].to_numpy()
+        state = full_fit(symbol, X, y, df["Date"].iloc[-1], features, horizon, alpha)
+        report.update(new_rows=len(y), refit=True)
+    else:
+        # only the rows after the last learned one are read, whatever the history
+        new, bars = _rows_after(symbol, features, horizon, state["last_date"], until)
+        if len(new):
+            X, y = new[features].to_numpy(dtype=float), new["y"].to_numpy()
+
+            # pair the new labels with the predictions made before they were known
+            dates = new["Date"].to_numpy()
+            pending = state["pending_dates"]
+            at = np.searchsorted(pending, dates)
+            scored = at < len(pending)
+            scored[scored] = pending[at[scored]] == dates[scored]
+            state["window_y"] = np.concatenate([state["window_y"], y[scored]])[-DRIFT_WINDOW:]
+            state["window_p"] = np.concatenate([state["window_p"], state["pending_p"][at[scored]]])[-DRIFT_WINDOW:]
+            keep = state["pending_dates"] > dates[-1]
+            state["pending_dates"], state["pending_p"] = state["pending_dates"][keep], state["pending_p"][keep]
+
+            auc = _auc(state["window_y"], state["window_p"]) if len(state["window_y"]) >= MIN_WINDOW else np.nan
+            report.update(new_rows=len(y), window_auc=auc)
+
+            if auc < state["baseline_auc"] - tolerance:
+                refits = state["refits"] + 1
+                df = _history(path, features, horizon, until)
+                X_all, y_all = df[features].to_numpy(dtype=float), df["y"].to_numpy()
+                state = full_fit(symbol, X_all, y_all, df["Date"].iloc[-1], features, horizon, alpha)
+                state["refits"] = refits
+                report["refit"] = True
+            else:
+                state["scaler"].partial_fit(X)
+                state["model"].partial_fit(state["scaler"].transform(X), y, classes=[0, 1])
+                state["last_date"] = new["Date"].iloc[-1]
+                state["rows"] += len(y)
+
+    if report["refit"]:
+        # feature rows past the last learned one, the unlabelled tail included
+        _, bars = _rows_after(symbol, features, horizon, state["last_date"], until)
+    _predict_new(state, bars, features)
+    report["baseline_auc"] = state["baseline_auc"]
+    save_state(state, root)
+    return state, report
+
+
+def update(paths, **kwargs):
+    # one update of every symbol -> one report row each
+    return pd.DataFrame([update_symbol(path, **kwargs)[1] for path in paths])
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    import time
+    import shutil
+    from data.fetch import SYMBOLS, raw_path
+
+    paths = [raw_path(s) for s in SYMBOLS]
+    root = os.path.join(ONLINE_DIR, "replay")
+    shutil.rmtree(root, ignore_errors=True)
+
+    # start from a full fit on the history up to 2024, then replay every later
+    # trading day as if it had just been appended
+    update(paths, until="2024-01-01", root=root)
+    days = pd.DatetimeIndex(store.load_features(paths[0], ["Date"])["Date"])
+    days = days[days > "2024-01-01"]
+
+    start = time.perf_counter()
+    reports = [update(paths, until=day, root=root).assign(day=day) for day in days]
+    elapsed = time.perf_counter() - start
+    log = pd.concat(reports, ignore_index=True)
+
+    start = time.perf_counter()
+    update(paths, root=os.path.join(ONLINE_DIR, "full"))
+    full = time.perf_counter() - start
+    shutil.rmtree(os.path.join(ONLINE_DIR, "full"), ignore_errors=True)
+
+    print(f"{len(days)} daily updates of {len(paths)} symbols: {elapsed / len(days) * 1000:.1f} ms per day "
+          f"(full refit of all symbols: {full * 1000:.1f} ms)")
+    print(f"refits triggered by drift: {int(log['refit'].sum())}")
+    last = log.groupby("symbol").last()[["baseline_auc", "window_auc"]]
+    print(last.round(3).to_string())
@@ -0,0 +1,144 @@
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.metrics import roc_auc_score
+
+from data import store
+from ml.model import FEATURES, H, load_dataset, make_model
+from ml.walkforward import folds
+
+# mlrun.py for the whole universe in one run: every symbol's features in one
+# symbol-tagged dataset, time-series cross-validation folds fitted in parallel.
+#
+#   probs = train(paths, mode="pooled")       # one model per fold, all symbols
+#   probs = train(paths, mode="per_symbol")   # one model per (symbol, fold)
+#   probs["tatapower_2020_2025_daily"]        # Date, Close, prob_up, fold
+#
+# Folds are walkforward.folds over the shared calendar of all symbols, so a
+# pooled model never trains on a date inside its test window of any symbol.
+# The dataset is loaded once and handed to every worker process once (pool
+# initializer); a task is just (symbol, train range, test range) on the
+# calendar, so no fold re-reads or re-sends features.
+#
+# The pooled default leaves out ema_50 / ema_200: raw price levels do not mean
+# the same thing across symbols.
+
+MODES = ["pooled", "per_symbol"]
+POOLED_FEATURES = [f for f in FEATURES if f not in ("ema_50", "ema_200")]
+
+_data = {}      # per worker process: X, y, symbol code and calendar position of every row
+
+
+# ================= DATA =================
+
+def load_pool(paths, features=FEATURES, horizon=H):
+    frames = []
+    for path in paths:
+        df = load_dataset(path, features, horizon)
+        df.insert(0, "symbol", store.symbol_key(path))
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _init(X, y, code, pos):
+    _data.update(X=X, y=y, code=code, pos=pos)
+
+
+# ================= ONE FOLD =================
+
+def _fit(symbol, train, test, model_params):
+    # symbol: code of the symbol to fit, -1 for all; train / test: first and last
+    # calendar position -> (test rows, prob_up, AUC)
+    X, y, code, pos = _data["X"], _data["y"], _data["code"], _data["pos"]
+    rows = np.ones(len(y), dtype=bool) if symbol < 0 else code == symbol
+    tr = np.flatnonzero(rows & (pos >= train[0]) & (pos <= train[1]))
+    te = np.flatnonzero(rows & (pos >= test[0]) & (pos <= test[1]))
+    if len(te) == 0 or len(np.unique(y[tr])) < 2:
+        return te, np.full(len(te), np.nan), np.nan
+
+    pipe = make_model(**model_params)
+    pipe.fit(X[tr], y[tr])
+    proba = pipe.predict_proba(X[te])[:, 1]
+    auc = roc_auc_score(y[te], proba) if len(np.unique(y[te])) == 2 else np.nan
+    return te, proba, auc
+
+
+# ================= TRAIN =================
+
+def train(paths, mode="pooled", features=None, horizon=H, first_test="2021-01-01", test_months=6,
+          train_months=None, model_params=None, workers=None):
+    # -> {symbol: DataFrame[Date, Close, prob_up, fold]}, per (symbol, fold) AUC
+    # in .attrs["folds"]
+    if mode not in MODES:
+        raise ValueError(f"unknown mode {mode!r}, expected one of {MODES}")
+    features = features or (POOLED_FEATURES if mode == "pooled" else FEATURES)
+    model_params = model_params or {}
+
+    df = load_pool(paths, features, horizon)
+    symbols = list(df["symbol"].unique())
+    code = pd.Categorical(df["symbol"], categories=symbols).codes.astype(np.int64)
+    calendar = np.unique(df["Date"].to_numpy())
+    pos = np.searchsorted(calendar, df["Date"].to_numpy())
+    X = df[features].to_numpy(dtype=float)
+    y = df["y"].to_numpy()
+
+    fold_list = folds(calendar, first_test, test_months, train_months, horizon)
+    groups = [-1] if mode == "pooled" else range(len(symbols))
+    tasks = [
+        (g, (f["train"][0], f["train"][-1]), (f["test"][0], f["test"][-1]), model_params)
+        for g in groups for f in fold_list
+    ]
+    fold_of = [k for _ in groups for k in range(len(fold_list))]
+
+    if workers == 1:
+        _init(X, y, code, pos)
+        results = [_fit(*t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init, initargs=(X, y, code, pos)) as pool:
+            results = list(pool.map(_fit, *zip(*tasks)))
+
+    prob = np.full(len(df), np.nan)
+    fold = np.full(len(df), -1)
+    for k, (te, proba, _) in zip(fold_of, results):
+        prob[te] = proba
+        fold[te] = k
+
+    # ---- per symbol frames and AUC of every (symbol, fold) ----
+    out = {}
+    for s, symbol in enumerate(symbols):
+        rows = np.flatnonzero((code == s) & (fold >= 0))
+        part = df.loc[rows, ["Date", "Close"]].reset_index(drop=True)
+        part["prob_up"] = prob[rows]
+        part["fold"] = fold[rows]
+
+        stats = []
+        for k, f in enumerate(fold_list):
+            r = rows[fold[rows] == k]
+            ok = len(np.unique(y[r])) == 2 and not np.isnan(prob[r]).any()
+            stats.append({
+                "fold": k, "test_start": f["test_start"], "test_rows": len(r),
+                "auc": roc_auc_score(y[r], prob[r]) if ok else np.nan,
+            })
+        part.attrs["folds"] = pd.DataFrame(stats)
+        out[symbol] = part
+    return out
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    import time
+    from data.fetch import SYMBOLS, raw_path
+
+    paths = [raw_path(s) for s in SYMBOLS]
+    aucs = {}
+    for mode in MODES:
+        start = time.perf_counter()
+        probs = train(paths, mode=mode)
+        print(f"{mode}: {len(probs)} symbols in {time.perf_counter() - start:.2f}s")
+        for symbol, out in probs.items():
+            store.write_frame(f"{symbol}_{mode}_probs", out)
+        aucs[mode] = {symbol: out.attrs["folds"]["auc"].mean() for symbol, out in probs.items()}
+
+    print("\n===== MEAN OUT-OF-SAMPLE AUC =====")
+    print(pd.DataFrame(aucs).round(3).to_string())
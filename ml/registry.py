@@ -0,0 +1,131 @@
+import pandas as pd
+import os
+import json
+import pickle
+import time
+
+from data import store
+from data.cache import fingerprint
+from ml.model import FEATURES, H, load_dataset, make_model
+
+# Fitted pipelines on disk, so scoring does not mean refitting.
+#
+#   csvfile/models/
+#       registry.json                       {name: [entry of every version, oldest first]}
+#       tatapower_2020_2025_daily/v3.pkl    the pipeline
+#
+#   entry = register("tatapower_2020_2025_daily", pipe, FEATURES, H, "2020-01-01", "2023-12-29", fp)
+#   model = load("tatapower_2020_2025_daily")        # latest version
+#   model["pipeline"].predict_proba(X[model["features"]])
+#
+# An entry records the feature list, horizon, training window, model settings
+# and a fingerprint of the training data. fit() first looks for an entry with
+# the same fingerprint and settings and returns it instead of refitting.
+
+REGISTRY_DIR = os.path.join("csvfile", "models")
+
+
+def _index_path(root):
+    return os.path.join(root, "registry.json")
+
+
+def read_index(root=REGISTRY_DIR):
+    path = _index_path(root)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_index(index, root):
+    tmp = _index_path(root) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, _index_path(root))
+
+
+# ================= WRITE =================
+
+def register(name, pipeline, features, horizon, train_start, train_end, data_fingerprint,
+             params=None, metrics=None, root=REGISTRY_DIR):
+    index = read_index(root)
+    versions = index.setdefault(name, [])
+    version = versions[-1]["version"] + 1 if versions else 1
+
+    folder = os.path.join(root, name)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"v{version}.pkl")
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(pipeline, f)
+    os.replace(path + ".tmp", path)
+
+    entry = {
+        "version": version,
+        "file": os.path.relpath(path, root),
+        "features": list(features),
+        "horizon": horizon,
+        "train_start": str(pd.Timestamp(train_start).date()),
+        "train_end": str(pd.Timestamp(train_end).date()),
+        "fingerprint": data_fingerprint,
+        "params": params or {},
+        "metrics": metrics or {},
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    versions.append(entry)
+    _write_index(index, root)
+    return entry
+
+
+# ================= READ =================
+
+def entry(name, version=None, root=REGISTRY_DIR):
+    # version=None: the latest
+    versions = read_index(root).get(name)
+    if not versions:
+        raise KeyError(f"no model registered as {name!r} in {root}")
+    if version is None:
+        return versions[-1]
+    for e in versions:
+        if e["version"] == version:
+            return e
+    raise KeyError(f"{name!r} has no version {version}")
+
+
+def load(name, version=None, root=REGISTRY_DIR):
+    # -> the entry plus "name" and the unpickled "pipeline"
+    e = entry(name, version, root)
+    with open(os.path.join(root, e["file"]), "rb") as f:
+        pipeline = pickle.load(f)
+    return {**e, "name": name, "pipeline": pipeline}
+
+
+def models(root=REGISTRY_DIR):
+    # latest version of every model, one row each
+    rows = [{"name": name, **versions[-1]} for name, versions in read_index(root).items()]
+    return pd.DataFrame(rows)
+
+
+# ================= FIT =================
+
+def fit(path, name=None, features=FEATURES, horizon=H, train_end=None, model_params=None,
+        root=REGISTRY_DIR):
+    # fit mlrun.py's pipeline on one symbol up to train_end (None: all labelled
+    # rows) and register it, unless the same data and settings already are
+    name = name or store.symbol_key(path)
+    model_params = model_params or {}
+    df = load_dataset(path, features, horizon)
+    if train_end is not None:
+        df = df[df["Date"] <= pd.Timestamp(train_end)]
+    X = df[features].to_numpy(dtype=float)
+    y = df["y"].to_numpy()
+    fp = fingerprint(X, y)
+
+    for e in read_index(root).get(name, [])[::-1]:
+        if e["fingerprint"] == fp and e["features"] == list(features) and \
+                e["horizon"] == horizon and e["params"] == model_params:
+            return e
+
+    pipe = make_model(**model_params)
+    pipe.fit(X, y)
+    return register(name, pipe, features, horizon, df["Date"].iloc[0], df["Date"].iloc[-1], fp,
+                    params=model_params, root=root)
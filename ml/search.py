@@ -0,0 +1,273 @@
+import pandas as pd
+import numpy as np
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from threadpoolctl import threadpool_limits
+
+from ml import dataset
+from ml.model import FEATURES, H, make_model
+from ml.pooled import POOLED_FEATURES
+
+# Model selection for mlrun.py: model family, regularization, feature subset
+# and decision threshold, searched on the pooled dataset of ml/dataset.py.
+#
+#   result = search(n_configs=300)        # DataFrame, best first
+#   best = result.iloc[0]                 # family, params, features, auc, threshold, ...
+#   pipe = build_model(best["config"])
+#
+# Folds are purged k-fold on the shared calendar of all symbols: the calendar is
+# cut into n_splits contiguous test blocks and a model trains on everything
+# else, minus the `purge` bars before the block (their labels look at prices
+# inside it) and the `embargo` bars after it (their rolling features overlap the
+# block's labels).
+#
+# Successive halving: every config is fitted on the first fold, the best 1/eta
+# by mean AUC go on to eta times as many folds, and so on until the survivors
+# have seen all folds. Folds already fitted are never refitted. Folds are taken
+# most recent first.
+#
+# The threshold is picked last, for the configs that survived: every cutoff in
+# THRESHOLDS is scored on their out-of-fold prob_up by the mean forward return
+# of the rows above it (the trades mlrun.py's `proba > 0.6` would take).
+#
+# Workers open the memory-mapped dataset themselves and cache each fold's
+# train / test matrices per feature subset, so a task is just (config, fold).
+
+FAMILIES = ["logistic", "logistic_l1", "hist_gb"]
+THRESHOLDS = [0.5, 0.525, 0.55, 0.575, 0.6, 0.625, 0.65]
+MIN_SIGNALS = 50          # a threshold needs this many out-of-fold rows above it
+BASELINE = {"family": "logistic", "C": 1.0, "features": list(FEATURES)}     # mlrun.py as it is
+
+_data = {}      # per worker process: X, y, folds and the fold matrices built so far
+
+
+# ================= CONFIGS =================
+
+def build_model(config):
+    family = config["family"]
+    if family == "logistic":
+        return make_model(C=config["C"])
+    if family == "logistic_l1":
+        return Pipeline([
+            ("scaler", StandardScaler()),
+            # penalty="l1" for sklearn < 1.8, which ignores l1_ratio (plain L2 without it);
+            # l1_ratio=1.0 for sklearn >= 1.8, which deprecates penalty
+            ("model", LogisticRegression(C=config["C"], penalty="l1", l1_ratio=1.0, solver="liblinear"))
+        ])
+    if family == "hist_gb":
+        return HistGradientBoostingClassifier(
+            max_depth=config["max_depth"], learning_rate=config["learning_rate"],
+            l2_regularization=config["l2"], max_iter=100, random_state=0,
+        )
+    raise ValueError(f"unknown model family {family!r}, expected one of {FAMILIES}")
+
+
+def sample_configs(n, features=POOLED_FEATURES, seed=0):
+    # n distinct random configs, BASELINE first
+    rng = np.random.default_rng(seed)
+    configs, seen = [BASELINE], {repr(BASELINE)}
+    while len(configs) < n:
+        family = FAMILIES[rng.integers(len(FAMILIES))]
+        if family == "hist_gb":
+            config = {
+                "family": family,
+                "max_depth": int(rng.integers(2, 5)),
+                "learning_rate": float(np.round(10 ** rng.uniform(-2, -0.7), 4)),
+                "l2": float(np.round(10 ** rng.uniform(-3, 1), 4)),
+            }
+        else:
+            config = {"family": family, "C": float(np.round(10 ** rng.uniform(-3, 1), 4))}
+        size = rng.integers(2, len(features) + 1)
+        config["features"] = [features[j] for j in np.sort(rng.choice(len(features), size, replace=False))]
+        if repr(config) not in seen:
+            seen.add(repr(config))
+            configs.append(config)
+    return configs
+
+
+# ================= FOLDS =================
+
+def purged_folds(dates, n_splits=6, purge=H, embargo=H):
+    # dates: date of every row, any number of symbols -> [{"test_start", "train", "test"}]
+    calendar = np.unique(dates)
+    pos = np.searchsorted(calendar, dates)
+    bounds = np.linspace(0, len(calendar), n_splits + 1).astype(int)
+    out = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        test = (pos >= a) & (pos < b)
+        train = (pos < a - purge) | (pos >= b + embargo)
+        out.append({
+            "test_start": pd.Timestamp(calendar[a]),
+            "train": np.flatnonzero(train), "test": np.flatnonzero(test),
+        })
+    return out
+
+
+# ================= ONE FIT =================
+
+def _init(name, root, horizon, folds):
+    ds = dataset.open_dataset(name, root)
+    rows, y = dataset.horizon(ds, horizon)
+    _data.clear()
+    _data.update(X=ds["X"], rows=rows, y=y, folds=folds, columns=ds["meta"]["features"], cache={})
+
+
+def _worker_init(*init):
+    # one BLAS / OpenMP thread per worker process, for the life of the process
+    threadpool_limits(1)
+    _init(*init)
+
+
+def _fold(k, features):
+    key = (k, tuple(features))
+    if key not in _data["cache"]:
+        fold = _data["folds"][k]
+        cols = [_data["columns"].index(f) for f in features]
+        X = _data["X"]
+        tr, te = _data["rows"][fold["train"]], _data["rows"][fold["test"]]
+        _data["cache"][key] = (
+            np.asarray(X[tr][:, cols], dtype=float), _data["y"][fold["train"]],
+            np.asarray(X[te][:, cols], dtype=float), _data["y"][fold["test"]],
+        )
+    return _data["cache"][key]
+
+
+def _fit(config, k):
+    # -> (AUC, prob_up of the fold's test rows)
+    X_train, y_train, X_test, y_test = _fold(k, config["features"])
+    pipe = build_model(config)
+    with warnings.catch_warnings():
+        # logistic_l1 sets both penalty and l1_ratio, each sklearn warns about one
+        warnings.filterwarnings("ignore", message=".*'penalty' was deprecated")
+        warnings.filterwarnings("ignore", message=".*l1_ratio parameter is only used")
+        pipe.fit(X_train, y_train)
+    proba = pipe.predict_proba(X_test)[:, 1]
+    auc = roc_auc_score(y_test, proba) if len(np.unique(y_test)) == 2 else np.nan
+    return auc, proba.astype(np.float32)
+
+
+# ================= THRESHOLD =================
+
+def pick_threshold(proba, ret, thresholds=THRESHOLDS, min_signals=MIN_SIGNALS):
+    # -> (threshold, signals, mean forward return, hit rate) of the best cutoff
+    best = (np.nan, 0, np.nan, np.nan)
+    for t in thresholds:
+        on = proba > t
+        if on.sum() < min_signals:
+            continue
+        mean = ret[on].mean()
+        if np.isnan(best[2]) or mean > best[2]:
+            best = (t, int(on.sum()), float(mean), float((ret[on] > 0).mean()))
+    return best
+
+
+# ================= SEARCH =================
+
+def search(n_configs=300, configs=None, horizon=H, n_splits=6, purge=None, embargo=None,
+           eta=3, name="default", root=dataset.DATASET_DIR, workers=None, seed=0):
+    # configs=None: BASELINE plus n_configs - 1 sampled ones
+    # -> DataFrame, one row per config, best first; fold AUCs in .attrs["auc"]
+    purge = horizon if purge is None else purge
+    embargo = horizon if embargo is None else embargo
+    configs = configs or sample_configs(n_configs, seed=seed)
+
+    ds = dataset.open_dataset(name, root)
+    rows, y = dataset.horizon(ds, horizon)
+    ret = np.asarray(ds["ret"][rows, ds["meta"]["horizons"].index(horizon)], dtype=float)
+    fold_list = purged_folds(ds["Date"][rows], n_splits, purge, embargo)
+    order = list(range(n_splits))[::-1]
+
+    auc = np.full((len(configs), n_splits), np.nan)
+    proba = {}                          # (config, fold) -> prob_up of the test rows
+    alive = np.arange(len(configs))
+    rung, n_folds, rungs = 0, 1, np.zeros(len(configs), dtype=int)
+
+    init = (name, root, horizon, fold_list)
+    limits = None
+    if workers == 1:
+        _init(*init)
+        # the same one thread per fit in the caller's process, until the search ends
+        limits = threadpool_limits(1)
+    pool = None if workers == 1 else ProcessPoolExecutor(max_workers=workers, initializer=_worker_init, initargs=init)
+    try:
+        while True:
+            tasks = [(i, k) for i in alive for k in order[:n_folds] if (i, k) not in proba]
+            args = ([configs[i] for i, _ in tasks], [k for _, k in tasks])
+            results = map(_fit, *args) if pool is None else \
+                pool.map(_fit, *args, chunksize=max(len(tasks) // (4 * (workers or os.cpu_count())), 1))
+            for (i, k), (a, p) in zip(tasks, results):
+                auc[i, k], proba[i, k] = a, p
+            rungs[alive] = rung
+
+            if n_folds >= n_splits or len(alive) <= 1:
+                break
+            score = np.nanmean(auc[alive][:, order[:n_folds]], axis=1)
+            keep = max(len(alive) // eta, 1)
+            alive = alive[np.argsort(-score, kind="stable")[:keep]]
+            rung, n_folds = rung + 1, min(n_folds * eta, n_splits)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if limits is not None:
+            limits.restore_original_limits()
+
+    # ---- threshold of the survivors on their out-of-fold prob_up ----
+    complete = np.isfinite(auc).sum(axis=1) == n_splits
+    table = []
+    for i, config in enumerate(configs):
+        row = {
+            "family": config["family"],
+            "params": {key: v for key, v in config.items() if key not in ("family", "features")},
+            "features": config["features"], "n_features": len(config["features"]),
+            "rung": int(rungs[i]), "folds": int(np.isfinite(auc[i]).sum()),
+            "auc": np.nanmean(auc[i]), "auc_std": np.nanstd(auc[i]),
+            "threshold": np.nan, "signals": 0, "signal_ret": np.nan, "hit_rate": np.nan,
+            "config": config,
+        }
+        if complete[i]:
+            oof = np.full(len(rows), np.nan)
+            for k, fold in enumerate(fold_list):
+                oof[fold["test"]] = proba[i, k]
+            tested = np.isfinite(oof)
+            t, signals, mean, hit = pick_threshold(oof[tested], ret[tested])
+            row.update(threshold=t, signals=signals, signal_ret=mean, hit_rate=hit)
+        table.append(row)
+
+    out = pd.DataFrame(table)
+    out.insert(0, "config_id", np.arange(len(configs)))
+    out = out.sort_values(["rung", "auc"], ascending=False, kind="stable").reset_index(drop=True)
+    out.attrs["auc"] = auc
+    out.attrs["fits"] = len(proba)
+    out.attrs["folds"] = fold_list
+    return out
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    import time
+    from data.fetch import SYMBOLS, raw_path
+
+    dataset.build([raw_path(s) for s in SYMBOLS])
+
+    n_configs, n_splits = 300, 6
+    start = time.perf_counter()
+    result = search(n_configs, n_splits=n_splits)
+    elapsed = time.perf_counter() - start
+    print(f"{n_configs} configs x {n_splits} purged folds: {result.attrs['fits']} fits "
+          f"(exhaustive: {n_configs * n_splits}) in {elapsed:.1f}s")
+
+    print("\n===== BEST CONFIGS =====")
+    columns = ["family", "params", "n_features", "auc", "auc_std", "threshold", "signals", "signal_ret", "hit_rate"]
+    print(result[result["folds"] == n_splits][columns].head(10).round(4).to_string())
+    print("\nbest features:", result.iloc[0]["features"])
+
+    base = result[result["config_id"] == 0].iloc[0]
+    print(f"\nmlrun.py baseline (logistic C=1, all features): rung {base['rung']}, "
+          f"AUC {base['auc']:.4f} over {base['folds']} folds")
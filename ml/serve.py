@@ -0,0 +1,232 @@
+import pandas as pd
+import numpy as np
+import json
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+
+from data import store
+from ml import registry
+
+# Scoring with registered models, loaded once per process.
+#
+#   service = InferenceService()
+#   service.predict([("tatapower_2020_2025_daily", row), ("sbin_2020_2025_daily", row2)])
+#   service.score_latest(paths)                  # today's prob_up of the universe, one call
+#   service.submit("tatapower_2020_2025_daily", row).result()
+#
+# predict() groups the rows of a call by model and runs one predict_proba per
+# model. submit() is for many concurrent callers: requests queue up and a
+# worker thread scores whatever arrived within max_wait (up to max_batch rows)
+# with one predict() per model. submit() checks the model name and the row
+# (length, numeric and finite values) up front; should a model's batch still
+# fail, its rows are scored one by one so only the bad row's caller gets the
+# error. serve() puts submit() behind a local TCP socket, one JSON request per
+# line:
+#
+#   -> {"model": "tatapower_2020_2025_daily", "rows": [[...], ...]}
+#   <- {"prob_up": [...]}              or {"error": "..."}
+#
+# A row is a sequence in the model's feature order or a {feature: value} dict.
+
+HOST, PORT = "127.0.0.1", 8765
+
+
+class InferenceService:
+
+    def __init__(self, root=registry.REGISTRY_DIR, max_batch=4096, max_wait=0.002):
+        self.root = root
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.models = {}
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+
+    def model(self, name):
+        with self._lock:
+            if name not in self.models:
+                self.models[name] = registry.load(name, root=self.root)
+            return self.models[name]
+
+    # ================= BATCH =================
+
+    def _matrix(self, model, rows):
+        features = model["features"]
+        return np.array([
+            [row[f] for f in features] if isinstance(row, dict) else row
+            for row in rows
+        ], dtype=float).reshape(len(rows), len(features))
+
+    def predict(self, requests):
+        # requests: [(model name, row)] -> prob_up of every row, in order
+        names = np.array([name for name, _ in requests], dtype=object)
+        out = np.empty(len(requests))
+        for name in pd.unique(names):
+            at = np.flatnonzero(names == name)
+            model = self.model(name)
+            X = self._matrix(model, [requests[i][1] for i in at])
+            out[at] = model["pipeline"].predict_proba(X)[:, 1]
+        return out
+
+    def score_latest(self, paths, name_for=store.symbol_key):
+        # last stored bar of every symbol, each with its own model (name_for(path))
+        requests, dates = [], []
+        for path in paths:
+            name = name_for(path)
+            df = store.load_features(path, ["Date"] + self.model(name)["features"])
+            last = df.iloc[-1]
+            requests.append((name, last.to_dict()))
+            dates.append(last["Date"])
+        return pd.DataFrame({
+            "symbol": [store.symbol_key(p) for p in paths],
+            "model": [name for name, _ in requests],
+            "Date": dates,
+            "prob_up": self.predict(requests),
+        })
+
+    # ================= MICRO-BATCHES =================
+
+    def _check(self, name, row):
+        # unknown model or malformed row: fail this caller now, not its batch
+        features = self.model(name)["features"]
+        if isinstance(row, dict):
+            missing = [f for f in features if f not in row]
+            if missing:
+                raise KeyError(f"row for {name!r} is missing {missing}")
+        elif len(row) != len(features):
+            raise ValueError(f"row for {name!r} has {len(row)} values, expected {len(features)}")
+        x = np.asarray([row[f] for f in features] if isinstance(row, dict) else row, dtype=float)
+        if not np.isfinite(x).all():
+            raise ValueError(f"row for {name!r} has non-finite values: {x.tolist()}")
+
+    def submit(self, name, row):
+        self._check(name, row)
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._queue = queue.Queue()
+                    self._worker = threading.Thread(target=self._run, daemon=True)
+                    self._worker.start()
+        future = Future()
+        self._queue.put((name, row, future))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                wait = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=max(wait, 0)) if wait > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+
+            # one predict per model; a group that fails is scored row by row, so
+            # only the callers whose own row fails get the error
+            names = np.array([name for name, _, _ in batch], dtype=object)
+            for name in pd.unique(names):
+                group = [batch[i] for i in np.flatnonzero(names == name)]
+                try:
+                    probs = self.predict([(name, row) for name, row, _ in group])
+                except Exception:
+                    for _, row, future in group:
+                        self._score_one(name, row, future)
+                    continue
+                for (_, _, future), p in zip(group, probs):
+                    future.set_result(p)
+
+    def _score_one(self, name, row, future):
+        try:
+            future.set_result(self.predict([(name, row)])[0])
+        except Exception as e:
+            future.set_exception(e)
+
+    def close(self):
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+
+# ================= SOCKET =================
+
+def serve(service, host=HOST, port=PORT):
+    # -> a running server (in a background thread); server.shutdown() stops it
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    futures = [service.submit(request["model"], row) for row in request["rows"]]
+                    reply = {"prob_up": [f.result() for f in futures]}
+                except Exception as e:
+                    reply = {"error": f"{type(e).__name__}: {e}"}
+                self.wfile.write((json.dumps(reply) + "\n").encode())
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server = socketserver.ThreadingTCPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def request(model, rows, host=HOST, port=PORT):
+    # one request to serve(): rows -> list of prob_up
+    with socket.create_connection((host, port)) as s:
+        s.sendall((json.dumps({"model": model, "rows": rows}) + "\n").encode())
+        reply = json.loads(s.makefile().readline())
+    if "error" in reply:
+        raise RuntimeError(reply["error"])
+    return reply["prob_up"]
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+    from data.fetch import SYMBOLS, raw_path
+
+    paths = [raw_path(s) for s in SYMBOLS]
+
+    # one model per symbol on its full history (skipped if already registered)
+    start = time.perf_counter()
+    for path in paths:
+        registry.fit(path)
+    print(f"Registry: {len(paths)} models ready in {time.perf_counter() - start:.2f}s")
+
+    service = InferenceService()
+    start = time.perf_counter()
+    service.score_latest(paths)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    latest = service.score_latest(paths)
+    print(f"Universe scoring: {cold * 1000:.1f} ms with model loading, {(time.perf_counter() - start) * 1000:.1f} ms after")
+    print(latest.to_string(index=False))
+
+    # many single-row callers, micro-batched
+    name = store.symbol_key(paths[0])
+    rows = store.load_features(paths[0], service.model(name)["features"]).to_numpy()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(16) as pool:
+        probs = list(pool.map(lambda row: service.submit(name, row).result(), rows))
+    print(f"\n{len(rows)} concurrent single-row requests in {time.perf_counter() - start:.3f}s")
+    assert np.allclose(probs, service.predict([(name, row) for row in rows]))
+
+    server = serve(service)
+    start = time.perf_counter()
+    over_socket = request(name, rows[-5:].tolist())
+    print(f"socket request of 5 rows: {(time.perf_counter() - start) * 1000:.1f} ms ->", np.round(over_socket, 4))
+    server.shutdown()
+    service.close()
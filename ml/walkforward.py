@@ -0,0 +1,157 @@
+import pandas as pd
+import numpy as np
+import os
+import pickle
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.metrics import roc_auc_score
+
+from data import store
+from data.cache import fingerprint
+from ml.model import FEATURES, H, load_dataset, make_model
+
+# Walk-forward version of mlrun.py: instead of one split at 2024-01-01, the
+# scaler + LogisticRegression pipeline is refit for every test window and the
+# out-of-sample prob_up of all windows is stitched into one series.
+#
+#   probs = walk_forward(["csvfile/tatapower_2020_2025_daily.csv"])
+#   probs["tatapower_2020_2025_daily"]      # Date, Close, prob_up, fold
+#
+# Test windows are anchored to the calendar (every `test_months` from
+# first_test), so adding bars never moves an existing fold. Each fitted fold is
+# cached under a hash of its training / test data and the model settings: a
+# rerun after new bars only fits the folds whose data changed, normally the last.
+#
+# The last `horizon` training rows before a test window are dropped, their
+# labels look at prices inside the window.
+
+CACHE_DIR = os.path.join("csvfile", "cache", "walkforward")
+
+
+# ================= FOLDS =================
+
+def folds(dates, first_test="2021-01-01", test_months=6, train_months=None, purge=H):
+    # train_months=None: expanding window from the first bar
+    dates = pd.DatetimeIndex(dates)
+    out = []
+    for start in pd.date_range(first_test, dates.max(), freq=f"{test_months}MS"):
+        end = start + pd.DateOffset(months=test_months)
+        test = np.flatnonzero((dates >= start) & (dates < end))
+
+        train_from = dates.min() if train_months is None else start - pd.DateOffset(months=train_months)
+        train = np.flatnonzero((dates >= train_from) & (dates < start))
+        train = train[:max(len(train) - purge, 0)]
+
+        if len(test) and len(train):
+            out.append({"test_start": start, "test_end": end, "train": train, "test": test})
+    return out
+
+
+# ================= ONE FOLD =================
+
+def _fit_fold(X_train, y_train, X_test, y_test, model_params):
+    pipe = make_model(**model_params)
+    pipe.fit(X_train, y_train)
+    proba = pipe.predict_proba(X_test)[:, 1]
+    auc = roc_auc_score(y_test, proba) if len(np.unique(y_test)) == 2 else np.nan
+    return pipe, proba, auc
+
+
+def _fold_key(X_train, y_train, X_test, y_test, settings):
+    h = hashlib.blake2b(repr(settings).encode(), digest_size=8).hexdigest()
+    return f"{h}_{fingerprint(X_train, y_train, X_test, y_test)}"
+
+
+def _cache_path(symbol, fold, key):
+    return os.path.join(CACHE_DIR, symbol, f"{fold['test_start']:%Y%m%d}_{key}.pkl")
+
+
+# ================= WALK FORWARD =================
+
+def walk_forward(paths, features=FEATURES, horizon=H, first_test="2021-01-01", test_months=6,
+                 train_months=None, model_params=None, workers=None, cache=True):
+    # -> {symbol: DataFrame[Date, Close, prob_up, fold]}, plus per fold stats in .attrs["folds"]
+    model_params = model_params or {}
+    settings = (tuple(features), horizon, train_months, sorted(model_params.items()))
+
+    jobs, plan = [], {}
+    for path in paths:
+        symbol = store.symbol_key(path)
+        df = load_dataset(path, features, horizon)
+        X = df[features].to_numpy(dtype=float)
+        y = df["y"].to_numpy()
+        plan[symbol] = (df, [])
+
+        for k, fold in enumerate(folds(df["Date"], first_test, test_months, train_months, horizon)):
+            tr, te = fold["train"], fold["test"]
+            args = (X[tr], y[tr], X[te], y[te])
+            path_k = _cache_path(symbol, fold, _fold_key(*args, settings))
+            plan[symbol][1].append((k, fold, path_k))
+
+            if not (cache and os.path.exists(path_k)):
+                jobs.append((path_k, args))
+
+    # ---- fit the folds that are not cached ----
+    fitted = {}
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_fit_fold, *args, model_params) for _, args in jobs]
+            for (path_k, _), future in zip(jobs, futures):
+                pipe, proba, auc = future.result()
+                fitted[path_k] = {"model": pipe, "proba": proba, "auc": auc}
+                if cache:
+                    os.makedirs(os.path.dirname(path_k), exist_ok=True)
+                    with open(path_k + ".tmp", "wb") as f:
+                        pickle.dump(fitted[path_k], f)
+                    os.replace(path_k + ".tmp", path_k)
+
+    # ---- stitch the out-of-sample probabilities ----
+    result = {}
+    for symbol, (df, fold_list) in plan.items():
+        parts, stats = [], []
+        for k, fold, path_k in fold_list:
+            fit = fitted.get(path_k)
+            if fit is None:
+                with open(path_k, "rb") as f:
+                    fit = pickle.load(f)
+
+            part = df.loc[fold["test"], ["Date", "Close"]].copy()
+            part["prob_up"] = fit["proba"]
+            part["fold"] = k
+            parts.append(part)
+            stats.append({
+                "fold": k, "test_start": fold["test_start"], "train_rows": len(fold["train"]),
+                "test_rows": len(fold["test"]), "auc": fit["auc"], "fitted": path_k in fitted,
+            })
+
+        columns = ["Date", "Close", "prob_up", "fold"]
+        out = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+        out.attrs["folds"] = pd.DataFrame(stats)
+        result[symbol] = out
+    return result
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    import time
+    from data.fetch import SYMBOLS, raw_path
+    from agenttest import engine, strategies
+
+    paths = [raw_path(s) for s in SYMBOLS]
+
+    start = time.perf_counter()
+    probs = walk_forward(paths)
+    print(f"Walk-forward: {len(paths)} symbols in {time.perf_counter() - start:.2f}s")
+
+    print("\n===== WALK-FORWARD ML PROBABILITY BACKTEST =====")
+    for symbol, out in probs.items():
+        f = out.attrs["folds"]
+        store.write_frame(symbol + "_wf_probs", out)
+
+        # stitched probabilities straight into the money.py backtest
+        trades, returns = strategies.ml_prob(engine.columns(out, strategies.ML_PROB_COLUMNS))
+        print(f"{symbol:<28} folds {len(f):>2} (fitted {int(f['fitted'].sum()):>2}) | "
+              f"mean AUC {f['auc'].mean():.3f} | trades {len(returns):>3} | "
+              f"win rate {(returns > 0).mean() * 100 if len(returns) else 0:.1f}% | "
+              f"return {returns.sum() * 100:.2f}%")
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+import os
+import glob
+from scipy.stats import t as student_t
+
+from agenttest.ledger import ADX_THRESHOLD, Ledger
+
+# Significance of many groups of trade returns in one pass.
+#
+#   trades = load_ledgers()                       # every csvfile/ledger_*.npz
+#   table = test_groups(trades)                   # strategy x symbol x regime x run
+#   table[table["significant_bh"]]
+#
+# Per group: one-sample t-test of mean return = 0, a bootstrap p-value of the
+# same hypothesis, and both p-values adjusted over all groups of the table
+# (Benjamini-Hochberg false discovery rate and Holm family-wise error).
+#
+# Groups are sorted into contiguous segments once, then every statistic is a
+# bincount / reduceat over all groups together, including each bootstrap
+# resample, so a sweep's tens of thousands of (symbol, parameter set) groups
+# are tested without a loop per group.
+
+LEDGER_GLOB = os.path.join("csvfile", "ledger_*.npz")
+GROUPS = ["strategy", "symbol", "regime", "run"]
+MAX_CELLS = 2**22
+
+
+# ================= LOAD =================
+
+def load_ledgers(paths=None, adx_threshold=ADX_THRESHOLD):
+    # -> one frame of trades; strategy is the file name after "ledger_", regime
+    # "trend" / "sideways" from the ADX at exit, "all" where none was recorded
+    paths = sorted(glob.glob(LEDGER_GLOB)) if paths is None else paths
+    frames = []
+    for path in paths:
+        ledger = Ledger.load(path, fields=["return", "regime", "run"])
+        df = pd.DataFrame({
+            "strategy": os.path.basename(path)[len("ledger_"):-len(".npz")],
+            "symbol": np.asarray(ledger.symbols, dtype=object)[ledger["symbol"]],
+            "regime": np.where(ledger["regime"] > adx_threshold, "trend", "sideways"),
+            "run": ledger["run"],
+            "return": ledger["return"],
+        })
+        df.loc[np.isnan(ledger["regime"]), "regime"] = "all"
+        frames.append(df)
+    columns = ["strategy", "symbol", "regime", "run", "return"]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+# ================= MULTIPLE COMPARISONS =================
+
+def bh(p):
+    # Benjamini-Hochberg adjusted p-values, NaN stays NaN and is not counted
+    p = np.asarray(p, dtype=float)
+    out = np.full(p.shape, np.nan)
+    ok = np.flatnonzero(~np.isnan(p))
+    order = ok[np.argsort(p[ok])]
+    m = len(order)
+    adj = p[order] * m / np.arange(1, m + 1)
+    out[order] = np.minimum(np.minimum.accumulate(adj[::-1])[::-1], 1)
+    return out
+
+
+def holm(p):
+    # Holm step-down adjusted p-values
+    p = np.asarray(p, dtype=float)
+    out = np.full(p.shape, np.nan)
+    ok = np.flatnonzero(~np.isnan(p))
+    order = ok[np.argsort(p[ok])]
+    m = len(order)
+    adj = p[order] * (m - np.arange(m))
+    out[order] = np.minimum(np.maximum.accumulate(adj), 1)
+    return out
+
+
+# ================= TESTS =================
+
+def _bootstrap_pvalues(x, start, n, mean, size, seed, max_cells):
+    # two-sided p-value of mean = 0 per group: resample each group's centered
+    # returns within the group, count resampled means at least as far from 0
+    # as the observed one
+    if len(x) == 0:
+        return np.empty(0)
+    rng = np.random.default_rng(seed)
+    code = np.repeat(np.arange(len(n)), n)
+    centered = x - mean[code]
+    first, width = start[code], n[code]
+    hits = np.zeros(len(n))
+    step = max(max_cells // len(x), 1)
+    for i in range(0, size, step):
+        k = min(step, size - i)
+        idx = first + (rng.random((k, len(x))) * width).astype(np.int64)
+        sums = np.add.reduceat(centered[idx], start, axis=1)
+        hits += (np.abs(sums / n) >= np.abs(mean)).sum(axis=0)
+    return (hits + 1) / (size + 1)
+
+
+def test_groups(trades, by=GROUPS, value="return", n_boot=1000, seed=0, alpha=0.05,
+                max_cells=MAX_CELLS):
+    # -> one row per group: keys, trades, mean, std, t_stat, p_value, p_boot,
+    # their BH / Holm adjustments over the table and significance at alpha.
+    # n_boot=0 skips the bootstrap.
+    by = list(by)
+    trades = trades[~trades[value].isna()]
+    if len(trades) == 0:
+        columns = ["trades", "mean", "std", "t_stat", "p_value", "p_bh", "p_holm"]
+        if n_boot:
+            columns += ["p_boot", "p_boot_bh", "p_boot_holm"]
+        return pd.DataFrame(columns=by + columns + ["significant_bh", "significant_holm"])
+    code = trades.groupby(by, sort=True).ngroup().to_numpy()
+    order = np.argsort(code, kind="stable")
+    code, x = code[order], trades[value].to_numpy(dtype=float)[order]
+
+    n = np.bincount(code)
+    start = np.concatenate([[0], np.cumsum(n)[:-1]])
+    total = np.bincount(code, weights=x)
+    mean = total / n
+    dev = x - mean[code]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(np.bincount(code, weights=dev * dev) / (n - 1))
+        t_stat = mean / (std / np.sqrt(n))
+    p_value = 2 * student_t.sf(np.abs(t_stat), n - 1)
+
+    table = trades.iloc[order[start], :][by].reset_index(drop=True)
+    table["trades"] = n
+    table["mean"] = mean
+    table["std"] = std
+    table["t_stat"] = t_stat
+    table["p_value"] = p_value
+    table["p_bh"] = bh(p_value)
+    table["p_holm"] = holm(p_value)
+
+    if n_boot:
+        p_boot = _bootstrap_pvalues(x, start, n, mean, n_boot, seed, max_cells)
+        p_boot[n < 2] = np.nan
+        table["p_boot"] = p_boot
+        table["p_boot_bh"] = bh(p_boot)
+        table["p_boot_holm"] = holm(p_boot)
+
+    table["significant_bh"] = table["p_bh"] < alpha
+    table["significant_holm"] = table["p_holm"] < alpha
+    return table
+
+
+# ================= RUN =================
+
+if __name__ == "__main__":
+    import time
+
+    trades = load_ledgers()
+    swept = trades["strategy"].str.startswith("sweep_")
+
+    # fixed strategies and the sweep are separate families of tests
+    print(test_groups(trades[~swept]).drop(columns="run").to_string(index=False))
+
+    if swept.any():
+        start = time.perf_counter()
+        table = test_groups(trades[swept])
+        print(f"\nsweep: {int(swept.sum())} trades in {len(table)} groups in {time.perf_counter() - start:.2f}s")
+        print(f"raw p < 0.05: {int((table['p_value'] < 0.05).sum())} | "
+              f"BH: {int(table['significant_bh'].sum())} | Holm: {int(table['significant_holm'].sum())} | "
+              f"bootstrap BH: {int((table['p_boot_bh'] < 0.05).sum())}")
@@ -1,32 +1,26 @@
-from scipy.stats import ttest_1samp
-import pandas as pd
-import numpy as np
+from probaility.significance import LEDGER_GLOB, load_ledgers, test_groups
+from data.instrument import stage
 
-FILES = [
-    "csvfile/pro/tatapower_2020_2025_daily_trend_trades.csv",
-    "csvfile/pro/tatapower_2020_2025_daily_sideways_trades.csv",
-    "csvfile/pro/infy_2020_2025_daily_trend_trades.csv",
-    "csvfile/pro/infy_2020_2025_daily_sideways_trades.csv",
-    "csvfile/pro/itc_2020_2025_daily_trend_trades.csv",
-    "csvfile/pro/itc_2020_2025_daily_sideways_trades.csv",
-]
+# t-test of every symbol x regime of every saved trade ledger (getdata.py,
+# run.py, money.py, ...), corrected for the number of tests with Benjamini-Hochberg
 
-def analyze(file):
-    df = pd.read_csv(file)
-    r = df["return"].dropna().values
+with stage("load_ledgers"):
+    trades = load_ledgers()
+    trades = trades[~trades["strategy"].str.startswith("sweep_")]
+with stage("test_groups", rows=len(trades)):
+    table = test_groups(trades, by=["strategy", "symbol", "regime"])
 
-    mean = np.mean(r)
-    t, p = ttest_1samp(r, 0)
+if table.empty:
+    print("No trade ledgers found:", LEDGER_GLOB)
 
-    print("\n", file.split("/")[-1])
-    print("Trades:", len(r))
-    print("Mean:", round(mean*100, 4), "%")
-    print("T:", round(t, 4), " P:", round(p, 6))
+for _, row in table.iterrows():
+    print("\n", row["strategy"], "|", row["symbol"], "|", row["regime"])
+    print("Trades:", row["trades"])
+    print("Mean:", round(row["mean"]*100, 4), "%")
+    print("T:", round(row["t_stat"], 4), " P:", round(row["p_value"], 6),
+          " P (BH):", round(row["p_bh"], 6), " P (bootstrap):", round(row["p_boot"], 6))
 
-    if p < 0.05:
+    if row["significant_bh"]:
         print("✅ REAL EDGE")
     else:
         print("❌ NO EDGE")
-
-for f in FILES:
-    analyze(f)